@@ -0,0 +1,110 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import unittest
+import os
+import tempfile
+from datetime import date, time, datetime
+
+from worklog.gui.datatypes import DataContainer
+from worklog.gui.storage.columnarstorage import ColumnarStorage, ColumnarFormat
+from worklog.gui.storage.journalstorage import JournalStorage
+from worklog.gui.storage.storagemode import StorageMode, find_recent_mode
+
+
+class ColumnarStorageTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.dataDir = self.tmpDir.name
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        self.tmpDir.cleanup()
+
+    def test_dumps_empty(self):
+        content = ColumnarFormat.dumps( DataContainer() )
+        loaded = ColumnarFormat.loads( content )
+        self.assertEqual( loaded.history.size(), 0 )
+        self.assertEqual( loaded.notes, { "notes": "" } )
+
+    def test_store_load(self):
+        dataContainer = DataContainer()
+        history = dataContainer.history
+        for day in range(1, 12):
+            history.addEntryTime( date(year=2020, month=3, day=day),
+                                  time(hour=6, minute=day), time(hour=12, minute=0),
+                                  "screen saver changed", work=(day % 3 == 0) )
+        history.addEntryTime( date(year=2020, month=3, day=20),
+                              time(hour=22, minute=0), time(hour=23, minute=0), "zażółć" )
+        dataContainer.notes = { "notes": "abc", "other": "def" }
+
+        storage = ColumnarStorage()
+        self.assertTrue( storage.store( dataContainer, self.dataDir ) )
+        self.assertFalse( storage.store( dataContainer, self.dataDir ) )
+
+        loaded = ColumnarStorage().load( self.dataDir )
+        loadedHistory = loaded.history
+        self.assertEqual( loadedHistory.size(), history.size() )
+        for i in range( history.size() ):
+            self.assertEqual( loadedHistory[i].startTime, history[i].startTime )
+            self.assertEqual( loadedHistory[i].endTime, history[i].endTime )
+            self.assertEqual( loadedHistory[i].work, history[i].work )
+            self.assertEqual( loadedHistory[i].description, history[i].description )
+            self.assertEqual( loadedHistory[i].entryId, history[i].entryId )
+        self.assertIs( loadedHistory[0].description, loadedHistory[1].description )
+        self.assertEqual( loadedHistory.nextId, history.nextId )
+        self.assertEqual( loaded.notes, { "notes": "abc", "other": "def" } )
+
+    def test_store_changes(self):
+        dataContainer = DataContainer()
+        history = dataContainer.history
+        for day in range(1, 6):
+            history.addEntryTime( date(year=2020, month=3, day=day), time(hour=6), time(hour=12) )
+        storage = ColumnarStorage()
+        storage.store( dataContainer, self.dataDir )
+        self.assertIsNone( storage.prepareStore( dataContainer, self.dataDir ) )
+
+        history[1].startTime = datetime(2020, 3, 10, 6, 0)
+        history.removeEntry( history[0] )
+        history.addEntryTime( date(year=2020, month=2, day=1), time(hour=6), time(hour=12), "xxx" )
+        self.assertTrue( storage.store( dataContainer, self.dataDir ) )
+
+        loaded = ColumnarStorage().load( self.dataDir )
+        self.assertEqual( [ ( entry.entryId, entry.startTime ) for entry in loaded.history.entries ],
+                          [ ( entry.entryId, entry.startTime ) for entry in history.entries ] )
+        self.assertEqual( loaded.history[0].description, "xxx" )
+
+    def test_find_recent_mode(self):
+        self.assertIsNone( find_recent_mode( self.dataDir ) )
+        dataContainer = DataContainer()
+        dataContainer.history.addEntryTime( date(year=2020, month=3, day=1),
+                                            time(hour=6, minute=0), time(hour=12, minute=0) )
+        JournalStorage().store( dataContainer, self.dataDir )
+        self.assertEqual( find_recent_mode( self.dataDir ), StorageMode.JOURNAL )
+
+        ColumnarStorage().store( dataContainer, self.dataDir )
+        dataFile = os.path.join( self.dataDir, ColumnarStorage.DATA_FILE )
+        futureTime = datetime( year=2100, month=1, day=1 ).timestamp()
+        os.utime( dataFile, (futureTime, futureTime) )
+        self.assertEqual( find_recent_mode( self.dataDir ), StorageMode.COLUMNAR )
@@ -0,0 +1,233 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import unittest
+import os
+import tempfile
+from datetime import date, time, datetime
+
+from unittest import mock
+import pickle
+
+from worklog import persist
+from worklog.gui.datatypes import DataContainer, WorkLogEntry
+from worklog.gui.storage.journalstorage import JournalStorage
+
+
+class JournalStorageTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.dataDir = self.tmpDir.name
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        self.tmpDir.cleanup()
+
+    def test_store_empty(self):
+        storage = JournalStorage()
+        dataContainer = DataContainer()
+        self.assertTrue( storage.store( dataContainer, self.dataDir ) )
+        self.assertFalse( storage.store( dataContainer, self.dataDir ) )
+        self.assertTrue( os.path.isfile( os.path.join( self.dataDir, "data.obj" ) ) )
+        self.assertTrue( os.path.isfile( os.path.join( self.dataDir, "data.journal" ) ) )
+
+    def test_store_journal(self):
+        storage = JournalStorage()
+        dataContainer = DataContainer()
+        history = dataContainer.history
+        history.addEntryTime( date(year=2020, month=3, day=24),
+                              time(hour=6, minute=0), time(hour=12, minute=0), "xxx" )
+        storage.store( dataContainer, self.dataDir )
+        snapshotFile = os.path.join( self.dataDir, "data.obj" )
+        snapshotTime = os.stat( snapshotFile ).st_mtime_ns
+
+        history.addEntryTime( date(year=2020, month=3, day=25),
+                              time(hour=6, minute=0), time(hour=12, minute=0), "yyy" )
+        history[0].endTime = datetime( year=2020, month=3, day=24, hour=13 )
+        dataContainer.notes = { "notes": "abc" }
+        self.assertTrue( storage.store( dataContainer, self.dataDir ) )
+        self.assertEqual( os.stat( snapshotFile ).st_mtime_ns, snapshotTime )
+
+        loaded = JournalStorage().load( self.dataDir )
+        self.assertEqual( loaded.history.size(), 2 )
+        self.assertEqual( loaded.history[0].description, "xxx" )
+        self.assertEqual( loaded.history[0].endTime, datetime( year=2020, month=3, day=24, hour=13 ) )
+        self.assertEqual( loaded.history[1].description, "yyy" )
+        self.assertEqual( loaded.notes, { "notes": "abc" } )
+
+    def test_store_changes(self):
+        storage = JournalStorage()
+        dataContainer = DataContainer()
+        history = dataContainer.history
+        for day in range( 1, 30 ):
+            history.addEntryTime( date(year=2020, month=3, day=day),
+                                  time(hour=6, minute=0), time(hour=12, minute=0), "xxx" )
+        storage.store( dataContainer, self.dataDir )
+
+        ## only changed entries are written
+        history[3].description = "yyy"
+        history.removeEntry( history[5] )
+        self.assertTrue( storage.store( dataContainer, self.dataDir ) )
+        recordsList = persist.load_records( os.path.join( self.dataDir, "data.journal" ) )
+        self.assertEqual( [ record[0] for record in recordsList ], [ "snapshot", "remove", "add" ] )
+        self.assertEqual( recordsList[2][1][3], "yyy" )
+
+        loaded = JournalStorage().load( self.dataDir )
+        self.assertEqual( loaded.history.size(), 28 )
+        self.assertEqual( loaded.history[3].description, "yyy" )
+
+    def test_store_entryId(self):
+        storage = JournalStorage()
+        dataContainer = DataContainer()
+        history = dataContainer.history
+        for day in ( 24, 25 ):
+            history.addEntryTime( date(year=2020, month=3, day=day),
+                                  time(hour=6, minute=0), time(hour=12, minute=0), "xxx" )
+        storage.store( dataContainer, self.dataDir )
+
+        ## edit replaces entry by its copy with the same identifier
+        editedEntry = WorkLogEntry.fromValues( datetime(2020, 3, 24, 7, 0), datetime(2020, 3, 24, 13, 0), True, "yyy",
+                                               history[0].entryId )
+        history.replaceEntry( history[0], editedEntry )
+        newEntry = history.addEntryTime( date(year=2020, month=3, day=26), time(hour=6, minute=0), time(hour=12, minute=0) )
+        self.assertTrue( storage.store( dataContainer, self.dataDir ) )
+
+        loaded = JournalStorage().load( self.dataDir )
+        self.assertEqual( loaded.history.size(), 3 )
+        loadedEntry = loaded.history.getEntryById( editedEntry.entryId )
+        self.assertEqual( loadedEntry.startTime, datetime(2020, 3, 24, 7, 0) )
+        self.assertEqual( loadedEntry.description, "yyy" )
+        self.assertEqual( loaded.history.getEntryById( newEntry.entryId ).startTime, datetime(2020, 3, 26, 6, 0) )
+        self.assertEqual( loaded.history.nextId, history.nextId )
+
+    def test_prepareStore(self):
+        storage = JournalStorage()
+        dataContainer = DataContainer()
+        history = dataContainer.history
+        history.addEntryTime( date(year=2020, month=3, day=24),
+                              time(hour=6, minute=0), time(hour=12, minute=0), "xxx" )
+        writer = storage.prepareStore( dataContainer, self.dataDir )
+        ## modification made after preparing is not written
+        history[0].description = "yyy"
+        self.assertTrue( writer() )
+
+        loaded = JournalStorage().load( self.dataDir )
+        self.assertEqual( loaded.history[0].description, "xxx" )
+
+        writer = storage.prepareStore( dataContainer, self.dataDir )
+        self.assertTrue( writer() )
+        self.assertIsNone( storage.prepareStore( dataContainer, self.dataDir ) )
+        loaded = JournalStorage().load( self.dataDir )
+        self.assertEqual( loaded.history[0].description, "yyy" )
+
+    def test_load_migrate(self):
+        dataContainer = DataContainer()
+        dataContainer.history.addEntryTime( date(year=2020, month=3, day=24),
+                                            time(hour=6, minute=0), time(hour=12, minute=0), "xxx" )
+
+        def old_state( entry ):
+            return { "_class_version": 4, "_startTime": entry.startTime, "_endTime": entry.endTime,
+                     "work": entry.work, "description": entry.description }
+
+        snapshotFile = os.path.join( self.dataDir, "data.obj" )
+        with mock.patch.object( WorkLogEntry, "__getstate__", old_state ):
+            persist.store_content_simple( pickle.dumps( dataContainer ), snapshotFile )
+
+        loaded = JournalStorage().load( self.dataDir )
+        self.assertEqual( loaded.history[0].description, "xxx" )
+
+        ## file is already migrated
+        migrated, _, conversions = persist.load_object_converted( snapshotFile )
+        self.assertEqual( len( conversions ), 0 )
+        self.assertEqual( migrated.history[0].description, "xxx" )
+
+    def test_store_compact(self):
+        storage = JournalStorage( compactThreshold=2 )
+        dataContainer = DataContainer()
+        history = dataContainer.history
+        storage.store( dataContainer, self.dataDir )
+        for day in range(1, 6):
+            history.addEntryTime( date(year=2020, month=3, day=day),
+                                  time(hour=6, minute=0), time(hour=12, minute=0) )
+            storage.store( dataContainer, self.dataDir )
+
+        loaded = JournalStorage().load( self.dataDir )
+        self.assertEqual( loaded.history.size(), 5 )
+
+    def test_prepareStore_compact(self):
+        storage = JournalStorage( compactThreshold=1 )
+        dataContainer = DataContainer()
+        history = dataContainer.history
+        history.addEntryTime( date(year=2020, month=3, day=1), time(hour=6), time(hour=12), "xxx" )
+        storage.store( dataContainer, self.dataDir )
+        history.addEntryTime( date(year=2020, month=3, day=2), time(hour=6), time(hour=12) )
+        history.addEntryTime( date(year=2020, month=3, day=3), time(hour=6), time(hour=12) )
+
+        ## snapshot is built from persisted states in writer, history is not copied
+        with mock.patch.object( storage, "_setPersisted" ) as setPersisted:
+            writer = storage.prepareStore( dataContainer, self.dataDir )
+        setPersisted.assert_not_called()
+        history[0].description = "yyy"
+        self.assertTrue( writer() )
+
+        loaded = JournalStorage().load( self.dataDir )
+        self.assertEqual( loaded.history.size(), 3 )
+        self.assertEqual( loaded.history[0].description, "xxx" )
+        self.assertEqual( loaded.history.nextId, history.nextId )
+
+    def test_load_stale_journal(self):
+        storage = JournalStorage()
+        dataContainer = DataContainer()
+        history = dataContainer.history
+        storage.store( dataContainer, self.dataDir )
+        history.addEntryTime( date(year=2020, month=3, day=24),
+                              time(hour=6, minute=0), time(hour=12, minute=0) )
+        storage.store( dataContainer, self.dataDir )
+
+        ## simulate snapshot written without journal reset
+        journalFile = os.path.join( self.dataDir, "data.journal" )
+        with open( journalFile, 'rb' ) as fp:
+            journalContent = fp.read()
+        storage.compact( dataContainer, self.dataDir )
+        with open( journalFile, 'wb' ) as fp:
+            fp.write( journalContent )
+
+        loaded = JournalStorage().load( self.dataDir )
+        self.assertEqual( loaded.history.size(), 1 )
+
+    def test_load_truncated_journal(self):
+        storage = JournalStorage()
+        dataContainer = DataContainer()
+        history = dataContainer.history
+        storage.store( dataContainer, self.dataDir )
+        history.addEntryTime( date(year=2020, month=3, day=24),
+                              time(hour=6, minute=0), time(hour=12, minute=0) )
+        storage.store( dataContainer, self.dataDir )
+
+        journalFile = os.path.join( self.dataDir, "data.journal" )
+        with open( journalFile, 'ab' ) as fp:
+            fp.write( b"\x80\x04\x95" )
+
+        loaded = JournalStorage().load( self.dataDir )
+        self.assertEqual( loaded.history.size(), 1 )
@@ -0,0 +1,145 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import unittest
+import os
+import tempfile
+from datetime import date, time, datetime
+
+from worklog.gui.datatypes import DataContainer
+from worklog.gui.storage.partitionedstorage import PartitionedStorage
+
+
+class PartitionedStorageTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.dataDir = self.tmpDir.name
+        self.historyDir = os.path.join( self.dataDir, PartitionedStorage.HISTORY_DIR )
+
+        self.dataContainer = DataContainer()
+        history = self.dataContainer.history
+        for month in range(1, 13, 2):
+            history.addEntryTime( date(year=2019, month=month, day=10), time(hour=8), time(hour=16) )
+        history.addEntryTime( date.today(), time(hour=8), time(hour=9) )
+        self.dataContainer.notes = { "notes": "abc" }
+        PartitionedStorage().store( self.dataContainer, self.dataDir )
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        self.tmpDir.cleanup()
+
+    def test_store(self):
+        filesList = sorted( os.listdir( self.historyDir ) )
+        self.assertIn( "2019-01.col", filesList )
+        self.assertIn( "2019-11.col", filesList )
+        self.assertNotIn( "2019-02.col", filesList )
+        self.assertIn( "notes.json", filesList )
+        ## partitions share single backup store
+        self.assertNotIn( "2019-01.col.backup", filesList )
+        self.assertIn( "history.backup", os.listdir( self.dataDir ) )
+
+    def test_load_partial(self):
+        storage = PartitionedStorage()
+        loaded = storage.load( self.dataDir )
+        ## current month and preceding partition
+        self.assertEqual( loaded.history.size(), 2 )
+        self.assertEqual( loaded.history[0].startTime, datetime(2019, 11, 10, 8, 0) )
+        self.assertEqual( loaded.notes, { "notes": "abc" } )
+        self.assertFalse( storage.isLoaded() )
+
+        ## preceding partition is loaded, 2019-11 is unloaded
+        self.assertEqual( storage.loadPartitions( loaded, date(year=2019, month=6, day=1) ), 2 )
+        self.assertEqual( loaded.history.size(), 2 )
+        self.assertEqual( loaded.history[0].startTime, datetime(2019, 5, 10, 8, 0) )
+        self.assertEqual( storage.loadPartitions( loaded, date(year=2019, month=6, day=20) ), 0 )
+
+        storage.loadAll( loaded )
+        self.assertTrue( storage.isLoaded() )
+        self.assertEqual( loaded.history.size(), 7 )
+
+    def test_load_unload(self):
+        storage = PartitionedStorage()
+        loaded = storage.load( self.dataDir )
+        history = loaded.history
+        storage.loadPartitions( loaded, date(year=2019, month=3, day=1) )
+        history[0].description = "changed"
+        referencedEntry = history[1]
+        self.assertEqual( referencedEntry.startTime, datetime(2019, 3, 10, 8, 0) )
+
+        ## modified and referenced partitions are kept
+        storage.loadPartitions( loaded, date(year=2019, month=9, day=1), { referencedEntry.entryId } )
+        self.assertEqual( [ entry.startTime.month for entry in history.entries[:-1] ], [ 1, 3, 7, 9 ] )
+        self.assertEqual( history.getChanges(), ( [ history[0] ], [] ) )
+
+        self.assertTrue( storage.store( loaded, self.dataDir ) )
+        storage.loadPartitions( loaded, date(year=2019, month=9, day=1) )
+        self.assertEqual( [ entry.startTime.month for entry in history.entries[:-1] ], [ 7, 9 ] )
+        self.assertIsNone( storage.prepareStore( loaded, self.dataDir ) )
+
+        reloadedData = PartitionedStorage().load( self.dataDir )
+        self.assertEqual( reloadedData.history.size(), 2 )
+
+    def test_store_changed(self):
+        storage = PartitionedStorage()
+        loaded = storage.load( self.dataDir )
+        self.assertFalse( storage.store( loaded, self.dataDir ) )
+
+        oldFile = os.path.join( self.historyDir, "2019-01.col" )
+        oldTime = os.path.getmtime( oldFile )
+        os.utime( oldFile, (oldTime - 100, oldTime - 100) )
+        loaded.history.recentEntry().endTime = datetime.combine( date.today(), time(hour=10) )
+        self.assertTrue( storage.store( loaded, self.dataDir ) )
+        self.assertEqual( os.path.getmtime( oldFile ), oldTime - 100 )
+
+        ## move entry to not loaded month
+        loaded.history.recentEntry().startTime = datetime(2019, 3, 10, 12, 0)
+        storage.store( loaded, self.dataDir )
+        ## only partition of target month is loaded
+        self.assertEqual( loaded.history.size(), 3 )
+
+        reloaded = PartitionedStorage()
+        reloadedData = reloaded.load( self.dataDir )
+        reloaded.loadAll( reloadedData )
+        startList = [ entry.startTime for entry in reloadedData.history.entries ]
+        self.assertEqual( startList.count( datetime(2019, 3, 10, 12, 0) ), 1 )
+        self.assertEqual( reloadedData.history.size(), 7 )
+        self.assertEqual( reloadedData.history.getEntryById( loaded.history.recentEntry().entryId ).startTime,
+                          loaded.history.recentEntry().startTime )
+
+    def test_store_removed(self):
+        storage = PartitionedStorage()
+        loaded = storage.load( self.dataDir )
+        storage.loadAll( loaded )
+        loaded.history.removeEntry( loaded.history[0] )
+        self.assertTrue( storage.store( loaded, self.dataDir ) )
+        self.assertNotIn( "2019-01.col", os.listdir( self.historyDir ) )
+        self.assertIn( "2019-03.col", os.listdir( self.historyDir ) )
+        self.assertIsNone( storage.prepareStore( loaded, self.dataDir ) )
+
+    def test_load_nextId(self):
+        loaded = PartitionedStorage().load( self.dataDir )
+        ## entries of not loaded partitions keep their identifiers
+        self.assertEqual( loaded.history.nextId, self.dataContainer.history.nextId )
+        newEntry = loaded.history.addEntryTime( date.today(), time(hour=10), time(hour=11) )
+        self.assertIsNone( self.dataContainer.history.getEntryById( newEntry.entryId ) )
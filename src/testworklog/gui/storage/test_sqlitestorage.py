@@ -0,0 +1,99 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import unittest
+import tempfile
+from datetime import date, time, datetime, timedelta
+
+from worklog.gui.datatypes import DataContainer
+from worklog.gui.storage.journalstorage import JournalStorage
+from worklog.gui.storage.sqlitestorage import SqliteStorage, import_pickle
+
+
+class SqliteStorageTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.dataDir = self.tmpDir.name
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        self.tmpDir.cleanup()
+
+    def test_store_load(self):
+        dataContainer = DataContainer()
+        history = dataContainer.history
+        for day in range(1, 12):
+            history.addEntryTime( date(year=2020, month=3, day=day),
+                                  time(hour=6, minute=day), time(hour=12, minute=0),
+                                  "screen saver", work=(day % 3 == 0) )
+        dataContainer.notes = { "notes": "abc", "other": "def" }
+
+        storage = SqliteStorage()
+        self.assertTrue( storage.store( dataContainer, self.dataDir ) )
+        self.assertFalse( storage.store( dataContainer, self.dataDir ) )
+        storage.close()
+
+        loaded = SqliteStorage().load( self.dataDir )
+        loadedHistory = loaded.history
+        self.assertEqual( loadedHistory.size(), history.size() )
+        for i in range( history.size() ):
+            self.assertEqual( loadedHistory[i].startTime, history[i].startTime )
+            self.assertEqual( loadedHistory[i].endTime, history[i].endTime )
+            self.assertEqual( loadedHistory[i].work, history[i].work )
+            self.assertEqual( loadedHistory[i].description, history[i].description )
+        self.assertEqual( loaded.notes, { "notes": "abc", "other": "def" } )
+
+    def test_store_update(self):
+        dataContainer = DataContainer()
+        history = dataContainer.history
+        for day in range(1, 12):
+            history.addEntryTime( date(year=2020, month=3, day=day), time(hour=6), time(hour=12) )
+        storage = SqliteStorage()
+        storage.store( dataContainer, self.dataDir )
+
+        changes = storage._connection.total_changes
+        history.recentEntry().endTime += timedelta( minutes=1 )
+        self.assertTrue( storage.store( dataContainer, self.dataDir ) )
+        self.assertEqual( storage._connection.total_changes, changes + 1 )
+
+        history.removeEntry( history[0] )
+        history.addEntryTime( date(year=2020, month=3, day=20), time(hour=6), time(hour=12) )
+        storage.store( dataContainer, self.dataDir )
+        storage.close()
+
+        loaded = SqliteStorage().load( self.dataDir )
+        self.assertEqual( loaded.history.size(), 11 )
+        self.assertEqual( loaded.history[0].startTime, datetime(2020, 3, 2, 6, 0) )
+        self.assertEqual( loaded.history[9].endTime, datetime(2020, 3, 11, 12, 1) )
+        self.assertEqual( loaded.history[10].startTime, datetime(2020, 3, 20, 6, 0) )
+
+    def test_import_pickle(self):
+        dataContainer = DataContainer()
+        dataContainer.history.addEntryTime( date(year=2020, month=3, day=1), time(hour=6), time(hour=12) )
+        JournalStorage().store( dataContainer, self.dataDir )
+
+        self.assertTrue( import_pickle( self.dataDir ) )
+        loaded = SqliteStorage().load( self.dataDir )
+        self.assertEqual( loaded.history.size(), 1 )
+        self.assertEqual( loaded.history[0].startTime, datetime(2020, 3, 1, 6, 0) )
@@ -0,0 +1,153 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import unittest
+import random
+
+from datetime import date, datetime, timedelta
+
+from worklog.gui import analytics
+from worklog.gui.datatypes import WorkLogData, WorkLogEntry
+
+
+class HistoryAnalyticsTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.history = WorkLogData()
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        pass
+
+    def addEntry(self, startTime: datetime, endTime: datetime, work=True):
+        entry = WorkLogEntry()
+        entry.startTime = startTime
+        entry.endTime   = endTime
+        entry.work      = work
+        self.history.addEntry( entry )
+        return entry
+
+    def test_getTotals(self):
+        self.addEntry( datetime(2020, 3, 1, 8), datetime(2020, 3, 1, 12) )
+        self.addEntry( datetime(2020, 3, 1, 12), datetime(2020, 3, 1, 13), work=False )
+        nightEntry = self.addEntry( datetime(2020, 3, 1, 22), datetime(2020, 3, 2, 1) )
+        self.addEntry( datetime(2020, 12, 31, 23), datetime(2021, 1, 1, 2) )
+        view = self.history.getAnalytics()
+
+        dayTotals = view.getTotals( "day" )
+        self.assertEqual( dayTotals[ date(2020, 3, 1) ], ( timedelta( hours=6 ), timedelta( hours=1 ) ) )
+        self.assertEqual( dayTotals[ date(2020, 3, 2) ], ( timedelta( hours=1 ), timedelta() ) )
+        self.assertEqual( list( dayTotals ), [ date(2020, 3, 1), date(2020, 3, 2), date(2020, 12, 31), date(2021, 1, 1) ] )
+
+        ## 2020-03-01 is Sunday
+        weekTotals = view.getTotals( "week" )
+        self.assertEqual( weekTotals[ date(2020, 2, 24) ], ( timedelta( hours=6 ), timedelta( hours=1 ) ) )
+        self.assertEqual( weekTotals[ date(2020, 3, 2) ], ( timedelta( hours=1 ), timedelta() ) )
+
+        yearTotals = view.getTotals( "year" )
+        self.assertEqual( yearTotals[ date(2020, 1, 1) ], ( timedelta( hours=8 ), timedelta( hours=1 ) ) )
+        self.assertEqual( yearTotals[ date(2021, 1, 1) ], ( timedelta( hours=2 ), timedelta() ) )
+
+        ## totals follow modifications
+        nightEntry.work = False
+        monthTotals = view.getTotals( "month" )
+        self.assertEqual( monthTotals[ date(2020, 3, 1) ], ( timedelta( hours=4 ), timedelta( hours=4 ) ) )
+
+        self.assertRaises( ValueError, view.getTotals, "hour" )
+
+    def test_getTotals_dayDuration(self):
+        rand = random.Random( 0 )
+        baseTime = datetime( year=2020, month=1, day=1 )
+        for _ in range( 300 ):
+            startTime = baseTime + timedelta( minutes=rand.randrange( 0, 60 * 24 * 60 ) )
+            self.addEntry( startTime, startTime + timedelta( minutes=rand.randrange( 0, 60 * 30 ) ), rand.random() < 0.7 )
+        dayTotals = self.history.getAnalytics().getTotals( "day" )
+        for day, durations in dayTotals.items():
+            self.assertEqual( durations, self.history.getDayDuration( day ) )
+
+    @unittest.skipIf( analytics.numpy_available() is False, "numpy is not installed" )
+    def test_arrays(self):
+        self.addEntry( datetime(2020, 3, 1, 8), datetime(2020, 3, 1, 12) )
+        view = self.history.getAnalytics()
+        starts, _, works = view.arrays()
+        self.assertEqual( starts.tolist(), [ self.history[0].startMinutes ] )
+        self.addEntry( datetime(2020, 3, 2, 8), datetime(2020, 3, 2, 12), work=False )
+        starts, _, works = view.arrays()
+        self.assertEqual( starts.tolist(), [ self.history[0].startMinutes, self.history[1].startMinutes ] )
+        self.assertEqual( works.tolist(), [ True, False ] )
+
+    def test_rollup(self):
+        rand = random.Random( 1 )
+        baseTime = datetime( year=2020, month=1, day=1 )
+        for _ in range( 200 ):
+            startTime = baseTime + timedelta( minutes=rand.randrange( 0, 60 * 24 * 60 ) )
+            self.addEntry( startTime, startTime + timedelta( minutes=rand.randrange( 0, 60 * 30 ) ), rand.random() < 0.7 )
+        rollup = self.history.getAnalytics().getRollup()
+
+        def check_range( fromDate, toDate ):
+            expected = timedelta()
+            day = fromDate
+            while day <= toDate:
+                expected += self.history.getDayDuration( day )[0]
+                day += timedelta( days=1 )
+            self.assertEqual( rollup.workDuration( fromDate, toDate ), expected )
+
+        check_range( date(2019, 12, 1), date(2020, 4, 1) )
+        check_range( date(2020, 1, 10), date(2020, 1, 20) )
+
+        ## incremental updates
+        entry = self.history[ 50 ]
+        entry.endTime = entry.endTime + timedelta( hours=5 )
+        self.history[ 10 ].work = not self.history[ 10 ].work
+        self.history.removeEntry( self.history[ 20 ] )
+        self.addEntry( datetime(2020, 6, 1, 8), datetime(2020, 6, 1, 12) )
+        check_range( date(2019, 12, 1), date(2020, 7, 1) )
+        self.addEntry( datetime(2019, 6, 1, 8), datetime(2019, 6, 1, 12) )
+        check_range( date(2019, 1, 1), date(2020, 7, 1) )
+
+    def test_overtimeBalance(self):
+        ## Monday to Sunday
+        for day in range( 2, 9 ):
+            self.addEntry( datetime(2020, 3, day, 8), datetime(2020, 3, day, 17) )
+        rollup = self.history.getAnalytics().getRollup()
+        self.assertEqual( analytics.count_workdays( date(2020, 3, 2), date(2020, 3, 8) ), 5 )
+        self.assertEqual( analytics.count_workdays( date(2020, 3, 6), date(2020, 3, 16) ), 7 )
+        balance = rollup.overtimeBalance( date(2020, 3, 2), date(2020, 3, 8), timedelta( hours=8 ) )
+        self.assertEqual( balance, timedelta( hours=63 - 40 ) )
+        self.assertEqual( analytics.format_balance( -timedelta( minutes=90 ) ), "-1:30" )
+        self.assertEqual( analytics.balance_summary( rollup, date(2020, 3, 3), timedelta( hours=8 ) ),
+                          [ "Week: 18:00 (balance: +2:00)", "Month: 18:00 (balance: +2:00)" ] )
+
+    def test_period_report(self):
+        ## Monday 2020-03-02 to Wednesday 2020-03-11
+        for day in range( 2, 12 ):
+            self.addEntry( datetime(2020, 3, day, 8), datetime(2020, 3, day, 17) )
+        rollup = self.history.getAnalytics().getRollup()
+        rows = analytics.period_report( rollup, date(2020, 3, 11), timedelta( hours=8 ), "week", 3 )
+        self.assertEqual( rows, [ ( date(2020, 3, 9), date(2020, 3, 11), timedelta( hours=27 ), timedelta( hours=3 ) ),
+                                  ( date(2020, 3, 2), date(2020, 3, 8), timedelta( hours=63 ), timedelta( hours=23 ) ),
+                                  ( date(2020, 2, 24), date(2020, 3, 1), timedelta(), -timedelta( hours=40 ) ) ] )
+        rows = analytics.period_report( rollup, date(2020, 3, 11), timedelta( hours=8 ), "year", 1 )
+        self.assertEqual( rows[0][:3], ( date(2020, 1, 1), date(2020, 3, 11), timedelta( hours=90 ) ) )
+        with self.assertRaises( ValueError ):
+            analytics.period_report( rollup, date(2020, 3, 11), timedelta( hours=8 ), "decade" )
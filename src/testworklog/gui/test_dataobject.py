@@ -24,11 +24,229 @@
 import unittest
 import os
 import datetime
+import tempfile
+import gzip
 
-from worklog.gui.dataobject import SysLogParser
+from worklog.gui.datatypes import WorkLogEntry
+from worklog.gui.dataobject import DataObject, SysLogParser, parse_timestamp_key
+from worklog.gui.command.addentrycommand import AddEntryCommand
+from worklog.gui.command.mergeentryupcommand import MergeEntryUpCommand
 from testworklog.data import get_data_path
 
 
+class DataObjectTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.data = DataObject()
+        self.changes = []
+        self.data.entriesInserted.connect( lambda change: self.changes.append( ( "inserted", change ) ) )
+        self.data.entriesRemoved.connect( lambda change: self.changes.append( ( "removed", change ) ) )
+        self.data.entriesModified.connect( lambda change: self.changes.append( ( "modified", change ) ) )
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        pass
+
+    def test_mergeUp_notifications(self):
+        history = self.data.history
+        firstEntry = history.addEntryTime( datetime.date( 2020, 3, 1 ), datetime.time( 8 ), datetime.time( 10 ) )
+        entry = history.addEntryTime( datetime.date( 2020, 3, 2 ), datetime.time( 8 ), datetime.time( 10 ) )
+
+        self.data.pushUndo( MergeEntryUpCommand( self.data, entry ) )
+        self.assertEqual( [ item[0] for item in self.changes ], [ "removed", "modified" ] )
+        removed = self.changes[0][1]
+        self.assertEqual( removed.entries, [ entry ] )
+        self.assertEqual( removed.rows, [ 1 ] )
+        modified = self.changes[1][1]
+        self.assertEqual( modified.entries, [ firstEntry ] )
+        self.assertEqual( modified.rows, [ 0 ] )
+        self.assertEqual( ( modified.fromDate, modified.toDate ), ( datetime.date( 2020, 3, 1 ), datetime.date( 2020, 3, 2 ) ) )
+        self.assertFalse( modified.containsDate( datetime.date( 2020, 3, 3 ) ) )
+
+        self.changes.clear()
+        self.data.undoStack.undo()
+        self.assertEqual( [ item[0] for item in self.changes ], [ "inserted", "modified" ] )
+        self.assertEqual( self.changes[0][1].rows, [ 1 ] )
+
+    def test_addEntry_notifications(self):
+        entry = WorkLogEntry()
+        entry.startTime = datetime.datetime( 2020, 3, 1, 22 )
+        entry.endTime   = datetime.datetime( 2020, 3, 2, 1 )
+        self.data.pushUndo( AddEntryCommand( self.data, entry ) )
+        self.assertEqual( len( self.changes ), 1 )
+        kind, change = self.changes[0]
+        self.assertEqual( kind, "inserted" )
+        self.assertEqual( change.rows, [ 0 ] )
+        self.assertTrue( change.containsDate( datetime.date( 2020, 3, 2 ) ) )
+
+    def test_normalizeEntries(self):
+        history = self.data.history
+        firstEntry = history.addEntryTime( datetime.date( 2020, 3, 1 ), datetime.time( 8 ), datetime.time( 12 ) )
+        entry = history.addEntryTime( datetime.date( 2020, 3, 1 ), datetime.time( 10 ), datetime.time( 14 ) )
+        history.addEntryTime( datetime.date( 2020, 3, 1 ), datetime.time( 16 ), datetime.time( 17 ) )
+
+        self.assertTrue( self.data.normalizeEntries() )
+        self.assertEqual( [ item[0] for item in self.changes ], [ "removed", "modified" ] )
+        self.assertEqual( self.changes[0][1].rows, [ 1 ] )
+        self.assertEqual( history.size(), 2 )
+        self.assertEqual( firstEntry.endTime, datetime.datetime( 2020, 3, 1, 14 ) )
+
+        self.data.undoStack.undo()
+        self.assertEqual( history.entries[1], entry )
+        self.assertEqual( firstEntry.endTime, datetime.datetime( 2020, 3, 1, 12 ) )
+        self.assertEqual( history.getDayDuration( datetime.date( 2020, 3, 1 ) )[0], datetime.timedelta( hours=9 ) )
+
+        self.data.undoStack.redo()
+        self.assertFalse( self.data.normalizeEntries() )
+
+    def test_normalizeHistory(self):
+        history = self.data.history
+        history.addEntryTime( datetime.date( 2020, 3, 1 ), datetime.time( 8 ), datetime.time( 12 ) )
+        history.addEntryTime( datetime.date( 2020, 3, 1 ), datetime.time( 10 ), datetime.time( 14 ) )
+
+        self.assertTrue( self.data.normalizeHistory() )
+        self.assertEqual( history.size(), 1 )
+        self.assertEqual( self.data.undoStack.count(), 0 )
+        self.assertFalse( self.data.normalizeHistory() )
+
+    def test_compactEntries(self):
+        history = self.data.history
+        history.addEntryTime( datetime.date( 2020, 3, 1 ), datetime.time( 8 ), datetime.time( 10 ) )
+        history.addEntryTime( datetime.date( 2020, 3, 1 ), datetime.time( 10 ), datetime.time( 12 ) )
+        history.addEntryTime( datetime.date( 2020, 3, 2 ), datetime.time( 8 ), datetime.time( 8 ) )
+        history.addEntryTime( datetime.date( 2020, 3, 2 ), datetime.time( 9 ), datetime.time( 9 ) )
+
+        self.assertEqual( self.data.compactEntries(), 2 )
+        self.assertEqual( history.size(), 2 )
+        self.assertEqual( history.getUncompactedDays(), set() )
+
+        self.data.undoStack.undo()
+        self.assertEqual( history.size(), 4 )
+        self.assertEqual( self.data.compactEntries(), 2 )
+
+    def test_compactActivity(self):
+        history = self.data.history
+        history.markCompacted()
+        history.addEntryTime( datetime.date( 2020, 3, 1 ), datetime.time( 8 ), datetime.time( 10 ) )
+        history.addEntryTime( datetime.date( 2020, 3, 1 ), datetime.time( 10 ), datetime.time( 12 ), "screen saver changed" )
+        entry = WorkLogEntry()
+        entry.startTime = datetime.datetime( 2020, 3, 2, 8 )
+        entry.endTime   = datetime.datetime( 2020, 3, 2, 8 )
+        self.data.pushUndo( AddEntryCommand( self.data, entry ) )
+
+        self.assertEqual( self.data.compactActivity(), 1 )
+        self.assertEqual( self.data.undoStack.count(), 1 )
+        self.assertEqual( history.size(), 2 )
+        self.assertEqual( history.getUncompactedDays(), { datetime.date( 2020, 3, 2 ) } )
+
+        self.data.undoStack.undo()
+        self.assertEqual( history.size(), 1 )
+
+    def test_compactActivity_userEntries(self):
+        history = self.data.history
+        history.addEntryTime( datetime.date( 2020, 3, 1 ), datetime.time( 6 ), datetime.time( 8 ) )
+        history.addEntryTime( datetime.date( 2020, 3, 1 ), datetime.time( 8 ), datetime.time( 10 ) )
+        ## days touched before load are unknown, loaded history is not compacted
+        self.assertEqual( self.data.compactActivity(), 0 )
+
+        history.markCompacted()
+        history.addEntryTime( datetime.date( 2020, 3, 2 ), datetime.time( 8 ), datetime.time( 10 ), "aaa" )
+        history.addEntryTime( datetime.date( 2020, 3, 2 ), datetime.time( 10 ), datetime.time( 12 ), "bbb" )
+        with tempfile.TemporaryDirectory() as tmpDir:
+            ## the same as on save
+            self.assertEqual( self.data.compactActivity(), 0 )
+            self.data.store( tmpDir )
+            loadedData = DataObject()
+            loadedData.load( tmpDir )
+        self.assertEqual( [ entry.description for entry in loadedData.history.entries ], [ "", "", "aaa", "bbb" ] )
+
+    def test_readKeylogFile_incremental(self):
+        with open( get_data_path( "kern.log_suspend" ), 'rb' ) as fp:
+            content = fp.read()
+        ## modification time determines year of log entries
+        fileTime = datetime.datetime( year=2020, month=11, day=2 ).timestamp()
+        with tempfile.TemporaryDirectory() as tmpDir:
+            logPath = os.path.join( tmpDir, "kern.log" )
+            fullData = DataObject()
+            with open( logPath, 'wb' ) as fp:
+                fp.write( content )
+            os.utime( logPath, ( fileTime, fileTime ) )
+            fullData._readKeylogFile( logPath )
+
+            ## file is growing, last line is incomplete at first read
+            with open( logPath, 'wb' ) as fp:
+                fp.write( content[ :len( content ) // 2 ] )
+            os.utime( logPath, ( fileTime, fileTime ) )
+            self.data._readKeylogFile( logPath )
+            fileState, _ = self.data.logImportState.getFileState( logPath )
+            self.assertEqual( content[ fileState.offset - 1: fileState.offset ], b"\n" )
+            with open( logPath, 'ab' ) as fp:
+                fp.write( content[ len( content ) // 2: ] )
+            os.utime( logPath, ( fileTime, fileTime ) )
+            self.data._readKeylogFile( logPath )
+            self.assertEqual( fileState.offset, len( content ) )
+
+            spans = [ ( entry.startTime, entry.endTime ) for entry in self.data.history.entries ]
+            self.assertEqual( spans, [ ( entry.startTime, entry.endTime ) for entry in fullData.history.entries ] )
+
+            ## state follows rotated file, new file is read from beginning
+            self.data.logImportState.store( tmpDir )
+            os.rename( logPath, logPath + ".1" )
+            with open( logPath, 'wb' ) as fp:
+                fp.write( content[ :200 ] )
+            importState = self.data.logImportState.load( tmpDir )
+            self.assertEqual( importState.getFileState( logPath + ".1" )[0].offset, len( content ) )
+            self.assertEqual( importState.getFileState( logPath )[0].offset, 0 )
+
+    def test_readKeylogFile_compressed(self):
+        with open( get_data_path( "kern.log_suspend" ), 'rb' ) as fp:
+            content = fp.read()
+        fileTime = datetime.datetime( year=2020, month=11, day=2 ).timestamp()
+        with tempfile.TemporaryDirectory() as tmpDir:
+            logPath = os.path.join( tmpDir, "kern.log" )
+            with open( logPath, 'wb' ) as fp:
+                fp.write( content )
+            with gzip.open( logPath + ".2.gz", 'wb' ) as fp:
+                fp.write( content )
+            for filePath in ( logPath, logPath + ".2.gz" ):
+                os.utime( filePath, ( fileTime, fileTime ) )
+            plainData = DataObject()
+            plainData._readKeylogFile( logPath )
+            self.data._readKeylogFile( logPath + ".2.gz" )
+            spans = [ ( entry.startTime, entry.endTime ) for entry in self.data.history.entries ]
+            self.assertEqual( spans, [ ( entry.startTime, entry.endTime ) for entry in plainData.history.entries ] )
+            fileState, fileSize = self.data.logImportState.getFileState( logPath + ".2.gz" )
+            self.assertEqual( fileState.offset, fileSize )
+
+            ## files older than recent entry are not read
+            self.data.history.addEntryTime( datetime.date( 2020, 11, 3 ), datetime.time( 8 ), datetime.time( 10 ) )
+            self.data._readKeylogFile( logPath )
+            self.assertNotIn( logPath, self.data.logImportState.files )
+
+    def test_readKeylogFiles_parallel(self):
+        fileTime = datetime.datetime( year=2020, month=11, day=2 ).timestamp()
+        with tempfile.TemporaryDirectory() as tmpDir:
+            filesList = []
+            for fileName, dataName in ( ( "kern.log.2.gz", "kern.log_regular" ), ( "kern.log.1", "kern.log_suspend" ) ):
+                with open( get_data_path( dataName ), 'rb' ) as fp:
+                    content = fp.read()
+                filePath = os.path.join( tmpDir, fileName )
+                with ( gzip.open if fileName.endswith( ".gz" ) else open )( filePath, 'wb' ) as fp:
+                    fp.write( content )
+                os.utime( filePath, ( fileTime, fileTime ) )
+                filesList.append( filePath )
+
+            serialData = DataObject()
+            serialData._readKeylogFiles( filesList, parallel=False )
+            self.data._readKeylogFiles( filesList, parallel=True )
+            spans = [ ( entry.startTime, entry.endTime ) for entry in self.data.history.entries ]
+            self.assertGreater( len( spans ), 3 )
+            self.assertEqual( spans, [ ( entry.startTime, entry.endTime ) for entry in serialData.history.entries ] )
+            for filePath in filesList:
+                fileState, fileSize = self.data.logImportState.getFileState( filePath )
+                self.assertEqual( fileState.offset, fileSize )
+
+
 class SysLogParserTest(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -46,6 +264,14 @@ class SysLogParserTest(unittest.TestCase):
         ## Called after testfunction was executed
         pass
 
+    def test_parse_timestamp_key(self):
+        self.assertEqual( parse_timestamp_key( "May  7 23:24", 2020 ), datetime.datetime( 2020, 5, 7, 23, 24 ) )
+        self.assertEqual( parse_timestamp_key( "Oct 26 00:09", 2020 ), datetime.datetime( 2020, 10, 26, 0, 9 ) )
+        self.assertEqual( parse_timestamp_key( "Feb 29 00:00", 2020 ), datetime.datetime( 2020, 2, 29, 0, 0 ) )
+        self.assertIsNone( parse_timestamp_key( "Feb 29 00:00", 2021 ) )
+        self.assertIsNone( parse_timestamp_key( "Okt 26 00:09", 2020 ) )
+        self.assertIsNone( parse_timestamp_key( "Oct 26 0:09:", 2020 ) )
+
     def test_parseLogFile_regular(self):
         kernlogPath = get_data_path( "kern.log_regular" )
         logList = SysLogParser.parseLogFile( kernlogPath )
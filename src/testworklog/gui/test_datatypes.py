@@ -22,9 +22,13 @@
 #
 
 import unittest
+import sys
+import pickle
+import copy
+import random
 
-from datetime import date, time
-from worklog.gui.datatypes import WorkLogData
+from datetime import date, time, datetime, timedelta
+from worklog.gui.datatypes import WorkLogData, WorkLogEntry, DataContainer, EntriesListener
 
 
 class WorkLogDataTest(unittest.TestCase):
@@ -52,6 +56,59 @@ class WorkLogDataTest(unittest.TestCase):
         self.assertEqual( history[1].description, "xxx" )
         self.assertEqual( history[2].description, "yyy" )
 
+    def test_mergeSortedEntries(self):
+        rand = random.Random( 0 )
+        history = WorkLogData()
+        baseTime = datetime( year=2020, month=3, day=1 )
+        for _ in range( 5 ):
+            batch = []
+            for _ in range( 20 ):
+                entry = WorkLogEntry()
+                entry.startTime = baseTime + timedelta( minutes=rand.randrange( 0, 1000 ) )
+                entry.endTime   = entry.startTime + timedelta( minutes=10 )
+                batch.append( entry )
+            expected = sorted( history.entries + batch, key=lambda item: item.startTime )
+            history.addEntries( batch )
+            self.assertEqual( history.entries, expected )
+            for entry in batch:
+                self.assertIs( entry._owner, history )
+
+        ## unsorted history is sorted on merge
+        history[0].startTime = baseTime + timedelta( days=1 )
+        history.mergeSortedEntries( [] )
+        starts = [ entry.startTime for entry in history ]
+        self.assertEqual( starts, sorted( starts ) )
+
+    def test_listener(self):
+        history = WorkLogData()
+        listener = MirrorListener( history )
+        history.setListener( listener )
+        rand = random.Random( 0 )
+        baseTime = datetime( year=2020, month=3, day=1 )
+        for _ in range( 5 ):
+            batch = []
+            for _ in range( 10 ):
+                entry = WorkLogEntry()
+                entry.startTime = baseTime + timedelta( minutes=rand.randrange( 0, 1000 ) )
+                entry.endTime   = entry.startTime + timedelta( minutes=10 )
+                batch.append( entry )
+            history.addEntries( batch )
+            self.assertEqual( listener.rows, history.entries )
+
+        history.addEntryTime( date(year=2020, month=3, day=1), time(hour=6), time(hour=7) )
+        self.assertEqual( listener.rows, history.entries )
+        history.removeEntries( history.entries[3:8] + history.entries[20:22] + [ history.entries[-1] ] )
+        self.assertEqual( listener.rows, history.entries )
+        history.removeEntry( history.entries[0] )
+        self.assertEqual( listener.rows, history.entries )
+
+        ## unsorted history is reset on insert
+        history[0].startTime = baseTime + timedelta( days=1 )
+        history.addEntryTime( date(year=2020, month=3, day=1), time(hour=5), time(hour=6) )
+        self.assertEqual( listener.rows, history.entries )
+        self.assertEqual( listener.resets, 1 )
+        self.assertEqual( listener.errors, [] )
+
     def test_getEntry_negative(self):
         history = WorkLogData()
         history.addEntryTime( date(year=2020, month=3, day=24),
@@ -59,3 +116,255 @@ class WorkLogDataTest(unittest.TestCase):
         history.addEntryTime( date(year=2020, month=3, day=25),
                               time(hour=6, minute=0), time(hour=12, minute=0), "yyy" )
         self.assertEqual( history[-1].description, "yyy" )
+
+    def test_findEntries_index(self):
+        rand = random.Random( 0 )
+        history = WorkLogData()
+        baseTime = datetime( year=2020, month=3, day=1 )
+
+        def check_queries():
+            for day in range( 0, 12 ):
+                dateValue = ( baseTime + timedelta( days=day ) ).date()
+                expected = [ entry for entry in history.entries
+                             if entry.startTime.date() <= dateValue and entry.endTime.date() >= dateValue ]
+                self.assertEqual( history.getEntriesForDate( dateValue ), expected )
+            fromTime = baseTime + timedelta( minutes=rand.randint( 0, 10 * 24 * 60 ) )
+            toTime   = fromTime + timedelta( minutes=rand.randint( 0, 24 * 60 ) )
+            expected = [ entry for entry in history.entries if entry.endTime >= fromTime and entry.startTime <= toTime ]
+            self.assertEqual( history.findEntriesInRange( fromTime, toTime ), expected )
+
+        for _ in range( 200 ):
+            entry = WorkLogEntry()
+            entry.startTime = baseTime + timedelta( minutes=rand.randint( 0, 10 * 24 * 60 ) )
+            entry.endTime   = entry.startTime + timedelta( minutes=rand.randint( 0, 30 * 60 ) )
+            history.addEntry( entry )
+            check_queries()
+            if rand.random() < 0.3:
+                history.removeEntry( rand.choice( history.entries ) )
+                check_queries()
+            if rand.random() < 0.3:
+                modified = rand.choice( history.entries )
+                modified.endTime = modified.endTime + timedelta( minutes=rand.randint( -60, 24 * 60 ) )
+                check_queries()
+            if rand.random() < 0.1:
+                ## breaks order of entries
+                history.recentEntry().startTime = baseTime
+                check_queries()
+                history.sort()
+                check_queries()
+
+    def test_getEntryIndex(self):
+        history = WorkLogData()
+        entries = []
+        for hour in range(0, 20, 2):
+            entries.append( history.addEntryTime( date(year=2020, month=3, day=24), time(hour=hour), time(hour=hour + 1) ) )
+        for i, entry in enumerate( entries ):
+            self.assertEqual( history.getEntryIndex( entry ), i )
+
+        history.removeEntry( entries[3] )
+        self.assertRaises( ValueError, history.getEntryIndex, entries[3] )
+        self.assertIs( history.nextEntry( entries[2] ), entries[4] )
+        self.assertIs( history.prevEntry( entries[4] ), entries[2] )
+        self.assertEqual( history.getEntryIndex( entries[-1] ), len( entries ) - 2 )
+
+        earlyEntry = history.addEntryTime( date(year=2020, month=3, day=23), time(hour=10), time(hour=11) )
+        self.assertEqual( history.getEntryIndex( earlyEntry ), 0 )
+        self.assertIs( history.prevEntry( entries[0] ), earlyEntry )
+        self.assertIsNone( history.nextEntry( entries[-1] ) )
+        self.assertRaises( ValueError, history.getEntryIndex, WorkLogEntry() )
+
+    def test_entryId(self):
+        history = WorkLogData()
+        entries = []
+        for hour in range(0, 10, 2):
+            entries.append( history.addEntryTime( date(year=2020, month=3, day=24), time(hour=hour), time(hour=hour + 1) ) )
+        self.assertEqual( [ entry.entryId for entry in entries ], [ 1, 2, 3, 4, 5 ] )
+        self.assertIs( history.getEntryById( 3 ), entries[2] )
+        self.assertEqual( history.getRowById( 3 ), 2 )
+
+        ## edited copy keeps identifier
+        newEntry = copy.deepcopy( entries[2] )
+        newEntry.startTime = datetime( year=2020, month=3, day=24, hour=9 )
+        history.replaceEntry( entries[2], newEntry )
+        self.assertEqual( newEntry.entryId, 3 )
+        self.assertIs( history.getEntryById( 3 ), newEntry )
+        self.assertEqual( history.getRowById( 3 ), 4 )
+
+        ## copy added next to original gets new identifier
+        dupEntry = copy.deepcopy( entries[0] )
+        history.addEntry( dupEntry )
+        self.assertEqual( dupEntry.entryId, 6 )
+
+        ## removed identifiers are not reused
+        history.removeEntry( dupEntry )
+        self.assertIsNone( history.getEntryById( 6 ) )
+        self.assertRaises( ValueError, history.getRowById, 6 )
+        self.assertEqual( history.addEntryTime( date(year=2020, month=3, day=25), time(hour=1), time(hour=2) ).entryId, 7 )
+
+        loaded = pickle.loads( pickle.dumps( history ) )
+        self.assertEqual( [ entry.entryId for entry in loaded.entries ], [ entry.entryId for entry in history.entries ] )
+        self.assertEqual( loaded.getRowById( 3 ), 4 )
+        self.assertEqual( loaded.addEntryTime( date(year=2020, month=3, day=26), time(hour=1), time(hour=2) ).entryId, 8 )
+
+    def test_getChanges(self):
+        history = WorkLogData()
+        entries = []
+        for hour in range(0, 6, 2):
+            entries.append( history.addEntryTime( date(year=2020, month=3, day=24), time(hour=hour), time(hour=hour + 1) ) )
+        history.clearChanges()
+        self.assertEqual( history.getChanges(), ( [], [] ) )
+
+        entries[0].description = "xxx"
+        newEntry = copy.deepcopy( entries[1] )
+        newEntry.endTime = datetime( year=2020, month=3, day=24, hour=4 )
+        history.replaceEntry( entries[1], newEntry )
+        history.removeEntry( entries[2] )
+        ## entry created and removed between clearing is not reported
+        tmpEntry = history.addEntryTime( date(year=2020, month=3, day=25), time(hour=1), time(hour=2) )
+        history.removeEntry( tmpEntry )
+        self.assertEqual( history.getChanges(), ( [ entries[0], newEntry ], [ entries[2] ] ) )
+
+        ## undo of removal
+        history.addEntry( entries[2] )
+        self.assertEqual( history.getChanges(), ( [ entries[0], newEntry, entries[2] ], [] ) )
+        history.clearChanges( [ entries[0] ] )
+        self.assertEqual( history.getChanges(), ( [ newEntry, entries[2] ], [] ) )
+
+    def test_getDayDuration(self):
+        history = WorkLogData()
+        history.addEntryTime( date(year=2020, month=3, day=24), time(hour=6), time(hour=12), "xxx" )
+        history.addEntryTime( date(year=2020, month=3, day=24), time(hour=12), time(hour=13), "yyy", work=False )
+        nightEntry = history.addEntryTime( date(year=2020, month=3, day=24), time(hour=22), time(hour=23) )
+        nightEntry.endTime = datetime( year=2020, month=3, day=25, hour=2 )
+
+        day24 = date(year=2020, month=3, day=24)
+        day25 = date(year=2020, month=3, day=25)
+        self.assertEqual( history.getDayDuration( day24 ), ( timedelta( hours=8 ), timedelta( hours=1 ) ) )
+        self.assertEqual( history.getDayDuration( day25 ), ( timedelta( hours=2 ), timedelta() ) )
+        self.assertEqual( history.getDayDuration( date(year=2020, month=3, day=26) ), ( timedelta(), timedelta() ) )
+
+        ## modification invalidates only touched days
+        nightEntry.endTime = datetime( year=2020, month=3, day=25, hour=1 )
+        self.assertIn( day24, history._dayDurations )
+        self.assertNotIn( day25, history._dayDurations )
+        self.assertEqual( history.getDayDuration( day24 ), ( timedelta( hours=8 ), timedelta( hours=1 ) ) )
+        self.assertEqual( history.getDayDuration( day25 ), ( timedelta( hours=1 ), timedelta() ) )
+
+        nightEntry.work = False
+        self.assertEqual( history.getDayDuration( day24 ), ( timedelta( hours=6 ), timedelta( hours=3 ) ) )
+        self.assertEqual( history.getDayDuration( day25 ), ( timedelta(), timedelta( hours=1 ) ) )
+
+        history.removeEntry( nightEntry )
+        self.assertEqual( history.getDayDuration( day24 ), ( timedelta( hours=6 ), timedelta( hours=1 ) ) )
+        self.assertEqual( history.getDayDuration( day25 ), ( timedelta(), timedelta() ) )
+
+    def test_generation_entryModified(self):
+        history = WorkLogData()
+        entry = history.addEntryTime( date(year=2020, month=3, day=24),
+                                      time(hour=6, minute=0), time(hour=12, minute=0), "xxx" )
+        generation = history.generation
+        entry.endTime = datetime( year=2020, month=3, day=24, hour=12, minute=0, second=30 )
+        self.assertEqual( history.generation, generation )
+        entry.endTime = datetime( year=2020, month=3, day=24, hour=13, minute=0 )
+        self.assertGreater( history.generation, generation )
+
+        generation = history.generation
+        history.removeEntry( entry )
+        self.assertGreater( history.generation, generation )
+        generation = history.generation
+        entry.description = "yyy"
+        self.assertEqual( history.generation, generation )
+
+    def test_generation_notes(self):
+        container = DataContainer()
+        generation = container.generation()
+        container.setNotes( { "notes": "" } )
+        self.assertEqual( container.generation(), generation )
+        container.setNotes( { "notes": "aaa" } )
+        self.assertNotEqual( container.generation(), generation )
+
+    def test_pickle_transient(self):
+        history = WorkLogData()
+        entry = history.addEntryTime( date(year=2020, month=3, day=24),
+                                      time(hour=6, minute=0), time(hour=12, minute=0), "xxx" )
+        entryCopy = copy.deepcopy( entry )
+        self.assertIsNone( entryCopy._owner )
+
+        loaded = pickle.loads( pickle.dumps( history ) )
+        loadedEntry = loaded[0]
+        self.assertIs( loadedEntry._owner, loaded )
+        self.assertEqual( loadedEntry.description, "xxx" )
+        self.assertNotIn( "_generation", loadedEntry.__getstate__() )
+
+    def test_pickle_slots(self):
+        entry = WorkLogEntry()
+        entry.startTime   = datetime( year=2020, month=3, day=24, hour=6, second=10 )
+        entry.endTime     = datetime( year=2020, month=3, day=24, hour=12 )
+        entry.description = "".join( [ "screen saver ", "changed" ] )
+        self.assertFalse( hasattr( entry, "__dict__" ) )
+        self.assertEqual( entry.startTime, datetime( year=2020, month=3, day=24, hour=6 ) )
+        self.assertIs( entry.description, sys.intern( "screen saver changed" ) )
+
+        state = entry.__getstate__()
+        self.assertEqual( state, { "_class_version": 6,
+                                   "_startTime": datetime( year=2020, month=3, day=24, hour=6 ),
+                                   "_endTime": datetime( year=2020, month=3, day=24, hour=12 ),
+                                   "_work": True,
+                                   "_description": "screen saver changed",
+                                   "_id": None } )
+        loaded = pickle.loads( pickle.dumps( entry ) )
+        self.assertEqual( loaded.startMinutes, entry.startMinutes )
+        self.assertEqual( loaded.endTime, entry.endTime )
+        self.assertIs( loaded.description, entry.description )
+        self.assertIsNone( loaded._owner )
+
+    def test_setstate_version4(self):
+        entry = WorkLogEntry()
+        entry.__setstate__( { "_class_version": 4,
+                              "_startTime": datetime( year=2020, month=3, day=24, hour=6, second=10 ),
+                              "_endTime": datetime( year=2020, month=3, day=24, hour=12 ),
+                              "work": False,
+                              "description": "xxx" } )
+        self.assertEqual( entry.startTime, datetime( year=2020, month=3, day=24, hour=6 ) )
+        self.assertEqual( entry.work, False )
+        self.assertEqual( entry.description, "xxx" )
+        self.assertIsNone( entry.entryId )
+
+
+class MirrorListener( EntriesListener ):
+    """Keep copy of rows like item model and check that rows are consistent on each notification."""
+
+    def __init__(self, history: WorkLogData):
+        self.history = history
+        self.rows = list( history.entries )
+        self.pending = None
+        self.resets = 0
+        self.errors = []
+
+    def _check(self):
+        if self.rows != self.history.entries:
+            self.errors.append( len( self.rows ) )
+
+    def beginInsertEntries(self, first: int, last: int):
+        self._check()
+        self.pending = ( first, last )
+
+    def endInsertEntries(self):
+        first, last = self.pending
+        self.rows[ first:first ] = self.history.entries[ first:last + 1 ]
+        self._check()
+
+    def beginRemoveEntries(self, first: int, last: int):
+        self._check()
+        self.pending = ( first, last )
+
+    def endRemoveEntries(self):
+        first, last = self.pending
+        del self.rows[ first:last + 1 ]
+        self._check()
+
+    def beginResetEntries(self):
+        self.resets += 1
+
+    def endResetEntries(self):
+        self.rows = list( self.history.entries )
@@ -0,0 +1,171 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import unittest
+import os
+import gzip
+import tempfile
+import datetime
+
+from worklog.gui import logimport
+from worklog.gui.datatypes import WorkLogEntry
+
+
+class LogImportTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.logPath = os.path.join( self.tmpDir.name, "kern.log" )
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        self.tmpDir.cleanup()
+
+    def writeFile(self, fileName, content: bytes):
+        filePath = os.path.join( self.tmpDir.name, fileName )
+        opener = gzip.open if fileName.endswith( ".gz" ) else open
+        with opener( filePath, 'wb' ) as fp:
+            fp.write( content )
+        return filePath
+
+    def test_find_rotated_logs(self):
+        for fileName in ( "kern.log", "kern.log.1", "kern.log.2.gz", "kern.log.10.gz", "kern.log.old", "kern.logx.1", "syslog.1" ):
+            self.writeFile( fileName, b"" )
+        fileNames = [ os.path.basename( path ) for path in logimport.find_rotated_logs( self.logPath ) ]
+        self.assertEqual( fileNames, [ "kern.log.10.gz", "kern.log.2.gz", "kern.log.1", "kern.log" ] )
+
+        os.remove( self.logPath )
+        self.assertEqual( len( logimport.find_rotated_logs( self.logPath ) ), 3 )
+        self.assertEqual( logimport.find_rotated_logs( os.path.join( self.tmpDir.name, "missing", "kern.log" ) ), [] )
+
+    def test_open_log_file(self):
+        content = b"line 1\nline 2\n"
+        for fileName in ( "kern.log.1", "kern.log.2.gz" ):
+            filePath = self.writeFile( fileName, content )
+            with logimport.open_log_file( filePath ) as fp:
+                self.assertEqual( list( fp ), [ b"line 1\n", b"line 2\n" ] )
+
+    def test_getFileState(self):
+        importState = logimport.LogImportState()
+        self.writeFile( "kern.log", b"line 1\n" )
+        fileState, fileSize = importState.getFileState( self.logPath )
+        self.assertEqual( fileSize, 7 )
+        fileState.offset = fileSize
+
+        ## rotation: state follows the file, new file gets new state
+        os.rename( self.logPath, self.logPath + ".1" )
+        self.writeFile( "kern.log", b"line 2\n" )
+        self.assertIs( importState.getFileState( self.logPath + ".1" )[0], fileState )
+        self.assertEqual( importState.getFileState( self.logPath )[0].offset, 0 )
+        self.assertEqual( importState.getFileState( self.logPath + ".5" ), ( None, 0 ) )
+
+    def test_store_interrupted(self):
+        importState = logimport.LogImportState()
+        self.writeFile( "kern.log", b"line 1\n" )
+        fileState, fileSize = importState.getFileState( self.logPath )
+        fileState.offset = fileSize
+        importState.store( self.tmpDir.name )
+
+        ## writing fails in the middle of serialization
+        fileState.offset = 0
+        importState.files[ self.logPath + ".x" ] = Unpicklable()
+        with self.assertRaises( OSError ):
+            importState.store( self.tmpDir.name )
+
+        loaded = logimport.LogImportState.load( self.tmpDir.name )
+        self.assertEqual( loaded.getFileState( self.logPath )[0].offset, 7 )
+
+    def test_merge_log_items(self):
+        def span( startHour, endHour ):
+            return ( datetime.datetime( 2020, 11, 2, startHour ), datetime.datetime( 2020, 11, 2, endHour ) )
+
+        entry1 = WorkLogEntry()
+        entry1.startTime, entry1.endTime = span( 8, 10 )
+        entry1.description = "aaa"
+        entry2 = WorkLogEntry()
+        entry2.startTime, entry2.endTime = span( 11, 12 )
+        entry2.description = "bbb"
+        entry3 = WorkLogEntry()
+        entry3.startTime, entry3.endTime = span( 14, 15 )
+
+        ## first interval spans two entries, next two create entry merged by the last one
+        items = [ span( 9, 11 ), span( 16, 17 ), span( 18, 19 ), span( 17, 18 ), span( 20, 21 ) ]
+        newEntries, mergedEntries = logimport.merge_log_items( [ entry1, entry2, entry3 ], items )
+
+        self.assertEqual( ( entry1.startTime, entry1.endTime ), span( 8, 12 ) )
+        self.assertEqual( entry1.description, "aaa\nbbb" )
+        self.assertEqual( mergedEntries, [ entry2 ] )
+        self.assertEqual( ( entry3.startTime, entry3.endTime ), span( 14, 15 ) )
+        self.assertEqual( [ ( entry.startTime, entry.endTime ) for entry in newEntries ], [ span( 16, 19 ), span( 20, 21 ) ] )
+
+    def test_merge_log_items_break(self):
+        def span( startHour, endHour ):
+            return ( datetime.datetime( 2020, 11, 2, startHour ), datetime.datetime( 2020, 11, 2, endHour ) )
+
+        workEntry = WorkLogEntry()
+        workEntry.startTime, workEntry.endTime = span( 8, 10 )
+        breakEntry = WorkLogEntry()
+        breakEntry.startTime, breakEntry.endTime = span( 10, 12 )
+        breakEntry.work = False
+        nextEntry = WorkLogEntry()
+        nextEntry.startTime, nextEntry.endTime = span( 12, 14 )
+
+        ## break is not merged into work entries
+        newEntries, mergedEntries = logimport.merge_log_items( [ workEntry, breakEntry, nextEntry ],
+                                                               [ span( 9, 11 ), span( 11, 13 ) ] )
+        self.assertEqual( mergedEntries, [ nextEntry ] )
+        self.assertEqual( ( workEntry.startTime, workEntry.endTime ), span( 8, 14 ) )
+        self.assertEqual( ( breakEntry.startTime, breakEntry.endTime ), span( 10, 12 ) )
+        self.assertEqual( newEntries, [] )
+
+        ## activity during break creates new entry
+        newEntries, mergedEntries = logimport.merge_log_items( [ breakEntry ], [ span( 10, 11 ) ] )
+        self.assertEqual( mergedEntries, [] )
+        self.assertEqual( [ ( entry.startTime, entry.endTime, entry.work ) for entry in newEntries ],
+                          [ span( 10, 11 ) + ( True, ) ] )
+        self.assertEqual( ( breakEntry.startTime, breakEntry.endTime ), span( 10, 12 ) )
+
+    def test_merge_log_items_order(self):
+        def span( startHour, endHour ):
+            return ( datetime.datetime( 2020, 11, 2, startHour ), datetime.datetime( 2020, 11, 2, endHour ) )
+
+        entry1 = WorkLogEntry()
+        entry1.startTime, entry1.endTime = span( 10, 11 )
+        entry1.description = "bbb"
+        entry2 = WorkLogEntry()
+        entry2.startTime, entry2.endTime = span( 8, 9 )
+        entry2.description = "aaa"
+
+        ## overlapped entries are not in start order
+        newEntries, mergedEntries = logimport.merge_log_items( [ entry1, entry2 ], [ span( 9, 10 ) ] )
+
+        self.assertEqual( newEntries, [] )
+        self.assertEqual( mergedEntries, [ entry1 ] )
+        self.assertEqual( ( entry2.startTime, entry2.endTime ), span( 8, 11 ) )
+        self.assertEqual( entry2.description, "aaa\nbbb" )
+
+
+class Unpicklable():
+
+    def __reduce__(self):
+        raise OSError( "disk full" )
@@ -0,0 +1,150 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import unittest
+import random
+
+from datetime import datetime, timedelta
+
+from worklog.gui import overlaps
+from worklog.gui.datatypes import WorkLogData, WorkLogEntry
+
+
+class OverlapsTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.history = WorkLogData()
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        pass
+
+    def addEntry(self, startHour, endHour, work=True, description=""):
+        dayStart = datetime( 2020, 3, 24 )
+        entry = WorkLogEntry.fromValues( dayStart + timedelta( hours=startHour ), dayStart + timedelta( hours=endHour ),
+                                         work, description )
+        self.history.addEntry( entry )
+        return entry
+
+    def spans(self):
+        return [ ( entry.startTime.hour, entry.endTime.hour, entry.work ) for entry in self.history.entries ]
+
+    def test_find_overlaps(self):
+        first  = self.addEntry( 6, 12 )
+        second = self.addEntry( 8, 9, work=False )
+        third  = self.addEntry( 10, 14 )
+        self.addEntry( 14, 15 )
+        self.addEntry( 11, 11 )
+        self.assertEqual( overlaps.find_overlaps( self.history.entries ), [ ( first, second ), ( first, third ) ] )
+
+    def test_normalize_history(self):
+        self.addEntry( 6, 12, description="aaa" )
+        self.addEntry( 8, 9, work=False )
+        self.addEntry( 10, 14, description="bbb" )
+        self.addEntry( 13, 16, work=False )
+        self.addEntry( 17, 17 )
+        normalization = overlaps.normalize_history( self.history )
+        self.assertEqual( len( normalization.removed ), 3 )
+        self.assertEqual( self.spans(), [ ( 6, 14, True ), ( 14, 16, False ) ] )
+        self.assertEqual( self.history.entries[0].description, "aaa\nbbb" )
+        self.assertEqual( overlaps.find_overlaps( self.history.entries ), [] )
+        self.assertTrue( overlaps.normalize_history( self.history ).isEmpty() )
+
+    def test_normalize_history_clip(self):
+        self.addEntry( 6, 12 )
+        self.addEntry( 10, 14 )
+        overlaps.normalize_history( self.history, mergeSameWork=False )
+        self.assertEqual( self.spans(), [ ( 6, 12, True ), ( 12, 14, True ) ] )
+
+    def test_normalize_history_random(self):
+        rand = random.Random( 7 )
+        for _ in range( 300 ):
+            startHour = rand.randint( 0, 200 )
+            self.addEntry( startHour, startHour + rand.randint( 0, 5 ), work=rand.random() < 0.5 )
+        overlaps.normalize_history( self.history )
+        self.assertEqual( overlaps.find_overlaps( self.history.entries ), [] )
+        self.assertTrue( all( entry.endTime > entry.startTime for entry in self.history.entries ) )
+        startTimes = [ entry.startTime for entry in self.history.entries ]
+        self.assertEqual( startTimes, sorted( startTimes ) )
+        self.assertEqual( [ self.history.getEntryIndex( entry ) for entry in self.history.entries ],
+                          list( range( self.history.size() ) ) )
+
+    def test_plan_compaction(self):
+        first = self.addEntry( 6, 8, description="aaa" )
+        self.addEntry( 8, 8 )
+        self.addEntry( 8, 10, description="bbb" )
+        self.addEntry( 10, 11, work=False )
+        self.addEntry( 12, 13, work=False )
+        recent = self.addEntry( 13, 13, work=False )
+        normalization = overlaps.plan_compaction( self.history.entries, recent )
+        self.assertEqual( len( normalization.removed ), 2 )
+        normalization.apply( self.history )
+        self.assertEqual( self.spans(), [ ( 6, 10, True ), ( 10, 11, False ), ( 12, 13, False ), ( 13, 13, False ) ] )
+        self.assertEqual( first.description, "aaa\nbbb" )
+
+    def test_plan_compaction_descriptions(self):
+        self.addEntry( 5, 5, description="xxx" )
+        first = self.addEntry( 6, 8, description="aaa" )
+        self.addEntry( 8, 8, description="bbb" )
+        self.addEntry( 9, 9 )
+        normalization = overlaps.plan_compaction( self.history.entries )
+        self.assertEqual( len( normalization.removed ), 3 )
+        normalization.apply( self.history )
+        self.assertEqual( self.spans(), [ ( 6, 8, True ) ] )
+        self.assertEqual( first.description, "xxx\naaa\nbbb" )
+
+    def test_plan_compaction_lone_description(self):
+        self.addEntry( 6, 6, description="aaa" )
+        normalization = overlaps.plan_compaction( self.history.entries )
+        self.assertTrue( normalization.isEmpty() )
+
+    def test_plan_compaction_frozen(self):
+        first  = self.addEntry( 6, 8 )
+        second = self.addEntry( 8, 10 )
+        self.addEntry( 10, 12 )
+        self.addEntry( 12, 12 )
+        normalization = overlaps.plan_compaction( self.history.entries, frozenIds={ second.entryId } )
+        self.assertEqual( len( normalization.removed ), 1 )
+        normalization.apply( self.history )
+        self.assertEqual( self.spans(), [ ( 6, 8, True ), ( 8, 10, True ), ( 10, 12, True ) ] )
+        self.assertIn( first, self.history.entries )
+
+    def test_plan_compaction_fragments(self):
+        self.addEntry( 6, 8, description="aaa" )
+        self.addEntry( 8, 10, description="bbb" )
+        self.addEntry( 10, 11 )
+        self.addEntry( 11, 12, description="screen saver changed" )
+        self.addEntry( 12, 12, description="ccc" )
+        normalization = overlaps.plan_compaction( self.history.entries, fragmentsOnly=True )
+        self.assertEqual( len( normalization.removed ), 1 )
+        normalization.apply( self.history )
+        self.assertEqual( self.spans(), [ ( 6, 8, True ), ( 8, 10, True ), ( 10, 12, True ), ( 12, 12, True ) ] )
+        self.assertEqual( self.history.entries[2].description, "screen saver changed" )
+
+    def test_compaction_candidates(self):
+        self.addEntry( 6, 8 )
+        self.assertEqual( overlaps.compaction_candidates( self.history ), [] )
+        self.history.markCompacted()
+        self.assertEqual( overlaps.compaction_candidates( self.history ), [] )
+        entry = self.addEntry( 30, 31 )
+        self.assertEqual( overlaps.compaction_candidates( self.history ), [ entry ] )
@@ -0,0 +1,72 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import unittest
+
+from worklog.gui.savescheduler import SaveScheduler
+
+
+class SaveSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.currTime = 0
+        self.saves = 0
+        self.scheduler = SaveScheduler( delay=5000, maxLatency=30000, minInterval=10000 )
+        self.scheduler._currentTime = lambda: self.currTime
+        self.scheduler.saveTriggered.connect( self._saved )
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        self.scheduler.cancel()
+
+    def _saved(self):
+        self.saves += 1
+
+    def test_debounce(self):
+        self.scheduler.request()
+        self.assertEqual( self.scheduler.calculateTimeout( self.currTime ), 5000 )
+        self.currTime = 3000
+        self.scheduler.request()
+        self.assertEqual( self.scheduler.calculateTimeout( self.currTime ), 5000 )
+        self.assertTrue( self.scheduler.isPending() )
+
+    def test_maxLatency(self):
+        for i in range(0, 40):
+            self.currTime = i * 1000
+            self.scheduler.request()
+        ## first request at 0
+        self.assertEqual( self.scheduler.calculateTimeout( 27000 ), 3000 )
+        self.assertEqual( self.scheduler.calculateTimeout( 39000 ), 0 )
+
+    def test_minInterval(self):
+        self.scheduler.request()
+        self.scheduler.flush()
+        self.assertEqual( self.saves, 1 )
+        self.assertFalse( self.scheduler.isPending() )
+
+        self.currTime = 1000
+        self.scheduler.request()
+        self.assertEqual( self.scheduler.calculateTimeout( self.currTime ), 9000 )
+        self.scheduler.flush()
+        self.scheduler.flush()
+        self.assertEqual( self.saves, 2 )
@@ -0,0 +1,126 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import unittest
+import os
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+
+from worklog import persist
+
+
+class BackupStoreTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.backupDir = os.path.join( self.tmpDir.name, "data.obj.backup" )
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        self.tmpDir.cleanup()
+
+    def objectsNum(self):
+        return len( [ name for name in os.listdir( self.backupDir ) if name.endswith(".gz") ] )
+
+    def test_addBackup_sameHour(self):
+        store = persist.BackupStore( self.backupDir )
+        store.addBackup( b"aaa", timestamp=datetime( 2020, 3, 24, 10, 5 ) )
+        store.addBackup( b"bbb", timestamp=datetime( 2020, 3, 24, 10, 45 ) )
+        backupsList = store.listBackups()
+        self.assertEqual( len( backupsList ), 1 )
+        self.assertEqual( store.loadContent( backupsList[0][1] ), b"bbb" )
+        self.assertEqual( self.objectsNum(), 1 )
+
+    def test_addBackup_dedup(self):
+        store = persist.BackupStore( self.backupDir )
+        store.addBackup( b"aaa", timestamp=datetime( 2020, 3, 24, 10, 5 ) )
+        store.addBackup( b"aaa", timestamp=datetime( 2020, 3, 24, 11, 5 ) )
+        store.addBackup( b"aaa", timestamp=datetime( 2020, 3, 24, 12, 5 ) )
+        self.assertEqual( len( store.listBackups() ), 3 )
+        self.assertEqual( self.objectsNum(), 1 )
+
+    def test_addBackup_retention(self):
+        store = persist.BackupStore( self.backupDir )
+        startTime = datetime( 2020, 1, 1, 0, 30 )
+        for hour in range( 0, 24 * 90 ):
+            content = str( hour ).encode()
+            store.addBackup( content, timestamp=startTime + timedelta( hours=hour ) )
+        backupsList = store.listBackups()
+        ## 24 hourly + 31 daily + monthly
+        self.assertLessEqual( len( backupsList ), 24 + 31 + 3 )
+        self.assertEqual( self.objectsNum(), len( backupsList ) )
+        timestamps = [ item[0] for item in backupsList ]
+        self.assertEqual( timestamps, sorted( timestamps ) )
+        self.assertEqual( backupsList[-1][0], startTime + timedelta( hours=24 * 90 - 1 ) )
+
+        ## reload index
+        store = persist.BackupStore( self.backupDir )
+        self.assertEqual( store.listBackups(), backupsList )
+
+    def test_addBackup_names(self):
+        store = persist.BackupStore( self.backupDir )
+        store.addBackup( b"aaa", timestamp=datetime( 2020, 3, 24, 10, 5 ), name="2020-02.col" )
+        store.addBackup( b"bbb", timestamp=datetime( 2020, 3, 24, 10, 15 ), name="2020-03.col" )
+        store.addBackup( b"aaa", timestamp=datetime( 2020, 3, 24, 10, 25 ), name="2020-03.col" )
+        ## backups of other name in the same hour are kept
+        self.assertEqual( len( store.listBackups( "2020-02.col" ) ), 1 )
+        self.assertEqual( len( store.listBackups( "2020-03.col" ) ), 1 )
+        self.assertEqual( store.listBackups(), [] )
+        self.assertEqual( self.objectsNum(), 1 )
+
+        store = persist.BackupStore( self.backupDir )
+        self.assertEqual( store.loadContent( store.listBackups( "2020-03.col" )[0][1] ), b"aaa" )
+        self.assertEqual( store.listBackups( "2020-02.col" )[0][0], datetime( 2020, 3, 24, 10, 5 ) )
+
+    def test_importLegacy(self):
+        archivePath = os.path.join( self.tmpDir.name, "data.obj.zip" )
+        for suffix, content in [ ("", b"ccc"), (".1", b"bbb"), (".2", b"aaa") ]:
+            with zipfile.ZipFile( archivePath + suffix, 'w' ) as zipf:
+                zipf.writestr( "data.obj", content )
+        store = persist.BackupStore( self.backupDir, legacyArchive=archivePath )
+        backupsList = store.listBackups()
+        self.assertGreaterEqual( len( backupsList ), 1 )
+        self.assertEqual( store.loadContent( backupsList[-1][1] ), b"ccc" )
+        self.assertFalse( os.path.isfile( archivePath ) )
+        self.assertFalse( os.path.isfile( archivePath + ".1" ) )
+
+    def test_importLegacy_failed(self):
+        archivePath = os.path.join( self.tmpDir.name, "data.obj.zip" )
+        with zipfile.ZipFile( archivePath + ".1", 'w' ) as zipf:
+            zipf.writestr( "data.obj", b"aaa" )
+        with open( archivePath, 'wb' ) as fp:
+            fp.write( b"not zip" )
+        store = persist.BackupStore( self.backupDir, legacyArchive=archivePath )
+        self.assertEqual( len( store.listBackups() ), 1 )
+        self.assertFalse( os.path.isfile( archivePath + ".1" ) )
+        ## failed archive is kept and retried
+        self.assertTrue( os.path.isfile( os.path.join( self.backupDir, "index.txt" ) ) )
+        self.assertTrue( os.path.isfile( archivePath ) )
+
+        with zipfile.ZipFile( archivePath, 'w' ) as zipf:
+            zipf.writestr( "data.obj", b"bbb" )
+        store = persist.BackupStore( self.backupDir, legacyArchive=archivePath )
+        backupsList = store.listBackups()
+        self.assertEqual( store.loadContent( backupsList[-1][1] ), b"bbb" )
+        self.assertFalse( os.path.isfile( archivePath ) )
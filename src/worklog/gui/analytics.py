@@ -0,0 +1,389 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Set, Tuple
+
+try:
+    import numpy
+except ImportError:
+    ## numpy is optional -- pure Python aggregation is used instead
+    numpy = None
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+DAY_MINUTES = 24 * 60
+
+## 1970-01-01 (day 0) is Thursday, so weeks starting on Monday begin at day 4
+WEEK_OFFSET = 4
+
+EPOCH_DATE = date( 1970, 1, 1 )
+
+PERIODS = ( "day", "week", "month", "year" )
+
+
+def numpy_available() -> bool:
+    return numpy is not None
+
+
+class HistoryAnalytics():
+    """Read-only view of history calculating durations per day, week, month and year.
+
+    Durations of entries crossing midnight are split between days. If numpy is
+    available, then start and end times are kept in arrays updated from first
+    modified entry and totals are calculated by vectorized operations.
+    """
+
+    def __init__(self, history):
+        ## WorkLogData object
+        self.history = history
+        ## arrays of start minutes, end minutes and work flags (valid for first '_validSize' entries)
+        self._starts = None
+        self._ends   = None
+        self._works  = None
+        self._validSize = 0
+        ## period -> totals
+        self._totalsCache: Dict[ str, Dict[ date, Tuple[ timedelta, timedelta ] ] ] = {}
+        ## cumulative work time per day, created on demand
+        self._rollup: WorkRollup = None
+
+    def invalidate(self, position=0):
+        """Mark data invalid starting from given position of history entries."""
+        if position < self._validSize:
+            self._validSize = position
+        self._totalsCache.clear()
+
+    def invalidateDays(self, startTime: datetime, endTime: datetime):
+        """Mark durations of days in given range as changed."""
+        if self._rollup is not None:
+            self._rollup.invalidateDays( startTime, endTime )
+
+    def getRollup(self) -> 'WorkRollup':
+        """Return cumulative work time per day kept up to date with history."""
+        if self._rollup is None:
+            self._rollup = WorkRollup( self )
+        return self._rollup
+
+    def arrays(self):
+        """Return read-only arrays of start minutes, end minutes and work flags of entries.
+
+        Missing times are represented by end not greater than start.
+        """
+        if numpy is None:
+            raise ImportError( "numpy is required to export arrays" )
+        self._updateArrays()
+        return ( self._starts, self._ends, self._works )
+
+    def getTotals(self, period="day") -> Dict[ date, Tuple[ timedelta, timedelta ] ]:
+        """Return dict: first day of period -> ( work duration, other duration ), ordered by date.
+
+        Periods without any entries are skipped.
+        """
+        if period not in PERIODS:
+            raise ValueError( "unsupported period: %s" % period )
+        totals = self._totalsCache.get( period )
+        if totals is None:
+            if numpy is None:
+                totals = self._calculateTotals( period )
+            else:
+                totals = self._calculateTotalsArrays( period )
+            self._totalsCache[ period ] = totals
+        return totals
+
+    def _updateArrays(self):
+        entries = self.history.entries
+        entriesNum = len( entries )
+        size = min( self._validSize, entriesNum )
+        if self._starts is not None and size == entriesNum and len( self._starts ) == entriesNum:
+            return
+        suffix = entries[ size: ]
+        ## entries with missing times get empty interval
+        newStarts = numpy.fromiter( ( entry.startMinutes if entry.startMinutes is not None and entry.endMinutes is not None else 0
+                                      for entry in suffix ), dtype=numpy.int64, count=len( suffix ) )
+        newEnds   = numpy.fromiter( ( entry.endMinutes if entry.startMinutes is not None and entry.endMinutes is not None else 0
+                                      for entry in suffix ), dtype=numpy.int64, count=len( suffix ) )
+        newWorks  = numpy.fromiter( ( bool( entry.work ) for entry in suffix ), dtype=bool, count=len( suffix ) )
+        if self._starts is None or size == 0:
+            self._starts, self._ends, self._works = newStarts, newEnds, newWorks
+        else:
+            self._starts = numpy.concatenate( ( self._starts[ :size ], newStarts ) )
+            self._ends   = numpy.concatenate( ( self._ends[ :size ], newEnds ) )
+            self._works  = numpy.concatenate( ( self._works[ :size ], newWorks ) )
+        for item in ( self._starts, self._ends, self._works ):
+            item.setflags( write=False )
+        self._validSize = entriesNum
+
+    def _calculateTotalsArrays(self, period):
+        starts, ends, works = self.arrays()
+        valid  = ends > starts
+        starts = starts[ valid ]
+        ends   = ends[ valid ]
+        works  = works[ valid ]
+        if starts.size == 0:
+            return {}
+
+        ## split intervals at midnight: one piece per day touched by interval
+        firstDays = starts // DAY_MINUTES
+        lastDays  = ( ends - 1 ) // DAY_MINUTES
+        counts    = lastDays - firstDays + 1
+        pieceOwner  = numpy.repeat( numpy.arange( starts.size ), counts )
+        pieceOffset = numpy.arange( pieceOwner.size ) - numpy.repeat( numpy.cumsum( counts ) - counts, counts )
+        pieceDays   = firstDays[ pieceOwner ] + pieceOffset
+        pieceStarts = numpy.maximum( starts[ pieceOwner ], pieceDays * DAY_MINUTES )
+        pieceEnds   = numpy.minimum( ends[ pieceOwner ], ( pieceDays + 1 ) * DAY_MINUTES )
+        pieceLength = pieceEnds - pieceStarts
+        pieceWork   = works[ pieceOwner ]
+
+        ## minutes per day since first day
+        minDay = int( firstDays.min() )
+        dayIndex = pieceDays - minDay
+        workMinutes  = numpy.bincount( dayIndex[ pieceWork ], weights=pieceLength[ pieceWork ],
+                                       minlength=int( dayIndex.max() ) + 1 )
+        otherMinutes = numpy.bincount( dayIndex[ ~pieceWork ], weights=pieceLength[ ~pieceWork ],
+                                       minlength=workMinutes.size )
+        days = numpy.arange( workMinutes.size, dtype=numpy.int64 ) + minDay
+        used = ( workMinutes + otherMinutes ) > 0
+        days         = days[ used ]
+        workMinutes  = workMinutes[ used ]
+        otherMinutes = otherMinutes[ used ]
+
+        ## first day of bucket of each day (days are sorted, so buckets are continuous)
+        if period == "day":
+            bucketDays = days
+        elif period == "week":
+            bucketDays = days - ( days - WEEK_OFFSET ) % 7
+        else:
+            unit = "M" if period == "month" else "Y"
+            bucketDays = days.astype( "datetime64[D]" ).astype( "datetime64[%s]" % unit ).astype( "datetime64[D]" ).astype( numpy.int64 )
+        bucketStarts = numpy.flatnonzero( numpy.diff( bucketDays ) ) + 1
+        bucketStarts = numpy.concatenate( ( [0], bucketStarts ) )
+        workTotals   = numpy.add.reduceat( workMinutes, bucketStarts )
+        otherTotals  = numpy.add.reduceat( otherMinutes, bucketStarts )
+
+        totals = {}
+        for bucketDay, workValue, otherValue in zip( bucketDays[ bucketStarts ].tolist(), workTotals.tolist(), otherTotals.tolist() ):
+            totals[ EPOCH_DATE + timedelta( days=bucketDay ) ] = ( timedelta( minutes=workValue ), timedelta( minutes=otherValue ) )
+        return totals
+
+    def _calculateTotals(self, period):
+        ## day -> [ work minutes, other minutes ]
+        dayMinutes: Dict[ int, List[ int ] ] = {}
+        for entry in self.history.entries:
+            startMinutes = entry.startMinutes
+            endMinutes   = entry.endMinutes
+            if startMinutes is None or endMinutes is None or endMinutes <= startMinutes:
+                continue
+            flagIndex = 0 if entry.work else 1
+            for day in range( startMinutes // DAY_MINUTES, ( endMinutes - 1 ) // DAY_MINUTES + 1 ):
+                length = min( endMinutes, ( day + 1 ) * DAY_MINUTES ) - max( startMinutes, day * DAY_MINUTES )
+                dayMinutes.setdefault( day, [ 0, 0 ] )[ flagIndex ] += length
+
+        buckets: Dict[ date, List[ int ] ] = {}
+        for day in sorted( dayMinutes ):
+            dayDate = EPOCH_DATE + timedelta( days=day )
+            if period == "week":
+                dayDate -= timedelta( days=dayDate.weekday() )
+            elif period == "month":
+                dayDate = dayDate.replace( day=1 )
+            elif period == "year":
+                dayDate = dayDate.replace( month=1, day=1 )
+            values = dayMinutes[ day ]
+            bucket = buckets.setdefault( dayDate, [ 0, 0 ] )
+            bucket[0] += values[0]
+            bucket[1] += values[1]
+        return { key: ( timedelta( minutes=value[0] ), timedelta( minutes=value[1] ) ) for key, value in buckets.items() }
+
+
+class WorkRollup():
+    """Cumulative work minutes per day (prefix sums) answering sums over any range of days in O(1).
+
+    Changed days are recalculated on next query and cumulative values are
+    updated from first changed day, so changes of recent days are cheap.
+    """
+
+    def __init__(self, analytics: HistoryAnalytics):
+        self.analytics = analytics
+        ## day number (since epoch) of first item of '_dayWork'
+        self._firstDay = 0
+        ## work minutes per day
+        self._dayWork: List[ int ] = []
+        ## '_prefix[i]' is sum of '_dayWork[:i]' (valid for first '_validPrefix' + 1 items)
+        self._prefix: List[ int ] = [ 0 ]
+        self._validPrefix = 0
+        ## numbers of days to recalculate
+        self._dirtyDays: Set[ int ] = set()
+        self._rebuild = True
+
+    def invalidate(self):
+        """Recalculate all days on next query."""
+        self._rebuild = True
+        self._dirtyDays.clear()
+
+    def invalidateDays(self, startTime: datetime, endTime: datetime):
+        if self._rebuild:
+            return
+        if startTime is None or endTime is None:
+            self.invalidate()
+            return
+        firstDay = day_number( min( startTime, endTime ).date() )
+        lastDay  = day_number( max( startTime, endTime ).date() )
+        if firstDay < self._firstDay or lastDay - firstDay > 366:
+            self.invalidate()
+            return
+        self._dirtyDays.update( range( firstDay, lastDay + 1 ) )
+
+    def workMinutes(self, fromDate: date, toDate: date) -> int:
+        """Return work minutes of days from 'fromDate' to 'toDate' (inclusive)."""
+        self._update()
+        fromIndex = max( day_number( fromDate ) - self._firstDay, 0 )
+        toIndex   = min( day_number( toDate ) - self._firstDay + 1, len( self._dayWork ) )
+        if toIndex <= fromIndex:
+            return 0
+        return self._prefix[ toIndex ] - self._prefix[ fromIndex ]
+
+    def workDuration(self, fromDate: date, toDate: date) -> timedelta:
+        return timedelta( minutes=self.workMinutes( fromDate, toDate ) )
+
+    def overtimeBalance(self, fromDate: date, toDate: date, dailyTarget: timedelta) -> timedelta:
+        """Return work time above target of working days (Monday to Friday) in given range.
+
+        Negative value means work time missing to reach the target.
+        """
+        targetTime = dailyTarget * count_workdays( fromDate, toDate )
+        return self.workDuration( fromDate, toDate ) - targetTime
+
+    def _update(self):
+        if self._rebuild:
+            self._build()
+        elif self._dirtyDays:
+            history = self.analytics.history
+            dayWork = self._dayWork
+            dirtyDays = self._dirtyDays
+            lastDay = max( dirtyDays )
+            dayIndex = lastDay - self._firstDay
+            if dayIndex >= len( dayWork ):
+                dayWork.extend( [ 0 ] * ( dayIndex + 1 - len( dayWork ) ) )
+            for day in dirtyDays:
+                workTime = history.getDayDuration( EPOCH_DATE + timedelta( days=day ) )[0]
+                dayWork[ day - self._firstDay ] = workTime // timedelta( minutes=1 )
+            self._validPrefix = min( self._validPrefix, min( dirtyDays ) - self._firstDay )
+            dirtyDays.clear()
+        dayWork = self._dayWork
+        prefix = self._prefix
+        validPrefix = self._validPrefix
+        if validPrefix == len( dayWork ):
+            return
+        del prefix[ validPrefix + 1: ]
+        total = prefix[ validPrefix ]
+        for value in dayWork[ validPrefix: ]:
+            total += value
+            prefix.append( total )
+        self._validPrefix = len( dayWork )
+
+    def _build(self):
+        ## day totals are calculated in one pass over history (vectorized if numpy is available)
+        totals = self.analytics.getTotals( "day" )
+        self._rebuild = False
+        self._dirtyDays.clear()
+        self._prefix = [ 0 ]
+        self._validPrefix = 0
+        if not totals:
+            ## first added days will extend the list
+            self._firstDay = day_number( date.today() ) - 366
+            self._dayWork = []
+            return
+        days = list( totals )
+        self._firstDay = day_number( days[0] )
+        self._dayWork = [ 0 ] * ( day_number( days[-1] ) - self._firstDay + 1 )
+        for day, values in totals.items():
+            self._dayWork[ day_number( day ) - self._firstDay ] = values[0] // timedelta( minutes=1 )
+
+
+def day_number( value: date ) -> int:
+    return ( value - EPOCH_DATE ).days
+
+
+def count_workdays( fromDate: date, toDate: date ) -> int:
+    """Count days from Monday to Friday in given range (inclusive)."""
+    daysNum = ( toDate - fromDate ).days + 1
+    if daysNum <= 0:
+        return 0
+    fullWeeks, restDays = divmod( daysNum, 7 )
+    firstWeekday = fromDate.weekday()
+    restWorkdays = sum( 1 for i in range( restDays ) if ( firstWeekday + i ) % 7 < 5 )
+    return fullWeeks * 5 + restWorkdays
+
+
+def format_balance( value: timedelta ) -> str:
+    """Format signed duration as hours and minutes, e.g. '+1:05' or '-0:30'."""
+    minutes = value // timedelta( minutes=1 )
+    sign = "-" if minutes < 0 else "+"
+    hours, minutes = divmod( abs( minutes ), 60 )
+    return "%s%d:%02d" % ( sign, hours, minutes )
+
+
+def period_start( day: date, period: str ) -> date:
+    """Return first day of week, month or year containing given day."""
+    if period == "day":
+        return day
+    if period == "week":
+        return day - timedelta( days=day.weekday() )
+    if period == "month":
+        return day.replace( day=1 )
+    if period == "year":
+        return day.replace( month=1, day=1 )
+    raise ValueError( "unsupported period: %s" % period )
+
+
+def balance_summary( rollup: WorkRollup, day: date, dailyTarget: timedelta ) -> List[ str ]:
+    """Return lines describing work time and overtime balance of week and month of given day."""
+    lines = []
+    for label, period in ( ( "Week", "week" ), ( "Month", "month" ) ):
+        fromDate = period_start( day, period )
+        workTime = rollup.workDuration( fromDate, day )
+        balance  = rollup.overtimeBalance( fromDate, day, dailyTarget )
+        hours, minutes = divmod( workTime // timedelta( minutes=1 ), 60 )
+        lines.append( "%s: %d:%02d (balance: %s)" % ( label, hours, minutes, format_balance( balance ) ) )
+    return lines
+
+
+def period_report( rollup: WorkRollup, day: date, dailyTarget: timedelta,
+                   period="week", periodsNum=12 ) -> List[ Tuple[ date, date, timedelta, timedelta ] ]:
+    """Return rows ( first day, last day, work time, balance ) of consecutive periods, most recent first.
+
+    Most recent period is the one containing 'day' and ends at 'day'.
+    """
+    if period not in PERIODS:
+        raise ValueError( "unsupported period: %s" % period )
+    rows = []
+    toDate = day
+    for _ in range( periodsNum ):
+        fromDate = period_start( toDate, period )
+        workTime = rollup.workDuration( fromDate, toDate )
+        balance  = rollup.overtimeBalance( fromDate, toDate, dailyTarget )
+        rows.append( ( fromDate, toDate, workTime, balance ) )
+        toDate = fromDate - timedelta( days=1 )
+    return rows
@@ -44,8 +44,9 @@ class AddEntryCommand( QUndoCommand ):
 
     def redo(self):
         self.history.addEntry( self.newEntry )
-        self.data.entryChanged.emit()
+        self.data.notifyEntriesInserted( [ self.newEntry ] )
 
     def undo(self):
+        row = self.history.getEntryIndex( self.newEntry )
         self.history.removeEntry( self.newEntry )
-        self.data.entryChanged.emit()
+        self.data.notifyEntriesRemoved( [ self.newEntry ], [ row ] )
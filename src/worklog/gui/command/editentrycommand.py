@@ -44,9 +44,13 @@ class EditEntryCommand( QUndoCommand ):
         self.setText( "Edit Entry: " + str(newEntry.startTime) )
 
     def redo(self):
-        self.history.replaceEntry( self.oldEntry, self.newEntry )
-        self.data.entryChanged.emit()
+        self._replace( self.oldEntry, self.newEntry )
 
     def undo(self):
-        self.history.replaceEntry( self.newEntry, self.oldEntry )
-        self.data.entryChanged.emit()
+        self._replace( self.newEntry, self.oldEntry )
+
+    def _replace(self, fromEntry, toEntry):
+        row = self.history.getEntryIndex( fromEntry )
+        self.history.replaceEntry( fromEntry, toEntry )
+        self.data.notifyEntriesRemoved( [ fromEntry ], [ row ] )
+        self.data.notifyEntriesInserted( [ toEntry ] )
@@ -46,8 +46,9 @@ class JoinEntryDownCommand( QUndoCommand ):
         history = self.data.history
         nextEntry = history.nextEntry( self.entry )
         history.joinDown( self.entry, nextEntry )
-        self.data.entryChanged.emit()
+        self.data.notifyEntriesModified( [ self.entry ], [ ( self.oldEntry.startTime, self.oldEntry.endTime ) ] )
 
     def undo(self):
-        self.entry.__dict__ = self.oldEntry.__dict__
-        self.data.entryChanged.emit()
+        oldSpan = ( self.entry.startTime, self.entry.endTime )
+        self.entry.assign( self.oldEntry )
+        self.data.notifyEntriesModified( [ self.entry ], [ oldSpan ] )
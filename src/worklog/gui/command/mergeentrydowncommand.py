@@ -46,11 +46,15 @@ class MergeEntryDownCommand( QUndoCommand ):
         history = self.data.history
         self.nextEntry = history.nextEntry( self.entry )
         self.oldEntry = copy.deepcopy( self.nextEntry )
+        row = history.getEntryIndex( self.entry )
         history.mergeDown( self.entry, self.nextEntry )
-        self.data.entryChanged.emit()
+        self.data.notifyEntriesRemoved( [ self.entry ], [ row ] )
+        self.data.notifyEntriesModified( [ self.nextEntry ], [ ( self.oldEntry.startTime, self.oldEntry.endTime ) ] )
 
     def undo(self):
         history = self.data.history
-        self.nextEntry.__dict__ = self.oldEntry.__dict__
+        oldSpan = ( self.nextEntry.startTime, self.nextEntry.endTime )
+        self.nextEntry.assign( self.oldEntry )
         history.addEntry( self.entry )
-        self.data.entryChanged.emit()
+        self.data.notifyEntriesInserted( [ self.entry ] )
+        self.data.notifyEntriesModified( [ self.nextEntry ], [ oldSpan ] )
@@ -46,11 +46,15 @@ class MergeEntryUpCommand( QUndoCommand ):
         history = self.data.history
         self.prevEntry = history.prevEntry( self.entry )
         self.oldEntry = copy.deepcopy( self.prevEntry )
+        row = history.getEntryIndex( self.entry )
         history.mergeUp( self.entry, self.prevEntry )
-        self.data.entryChanged.emit()
+        self.data.notifyEntriesRemoved( [ self.entry ], [ row ] )
+        self.data.notifyEntriesModified( [ self.prevEntry ], [ ( self.oldEntry.startTime, self.oldEntry.endTime ) ] )
 
     def undo(self):
         history = self.data.history
-        self.prevEntry.__dict__ = self.oldEntry.__dict__
+        oldSpan = ( self.prevEntry.startTime, self.prevEntry.endTime )
+        self.prevEntry.assign( self.oldEntry )
         history.addEntry( self.entry )
-        self.data.entryChanged.emit()
+        self.data.notifyEntriesInserted( [ self.entry ] )
+        self.data.notifyEntriesModified( [ self.prevEntry ], [ oldSpan ] )
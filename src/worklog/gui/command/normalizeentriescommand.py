@@ -0,0 +1,67 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import logging
+
+from PyQt5.QtWidgets import QUndoCommand
+
+from worklog.gui.datatypes import WorkLogData, from_minutes
+from worklog.gui.overlaps import EntriesNormalization, entry_values, set_entry_values
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class NormalizeEntriesCommand( QUndoCommand ):
+    """Apply normalization (removing overlaps or compacting entries) calculated in advance."""
+
+    def __init__(self, dataObject, normalization: EntriesNormalization, text="Normalize Entries", parentCommand=None):
+        super().__init__(parentCommand)
+
+        self.data = dataObject
+        self.history: WorkLogData = self.data.history
+        self.normalization = normalization
+        self.oldValues = [ entry_values( entry ) for entry, _ in self.normalization.modified ]
+
+        self.setText( text )
+
+    def redo(self):
+        removed  = self.normalization.removed
+        modified = [ entry for entry, _ in self.normalization.modified ]
+        rows     = [ self.history.getEntryIndex( entry ) for entry in removed ]
+        self.normalization.apply( self.history )
+        self.data.notifyEntriesRemoved( removed, rows )
+        self.data.notifyEntriesModified( modified, [ values_span( values ) for values in self.oldValues ] )
+
+    def undo(self):
+        removed  = self.normalization.removed
+        modified = [ entry for entry, _ in self.normalization.modified ]
+        for entry, values in zip( modified, self.oldValues ):
+            set_entry_values( entry, values )
+        self.history.addEntries( removed )
+        self.data.notifyEntriesInserted( removed )
+        self.data.notifyEntriesModified( modified, [ values_span( values ) for _, values in self.normalization.modified ] )
+
+
+def values_span( values ):
+    return ( from_minutes( values[0] ), from_minutes( values[1] ) )
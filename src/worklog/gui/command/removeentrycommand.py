@@ -43,9 +43,10 @@ class RemoveEntryCommand( QUndoCommand ):
         self.setText( "Remove Entry: " + str(entry.startTime) )
 
     def redo(self):
+        row = self.history.getEntryIndex( self.entry )
         self.history.removeEntry( self.entry )
-        self.data.entryChanged.emit()
+        self.data.notifyEntriesRemoved( [ self.entry ], [ row ] )
 
     def undo(self):
         self.history.addEntry( self.entry )
-        self.data.entryChanged.emit()
+        self.data.notifyEntriesInserted( [ self.entry ] )
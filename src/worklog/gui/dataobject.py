@@ -23,18 +23,24 @@
 
 import logging
 import re
-from typing import Dict, List, Tuple
+import copy
+from typing import Dict, List, Set, Tuple
 import datetime
 from datetime import timedelta
 import pathlib
+import os
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
 
 from PyQt5 import QtCore, QtWidgets, QtGui
 from PyQt5.QtCore import QObject
 from PyQt5.QtCore import pyqtSignal
 from PyQt5.QtWidgets import QWidget, QUndoStack
 
-from worklog.gui.datatypes import DataContainer, WorkLogData, WorkLogEntry
-from worklog import persist
+from worklog.gui.datatypes import DataContainer, WorkLogData, WorkLogEntry, EntriesChange
+from worklog.gui.storage.storagemode import StorageMode, find_recent_mode
+from worklog.gui.storage.sqlitestorage import SqliteStorage
+from worklog.gui.storage.partitionedstorage import PartitionedStorage
 from worklog.gui.widget.entrydialog import EntryDialog
 from worklog.gui.command.addentrycommand import AddEntryCommand
 from worklog.gui.command.editentrycommand import EditEntryCommand
@@ -43,32 +49,208 @@ from worklog.gui.command.joinentryupcommand import JoinEntryUpCommand
 from worklog.gui.command.joinentrydowncommand import JoinEntryDownCommand
 from worklog.gui.command.mergeentryupcommand import MergeEntryUpCommand
 from worklog.gui.command.mergeentrydowncommand import MergeEntryDownCommand
+from worklog.gui.command.normalizeentriescommand import NormalizeEntriesCommand
+from worklog.gui.overlaps import plan_normalization, plan_compaction, compaction_candidates, normalize_history
+from worklog.gui.logimport import LogImportState, LogFileState, find_rotated_logs, is_compressed, open_log_file, merge_log_items
 
 
 _LOGGER = logging.getLogger(__name__)
 
 
+## amount of log data (in bytes) worth parsing in process pool
+PARALLEL_PARSE_SIZE = 4 * 1024 * 1024
+
+
 class DataObject( QObject ):
 
+    ## emitted on bulk changes (e.g. load), listeners have to update whole view
     entryChanged = pyqtSignal()
+    ## emitted when set of loaded entries changed without changing data (e.g. partitions loaded)
+    entriesReloaded = pyqtSignal()
+    ## emitted on changes of single entries, pass EntriesChange
+    entriesInserted = pyqtSignal( EntriesChange )
+    entriesRemoved  = pyqtSignal( EntriesChange )
+    entriesModified = pyqtSignal( EntriesChange )
+    ## emitted when storing finished, passes True if data was written
+    dataStored   = pyqtSignal( bool )
+    ## emitted when storing failed, passes error message
+    storeFailed  = pyqtSignal( str )
+    ## passes future of background store, emitted from worker thread
+    _storeDone   = pyqtSignal( object )
 
     def __init__(self, parent: QWidget = None):
         super().__init__( parent )
         self.parentWidget = parent
 
         self.dataContainer = DataContainer()                   ## user data
+        self.storageMode = StorageMode.JOURNAL
+        self.storage = self.storageMode.createStorage()
+        ## generation of data container at last successful store
+        self._storedGeneration = None
+
+        ## serialization and writing is done in single worker thread
+        self._storeExecutor = ThreadPoolExecutor( max_workers=1, thread_name_prefix="store" )
+        self._storeFuture: Future = None
+        ## generation of data container being stored
+        self._storeGeneration = None
+        ## directory of store requested during store in progress
+        self._pendingStoreDir = None
+        self._storeDone.connect( self._handleStoreDone )
 
         self.undoStack = QUndoStack(self)
+        ## identifiers of entries changed by undo commands, left unchanged by auto-compaction
+        self._commandEntryIds: Set[ int ] = set()
+        self._recordCommandEntries = False
+
+        ## offsets of imported log files, stored together with data
+        self.logImportState = LogImportState()
+        self._logImportChanged = False
+        ## copy of import state and its directory saved after successful store
+        self._storeImportState: Tuple[ LogImportState, str ] = None
 
     def store( self, outputDir ):
-        outputFile = outputDir + "/data.obj"
-        return persist.store_backup( self.dataContainer, outputFile )
+        """Store data and wait for completion (e.g. on application exit)."""
+        self.waitForStore()
+        self._pendingStoreDir = None
+        future = self._prepareStore( outputDir )
+        if future is None:
+            return False
+        return self._finishStore( future )
+
+    def storeAsync( self, outputDir ):
+        """Store data in background thread.
+
+        Data is copied or serialized in calling thread, writing is done in worker.
+        Requests made while store is in progress are coalesced into single store
+        started after the current one finishes. Result is passed by 'dataStored'
+        and 'storeFailed' signals.
+        """
+        if self._storeFuture is not None:
+            self._pendingStoreDir = outputDir
+            return
+        future = self._prepareStore( outputDir )
+        if future is None:
+            self.dataStored.emit( False )
+            return
+        future.add_done_callback( self._storeDone.emit )
+
+    def waitForStore( self ):
+        """Wait for store in progress and return its result."""
+        if self._storeFuture is None:
+            return False
+        return self._finishStore( self._storeFuture )
+
+    def _prepareStore( self, outputDir ):
+        if isinstance( self.storage, PartitionedStorage ):
+            ## entry could be moved to month not loaded yet
+            self._loadPartitions( self.storage.loadRequired, self.dataContainer )
+        importState = None
+        if self._logImportChanged:
+            ## import state can be saved only together with imported entries
+            importState = ( copy.deepcopy( self.logImportState ), outputDir )
+            self._logImportChanged = False
+        generation = self.dataContainer.generation()
+        if generation == self._storedGeneration:
+            _LOGGER.info( "no changes since last store" )
+            self._storeLogImportState( importState )
+            return None
+        writer = self.storage.prepareStore( self.dataContainer, outputDir )
+        if writer is None:
+            self._storedGeneration = generation
+            self._storeLogImportState( importState )
+            return None
+        self._storeGeneration = generation
+        self._storeImportState = importState
+        self._storeFuture = self._storeExecutor.submit( writer )
+        return self._storeFuture
+
+    def _handleStoreDone( self, future: Future ):
+        if future is not self._storeFuture:
+            ## already handled by waiting
+            return
+        self._finishStore( future )
+        if self._pendingStoreDir is not None:
+            outputDir = self._pendingStoreDir
+            self._pendingStoreDir = None
+            self.storeAsync( outputDir )
+
+    def _finishStore( self, future: Future ):
+        self._storeFuture = None
+        try:
+            stored = future.result()
+        # pylint: disable=W0703
+        except Exception as exc:
+            _LOGGER.exception( "storing data failed" )
+            self.storage.invalidate()
+            self._storedGeneration = None
+            if self._storeImportState is not None:
+                self._logImportChanged = True
+                self._storeImportState = None
+            self.storeFailed.emit( str( exc ) )
+            return False
+        self._storedGeneration = self._storeGeneration
+        self._storeLogImportState( self._storeImportState )
+        self._storeImportState = None
+        self.dataStored.emit( stored )
+        return stored
+
+    def _storeLogImportState( self, importState: Tuple[ LogImportState, str ] ):
+        if importState is None:
+            return
+        try:
+            importState[0].store( importState[1] )
+        except OSError:
+            _LOGGER.exception( "unable to store log import state" )
+            self._logImportChanged = True
 
     def load( self, inputDir ):
-        inputFile = inputDir + "/data.obj"
-        self.dataContainer = persist.load_object_simple( inputFile )
-        if self.dataContainer is None:
-            self.dataContainer = DataContainer()
+        self.waitForStore()
+        self.logImportState = LogImportState.load( inputDir )
+        self._logImportChanged = False
+        recentMode = find_recent_mode( inputDir, self.storageMode )
+        if recentMode is None or recentMode == self.storageMode:
+            self.dataContainer = self.storage.load( inputDir )
+            self._storedGeneration = self.dataContainer.generation()
+            return
+        ## data was recently stored in other format -- migrate it
+        _LOGGER.info( "migrating data from %s storage to %s", recentMode.name, self.storageMode.name )
+        sourceStorage = recentMode.createStorage()
+        self.dataContainer = sourceStorage.load( inputDir )
+        if isinstance( sourceStorage, PartitionedStorage ):
+            sourceStorage.loadAll( self.dataContainer )
+        self._storedGeneration = None
+
+    def loadMonth( self, dateValue: datetime.date ):
+        """Ensure entries of given month are loaded (in case of partitioned storage)."""
+        if not isinstance( self.storage, PartitionedStorage ):
+            return
+        ## entries referenced by undo stack have to stay loaded
+        self._loadPartitions( self.storage.loadPartitions, self.dataContainer, dateValue, self._commandEntryIds )
+
+    def _loadPartitions( self, loadFunction, *args ):
+        isStored = self.dataContainer.generation() == self._storedGeneration
+        loadedNum = loadFunction( *args )
+        if loadedNum < 1:
+            return
+        if isStored:
+            ## loaded entries are already stored
+            self._storedGeneration = self.dataContainer.generation()
+        self.entriesReloaded.emit()
+
+    def setStorageMode( self, mode: StorageMode ):
+        if mode == self.storageMode:
+            return
+        _LOGGER.info( "changing storage mode to %s", mode.name )
+        self.waitForStore()
+        if isinstance( self.storage, SqliteStorage ):
+            self.storage.close()
+        elif isinstance( self.storage, PartitionedStorage ):
+            ## new storage has to store all data
+            self.storage.loadAll( self.dataContainer )
+        self.storageMode = mode
+        self.storage = mode.createStorage()
+        ## force storing all data using new storage
+        self._storedGeneration = None
 
     @property
     def history(self) -> WorkLogData:
@@ -84,10 +266,18 @@ class DataObject( QObject ):
 
     @notes.setter
     def notes(self, newData: Dict[str, str]):
-        self.dataContainer.notes = newData
+        self.dataContainer.setNotes( newData )
 
     def pushUndo(self, undoCommand):
-        self.undoStack.push( undoCommand )
+        self._recordCommandEntries = True
+        try:
+            self.undoStack.push( undoCommand )
+        finally:
+            self._recordCommandEntries = False
+
+    def _recordEntries(self, entriesList: List[ WorkLogEntry ]):
+        if self._recordCommandEntries:
+            self._commandEntryIds.update( entry.entryId for entry in entriesList )
 
     ## =========================================================
 
@@ -148,9 +338,31 @@ class DataObject( QObject ):
         entry.endTime   = entryDate
         entry.work      = workLog
         self.history.addEntry( entry )
-        self.entryChanged.emit()
+        self.notifyEntriesInserted( [ entry ] )
         return entry
 
+    def notifyEntriesInserted(self, entriesList: List[ WorkLogEntry ]):
+        """Notify about entries added to history."""
+        self._recordEntries( entriesList )
+        history = self.history
+        rowsList = [ history.getEntryIndex( entry ) for entry in entriesList ]
+        spansList = [ ( entry.startTime, entry.endTime ) for entry in entriesList ]
+        self.entriesInserted.emit( EntriesChange( entriesList, rowsList, spansList ) )
+
+    def notifyEntriesRemoved(self, entriesList: List[ WorkLogEntry ], rowsList: List[ int ]):
+        """Notify about entries removed from history, 'rowsList' contains positions before removal."""
+        self._recordEntries( entriesList )
+        spansList = [ ( entry.startTime, entry.endTime ) for entry in entriesList ]
+        self.entriesRemoved.emit( EntriesChange( entriesList, rowsList, spansList ) )
+
+    def notifyEntriesModified(self, entriesList: List[ WorkLogEntry ], oldSpans: List[ Tuple[ datetime.datetime, datetime.datetime ] ]):
+        """Notify about modified entries, 'oldSpans' contains time spans before modification."""
+        self._recordEntries( entriesList )
+        history = self.history
+        rowsList = [ history.getEntryIndex( entry ) for entry in entriesList ]
+        spansList = list( oldSpans ) + [ ( entry.startTime, entry.endTime ) for entry in entriesList ]
+        self.entriesModified.emit( EntriesChange( entriesList, rowsList, spansList ) )
+
     def joinEntryUp(self, entry):
         if entry is None:
             return
@@ -175,19 +387,76 @@ class DataObject( QObject ):
         command = MergeEntryDownCommand( self, entry )
         self.pushUndo( command )
 
+    def normalizeEntries(self, mergeSameWork=True):
+        """Remove overlapping and empty entries (undoable). Return False if there was nothing to change."""
+        normalization = plan_normalization( self.history.entries, mergeSameWork )
+        if normalization.isEmpty():
+            return False
+        self.pushUndo( NormalizeEntriesCommand( self, normalization ) )
+        return True
+
+    def normalizeHistory(self, mergeSameWork=True):
+        """Remove overlapping and empty entries without undo and notifications (e.g. before view refresh).
+
+        Undo history is cleared. Return False if there was nothing to change.
+        """
+        normalization = normalize_history( self.history, mergeSameWork )
+        if normalization.isEmpty():
+            return False
+        self.undoStack.clear()
+        self._commandEntryIds = set()
+        return True
+
+    def compactEntries(self):
+        """Merge back-to-back entries of the same kind and drop zero-length entries (undoable).
+
+        Whole history is processed. Recent entry is kept as it is still
+        extended. Return number of removed entries.
+        """
+        history = self.history
+        normalization = plan_compaction( history.entries, history.recentEntry() )
+        if normalization.isEmpty() is False:
+            self.pushUndo( NormalizeEntriesCommand( self, normalization, "Compact Entries" ) )
+        history.markCompacted()
+        removedNum = len( normalization.removed )
+        if removedNum > 0:
+            _LOGGER.info( "compacted entries, removed: %s", removedNum )
+        return removedNum
+
+    def compactActivity(self):
+        """Compact activity tracking fragments of days modified since previous call (e.g. on save).
+
+        Changes are applied without undo stack, so entries with user
+        descriptions and entries changed by undo commands are left unchanged.
+        Return number of removed entries.
+        """
+        history = self.history
+        candidatesList = compaction_candidates( history )
+        frozenIds = self._commandEntryIds
+        normalization = plan_compaction( candidatesList, history.recentEntry(), frozenIds, fragmentsOnly=True )
+        if normalization.isEmpty() is False:
+            NormalizeEntriesCommand( self, normalization, "Compact Entries" ).redo()
+        ## days with entries referenced by undo commands stay pending for next compaction
+        history.markCompacted( [ entry for entry in candidatesList if entry.entryId in frozenIds ] )
+        removedNum = len( normalization.removed )
+        if removedNum > 0:
+            _LOGGER.info( "compacted activity entries, removed: %s", removedNum )
+        return removedNum
+
+    def getEntriesForDate(self, day: datetime.date) -> List[ WorkLogEntry ]:
+        return self.history.getEntriesForDate( day )
+
+    def findEntriesInRange(self, fromDate: datetime.datetime, toDate: datetime.datetime) -> List[ WorkLogEntry ]:
+        return self.history.findEntriesInRange( fromDate, toDate )
+
     def calculateWorkDuration(self, day: datetime.date):
-        entries = self.history.getEntriesForDate( day )
-        workTime = timedelta()
-        for item in entries:
-            if item.work:
-                workTime += item.getDuration()
-        return workTime
+        ## durations are cached in history
+        return self.history.getDayDuration( day )[0]
 
     def readFromKernlog(self, recentWorking=True):
         oldEntry = self.history.recentEntry()
 
-        self._readKeylogFile( "/var/log/kern.log.1" )
-        self._readKeylogFile( "/var/log/kern.log" )
+        self._readKeylogFiles( find_rotated_logs( "/var/log/kern.log" ) )
 
         newEntry = self.history.recentEntry()
         if newEntry is not None:
@@ -197,8 +466,7 @@ class DataObject( QObject ):
     def readFromSyslog(self, recentWorking=True):
         oldEntry = self.history.recentEntry()
 
-        self._readKeylogFile( "/var/log/syslog.1" )
-        self._readKeylogFile( "/var/log/syslog" )
+        self._readKeylogFiles( find_rotated_logs( "/var/log/syslog" ) )
 
         newEntry = self.history.recentEntry()
         if newEntry is not None:
@@ -206,31 +474,82 @@ class DataObject( QObject ):
                 newEntry.work = recentWorking
 
     def _readKeylogFile(self, filePath: str):
-        _LOGGER.info("reading log file: %s", filePath)
+        self._readKeylogFiles( [ filePath ] )
+
+    def _readKeylogFiles(self, filesList: List[ str ], parallel: bool = None):
+        """Import activity intervals from log files ordered from the oldest.
+
+        Files are parsed independently, in process pool if 'parallel' is set
+        (by default if there is enough data to parse), then intervals are
+        merged into history in order of files.
+        """
         recentEntry = self.history.recentEntry()
         recentDate = None
         if recentEntry is not None:
             recentDate = recentEntry.endTime
-
-        items: List[ DateTimePair ] = SysLogParser.parseLogFile( filePath )
-        for item in items:
-            if recentDate is not None:
-                if item[1] < recentDate:
-                    continue
-            entry = WorkLogEntry()
-            entry.startTime = item[0]
-            entry.endTime   = item[1]
-            foundEntries = self.history.findEntriesInRange( item[0], item[1] )
-            eSize = len(foundEntries)
-            if eSize < 1:
-                self.history.entries.append( entry )
-            elif eSize == 1:
-                currEntry: WorkLogEntry = foundEntries[0]
-                if currEntry.startTime > item[0]:
-                    currEntry.startTime = item[0]
-                if currEntry.endTime < item[1]:
-                    currEntry.endTime = item[1]
-        self.history.sort()
+        jobsList = []
+        for filePath in filesList:
+            job = self._prepareLogJob( filePath, recentDate )
+            if job is not None:
+                jobsList.append( job )
+        if not jobsList:
+            return
+        if parallel is None:
+            parseSize = sum( job[2] - job[1].offset for job in jobsList )
+            parallel = len( jobsList ) > 1 and parseSize >= PARALLEL_PARSE_SIZE
+        if parallel:
+            workersNum = min( len( jobsList ), os.cpu_count() or 1 )
+            _LOGGER.info( "parsing %s log files in %s processes", len( jobsList ), workersNum )
+            ## forking Qt application with running threads is unsafe
+            mpContext = multiprocessing.get_context( "spawn" )
+            with ProcessPoolExecutor( max_workers=workersNum, mp_context=mpContext ) as executor:
+                resultsList = list( executor.map( parse_log_job, *zip( *jobsList ) ) )
+        else:
+            resultsList = [ parse_log_job( *job ) for job in jobsList ]
+
+        for job, result in zip( jobsList, resultsList ):
+            items, fileState = result
+            ## state was updated by parser (possibly in other process)
+            self.logImportState.files[ job[0] ] = fileState
+            self._logImportChanged = True
+            self._addLogItems( items )
+
+    def _prepareLogJob(self, filePath: str, recentDate: datetime.datetime):
+        """Return arguments of 'parse_log_job()' or None if file does not have to be read."""
+        try:
+            fileTime = datetime.datetime.fromtimestamp( pathlib.Path( filePath ).stat().st_mtime )
+        except OSError:
+            _LOGGER.warning( "unable to access log file: %s", filePath )
+            return None
+        if recentDate is not None and fileTime < recentDate:
+            ## file was last written before recent entry -- nothing new to import
+            _LOGGER.info( "log file older than recent entry: %s", filePath )
+            return None
+
+        fileState, fileSize = self.logImportState.getFileState( filePath )
+        if fileState is None:
+            return None
+        if fileState.offset == fileSize:
+            _LOGGER.info( "log file unchanged since last import: %s", filePath )
+            return None
+        _LOGGER.info( "reading log file: %s from offset %s", filePath, fileState.offset )
+        return ( filePath, fileState, fileSize )
+
+    def _addLogItems(self, items: List[ 'DateTimePair' ]):
+        recentEntry = self.history.recentEntry()
+        if recentEntry is not None:
+            recentDate = recentEntry.endTime
+            items = [ item for item in items if item[1] >= recentDate ]
+        if not items:
+            return
+        ## one range query, then single merge pass over intervals and found entries
+        fromDate = min( item[0] for item in items )
+        toDate   = max( item[1] for item in items )
+        foundEntries = sorted( self.findEntriesInRange( fromDate, toDate ), key=WorkLogEntry.startTime.fget )
+        newEntries, mergedEntries = merge_log_items( foundEntries, items )
+        self.history.removeEntries( mergedEntries )
+        ## restores order if extended entries were moved
+        self.history.addEntries( newEntries )
 
 
 ## ===================================================
@@ -298,12 +617,43 @@ DateTimePair = Tuple[datetime.datetime, datetime.datetime]
 #         self.end_time = next_time
 
 
+## month names used in syslog timestamps (independent of locale)
+MONTHS = { name: index + 1 for index, name in enumerate( ( "Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                                                           "Jul", "Aug", "Sep", "Oct", "Nov", "Dec" ) ) }
+
+## timestamp, host, process and message
+HEADER_PATTERN = re.compile( r'^(.*?) (\S+?) (\S+?): (.*?)$' )
+## host, process and message following timestamp
+FIELDS_PATTERN = re.compile( r'(\S+?) (\S+?): (.*?)$' )
+## time from boot and message of kernel log
+KERNEL_PATTERN = re.compile( r'^\[(.*?)\] (.*?)$' )
+
+
+def parse_timestamp_key( timestampKey: str, year: int ) -> datetime.datetime:
+    """Parse 'Mmm dd HH:MM' (day can be padded with space), return None if format is different."""
+    month = MONTHS.get( timestampKey[ :3 ] )
+    if month is None or timestampKey[3] != " " or timestampKey[6] != " " or timestampKey[9] != ":":
+        return None
+    try:
+        return datetime.datetime( year, month, int( timestampKey[ 4:6 ] ), int( timestampKey[ 7:9 ] ), int( timestampKey[ 10:12 ] ) )
+    except ValueError:
+        ## e.g. Feb 29 in non-leap year
+        return None
+
+
 class SysLogParser():
 
     def __init__(self):
         self.datesList: List[ DateTimePair ] = []
+        ## parsed timestamps (without seconds)
+        self._timestampCache: Dict[ str, datetime.datetime ] = {}
 
-    def parse(self, filePath: str):
+    def parse(self, filePath: str, fileState: LogFileState = None):
+        """Parse log file and return list of detected activity intervals.
+
+        If 'fileState' is given, then parsing continues from offset stored in
+        the state and the state is updated to the end of last complete line.
+        """
         self.datesList.clear()
         suspendDetected = False
         timestampList: List[ KernLogPair ] = []
@@ -311,46 +661,36 @@ class SysLogParser():
         fileDate  = self._filemoddate( filePath )
         engLocale = QtCore.QLocale(QtCore.QLocale.English)
         recentKernTimestamp = 0.0
+        offset = 0
+        if fileState is not None:
+            offset = fileState.offset
+            recentKernTimestamp = fileState.kernTimestamp
+            suspendDetected = fileState.suspended
+            if fileState.lastLog is not None:
+                ## continue interval opened in previous part
+                timestampList.append( fileState.lastLog )
 
         # kernLogTimestampRange = TimeRange()
 
-        with open( filePath ) as fp:
-            for line in fp:
+        with open_log_file( filePath ) as fp:
+            fp.seek( offset )
+            for rawLine in fp:
+                if fileState is not None and rawLine.endswith( b"\n" ) is False:
+                    ## line is still being written -- parse it next time
+                    break
+                offset += len( rawLine )
+                line = rawLine.decode( errors="replace" )
                 ## Oct 29 21:02:01 wxyz kernel: [ 8353.210086] abc log entry
                 ## Oct 26 00:09:42 wxyz ccc.dddd-browsed[1549]: [12927.909529] abc log entry
-                matched = re.match( r'^(.*?) (\S+?) (\S+?): (.*?)$', line )
-                if matched is None:
-                    _LOGGER.warning("log parsing failed: %s", line)
-                    continue
-                logTimestampStr = matched.group(1)             # timestamp
-
-                logTimestampStr = logTimestampStr.strip()
-                logTimestampStr = logTimestampStr.replace("  ", " ")
-
-                ## can happen that there is some trashy \0 signs in front of string
-                logTimestampStr = logTimestampStr.strip('\0')
-
-                ## have to use Qt, because Qt corrupts native "datetime.strptime"
-                # logTimestamp = datetime.datetime.strptime(logTimestampStr, '%b %d %H:%M:%S')
-                # _LOGGER.info("parsed: %s | %s", logTimestampStr, logTimestamp)
-
-                try:
-                    ## add year to properly handle leap year date (Feb 29)
-                    logTimestampStr = f"{fileDate.year} {logTimestampStr}"
-                    qtTimestamp  = engLocale.toDateTime( logTimestampStr, "yyyy MMM d HH:mm:ss")
-                    if not qtTimestamp.isValid():
-                        _LOGGER.error("unable to parse date: '%s'", logTimestampStr)
-
-                    logTimestamp = qtTimestamp.toPyDateTime()
-                    logTimestamp = logTimestamp.replace( second=0, microsecond=0 )
-                except ValueError as exc:
-                    _LOGGER.error("unable to parse '%s', reason: %s, parsed: %s", logTimestampStr, exc, qtTimestamp.toString())
-                    raise
+                header = self._parseHeader( line, fileDate.year )
+                if header is None:
+                    header = self._parseHeaderGeneric( line, fileDate.year, engLocale )
+                    if header is None:
+                        continue
+                logTimestamp, process, messageStr = header
 
-                process = matched.group(3)
                 if process == "kernel":
-                    messageStr = matched.group(4)
-                    matched = re.match( r'^\[(.*?)\] (.*?)$', messageStr )
+                    matched = KERNEL_PATTERN.match( messageStr )
                     if matched is None:
                         _LOGGER.warning("kernel log parsing failed: %s", line)
                         continue
@@ -391,10 +731,71 @@ class SysLogParser():
                 timestampList.append( (logTimestamp, recentKernTimestamp) )
 
         # end of file
+        if fileState is not None:
+            fileState.offset = offset
+            fileState.kernTimestamp = recentKernTimestamp
+            fileState.suspended = suspendDetected
+            fileState.lastLog = timestampList[-1] if timestampList else None
         self._addDates(timestampList)
         self._fixYear(self.datesList)
         return self.datesList
 
+    def _parseHeader(self, line: str, year: int):
+        """Fast path of parsing line header: fixed width timestamp 'Mmm dd HH:MM:SS', host and process.
+
+        Returns tuple ( timestamp, process, message ) or None if line has unexpected format.
+        """
+        if line.startswith( "\0" ):
+            ## can happen that there is some trashy \0 signs in front of string
+            line = line.lstrip( "\0" )
+        if len( line ) < 17 or line[15] != " ":
+            return None
+        ## timestamps are minute-granular, so key contains month, day, hour and minute
+        timestampKey = line[ :12 ]
+        logTimestamp = self._timestampCache.get( timestampKey )
+        if logTimestamp is None:
+            logTimestamp = parse_timestamp_key( timestampKey, year )
+            if logTimestamp is None:
+                return None
+            self._timestampCache[ timestampKey ] = logTimestamp
+        matched = FIELDS_PATTERN.match( line, 16 )
+        if matched is None:
+            return None
+        return ( logTimestamp, matched.group(2), matched.group(3) )
+
+    def _parseHeaderGeneric(self, line: str, year: int, engLocale: QtCore.QLocale):
+        """Parse line header of any format accepted by Qt (e.g. with extra spaces)."""
+        matched = HEADER_PATTERN.match( line )
+        if matched is None:
+            _LOGGER.warning("log parsing failed: %s", line)
+            return None
+        logTimestampStr = matched.group(1)             # timestamp
+
+        logTimestampStr = logTimestampStr.strip()
+        logTimestampStr = logTimestampStr.replace("  ", " ")
+
+        ## can happen that there is some trashy \0 signs in front of string
+        logTimestampStr = logTimestampStr.strip('\0')
+
+        ## have to use Qt, because Qt corrupts native "datetime.strptime"
+        # logTimestamp = datetime.datetime.strptime(logTimestampStr, '%b %d %H:%M:%S')
+        # _LOGGER.info("parsed: %s | %s", logTimestampStr, logTimestamp)
+
+        try:
+            ## add year to properly handle leap year date (Feb 29)
+            logTimestampStr = f"{year} {logTimestampStr}"
+            qtTimestamp  = engLocale.toDateTime( logTimestampStr, "yyyy MMM d HH:mm:ss")
+            if not qtTimestamp.isValid():
+                _LOGGER.error("unable to parse date: '%s'", logTimestampStr)
+
+            logTimestamp = qtTimestamp.toPyDateTime()
+            logTimestamp = logTimestamp.replace( second=0, microsecond=0 )
+        except ValueError as exc:
+            _LOGGER.error("unable to parse '%s', reason: %s, parsed: %s", logTimestampStr, exc, qtTimestamp.toString())
+            raise
+
+        return ( logTimestamp, matched.group(3), matched.group(4) )
+
     def _filemoddate(self, filePath: str):
         fname = pathlib.Path( filePath )
         mtime = datetime.datetime.fromtimestamp( fname.stat().st_mtime )
@@ -467,6 +868,20 @@ class SysLogParser():
             i -= 1
 
     @staticmethod
-    def parseLogFile( filePath: str ) -> List[ DateTimePair ]:
+    def parseLogFile( filePath: str, fileState: LogFileState = None ) -> List[ DateTimePair ]:
         parser = SysLogParser()
-        return parser.parse( filePath )
+        return parser.parse( filePath, fileState )
+
+
+def parse_log_job( filePath: str, fileState: LogFileState, fileSize: int ) -> Tuple[ List[ DateTimePair ], LogFileState ]:
+    """Parse log file starting from position given by state (can be run in other process).
+
+    Returns pair of parsed intervals and updated state.
+    """
+    if is_compressed( filePath ):
+        ## rotated file does not change -- whole stream is parsed at once
+        items = SysLogParser.parseLogFile( filePath )
+        fileState.offset = fileSize
+        return ( items, fileState )
+    items = SysLogParser.parseLogFile( filePath, fileState )
+    return ( items, fileState )
@@ -22,32 +22,101 @@
 #
 
 import logging
+import sys
+import heapq
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right
 from datetime import datetime, date, time, timedelta
-from typing import List, Tuple
+from typing import Dict, List, Set, Tuple
 
 from worklog import persist
+from worklog.gui.analytics import HistoryAnalytics
 
 
 _LOGGER = logging.getLogger(__name__)
 
 
+EPOCH = datetime( 1970, 1, 1 )
+MINUTE = timedelta( minutes=1 )
+## orders entries without time before all other entries
+MIN_MINUTES = -2 ** 63
+
+
+def to_minutes( value: datetime ) -> int:
+    """Convert time to minutes since epoch (seconds are dropped)."""
+    if value is None:
+        return None
+    return ( value - EPOCH ) // MINUTE
+
+
+def to_minutes_ceil( value: datetime ) -> int:
+    """Convert time to minutes since epoch rounding seconds up."""
+    return -( ( EPOCH - value ) // MINUTE )
+
+
+def from_minutes( value: int ) -> datetime:
+    if value is None:
+        return None
+    return EPOCH + timedelta( minutes=value )
+
+
+def intern_description( value: str ) -> str:
+    ## the same descriptions (e.g. generated by screen saver changes) share one object
+    if type( value ) is str:          # pylint: disable=C0123
+        return sys.intern( value )
+    return value
+
+
 class WorkLogEntry( persist.Versionable ):
+    """Work log entry.
+
+    Start and end times are kept as minutes since epoch and descriptions are
+    interned, so large histories take less memory. Pickled state still holds
+    'datetime' values, the same as in previous versions.
+    """
 
     ## 1: added "description" field
     ## 2: added "work" field
     ## 3: reset seconds value to zero
     ## 4: add properties
-    _class_version = 4
+    ## 5: "work" and "description" as properties
+    ## 6: added "_id" field
+    _class_version = 6
+
+    __slots__ = ( "_startMinutes", "_endMinutes", "_work", "_description", "_id",
+                  "_owner", "_generation", "_position" )
 
     def __init__(self):
-        self._startTime: datetime = None
-        self._endTime: datetime   = None
-        self.work                 = True            ## is work time?
-        self.description          = ""
+        self._startMinutes: int = None
+        self._endMinutes: int   = None
+        self._work              = True          ## is work time?
+        self._description       = ""
+        self._id: int           = None          ## assigned by owning history
+        self._inittransient_()
+
+    def _inittransient_(self):
+        ## history containing the entry
+        self._owner: 'WorkLogData' = None
+        ## modification counter
+        self._generation: int = 0
+        ## position in owner's entries list (maintained by owner, can be outdated)
+        self._position: int = None
+
+    def _storestate_(self):
+        return { "_startTime": self.startTime,
+                 "_endTime": self.endTime,
+                 "_work": self._work,
+                 "_description": self._description,
+                 "_id": self._id }
+
+    def _restorestate_(self, dict_):
+        self._startMinutes = to_minutes( dict_["_startTime"] )
+        self._endMinutes   = to_minutes( dict_["_endTime"] )
+        self._work         = dict_["_work"]
+        self._description  = intern_description( dict_["_description"] )
+        self._id           = dict_["_id"]
 
     def _convertstate_(self, dict_, dictVersion_ ):
-        _LOGGER.info( "converting object from version %s to %s", dictVersion_, self._class_version )
-
         if dictVersion_ < 1:
             dict_["description"] = ""
 
@@ -63,12 +132,16 @@ class WorkLogEntry( persist.Versionable ):
             del dict_["startTime"]
             del dict_["endTime"]
 
-        ## ensure no seconds
-        dict_["_startTime"] = dict_["_startTime"].replace( second=0, microsecond=0 )
-        dict_["_endTime"]   = dict_["_endTime"].replace( second=0, microsecond=0 )
+        if dictVersion_ < 5:
+            dict_["_work"]        = dict_.pop( "work" )
+            dict_["_description"] = dict_.pop( "description" )
 
-        # pylint: disable=W0201
-        self.__dict__ = dict_
+        if dictVersion_ < 6:
+            ## identifier will be assigned by history
+            dict_["_id"] = None
+
+        ## seconds are dropped by conversion to minutes
+        self._restorestate_( dict_ )
 
 #     def __str__(self):
 #         return self.printData()
@@ -78,23 +151,103 @@ class WorkLogEntry( persist.Versionable ):
 
     @property
     def startTime(self) -> datetime:
-        return self._startTime
+        return from_minutes( self._startMinutes )
 
     @startTime.setter
     def startTime(self, value: datetime):
-        if value is not None:
-            value = value.replace( second=0, microsecond=0 )
-        self._startTime = value
+        value = to_minutes( value )
+        if value == self._startMinutes:
+            return
+        oldSpan = ( self.startTime, self.endTime )
+        self._startMinutes = value
+        self._modified( oldSpan )
 
     @property
     def endTime(self) -> datetime:
-        return self._endTime
+        return from_minutes( self._endMinutes )
 
     @endTime.setter
     def endTime(self, value: datetime):
-        if value is not None:
-            value = value.replace( second=0, microsecond=0 )
-        self._endTime = value
+        value = to_minutes( value )
+        if value == self._endMinutes:
+            return
+        oldSpan = ( self.startTime, self.endTime )
+        self._endMinutes = value
+        self._modified( oldSpan )
+
+    @property
+    def startMinutes(self) -> int:
+        """Start time as minutes since epoch."""
+        return self._startMinutes
+
+    @property
+    def endMinutes(self) -> int:
+        """End time as minutes since epoch."""
+        return self._endMinutes
+
+    @property
+    def entryId(self) -> int:
+        """Identifier of entry unique in history, None if not assigned yet.
+
+        Identifier persists between edits, undo/redo and save/load.
+        """
+        return self._id
+
+    @property
+    def work(self) -> bool:
+        return self._work
+
+    @work.setter
+    def work(self, value: bool):
+        if value == self._work:
+            return
+        self._work = value
+        self._modified( ( self.startTime, self.endTime ) )
+
+    @property
+    def description(self) -> str:
+        return self._description
+
+    @description.setter
+    def description(self, value: str):
+        if value == self._description:
+            return
+        self._description = intern_description( value )
+        self._modified()
+
+    @classmethod
+    def fromValues(cls, startTime: datetime, endTime: datetime, work=True, description="", entryId: int = None):
+        """Create entry from given values (e.g. loaded from storage)."""
+        return cls.fromMinutes( to_minutes( startTime ), to_minutes( endTime ), work, description, entryId )
+
+    @classmethod
+    def fromMinutes(cls, startMinutes: int, endMinutes: int, work=True, description="", entryId: int = None):
+        """Create entry from times given as minutes since epoch."""
+        entry = cls.__new__( cls )
+        entry._startMinutes = startMinutes
+        entry._endMinutes   = endMinutes
+        entry._work         = work
+        entry._description  = intern_description( description )
+        entry._id           = entryId
+        entry._inittransient_()
+        return entry
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def assign(self, sourceEntry: 'WorkLogEntry'):
+        """Copy data from other entry."""
+        self.startTime   = sourceEntry.startTime
+        self.endTime     = sourceEntry.endTime
+        self.work        = sourceEntry.work
+        self.description = sourceEntry.description
+
+    def _modified(self, oldSpan: Tuple[ datetime, datetime ] = None):
+        ## 'oldSpan' is passed if durations of entry could change
+        self._generation += 1
+        if self._owner is not None:
+            self._owner._entryModified( self, oldSpan )
 
     def getDuration(self):
         return self.endTime - self.startTime
@@ -108,17 +261,87 @@ class WorkLogEntry( persist.Versionable ):
         return str( self.startTime ) + " " + str( self.getDuration() ) + " " + str( self.work )
 
 
+class EntriesListener():
+    """Receiver of notifications around structural changes of entries list (e.g. item model).
+
+    'begin' is called before list is changed, 'end' after change is complete. Rows are
+    positions in list: before removal and after insertion.
+    """
+
+    def beginInsertEntries(self, first: int, last: int):
+        pass
+
+    def endInsertEntries(self):
+        pass
+
+    def beginRemoveEntries(self, first: int, last: int):
+        pass
+
+    def endRemoveEntries(self):
+        pass
+
+    def beginResetEntries(self):
+        pass
+
+    def endResetEntries(self):
+        pass
+
+
+## listener ignoring notifications
+NULL_LISTENER = EntriesListener()
+
+
 class WorkLogData( persist.Versionable ):
 
     ## 1 - rename field
     _class_version = 1
 
+    _transient_fields = ( "_generation", "_indexStarts", "_indexMaxEnds", "_indexSize", "_indexUnsorted",
+                          "_dayDurations", "_positionsSize", "_analytics", "_idIndex", "_uncompactedDays",
+                          "_changedEntries", "_removedEntries", "_changesFromId", "_listener" )
+
+    ## modification counter
+    _generation: int = 0
+
+    ## interval index of entries: start times and running maximum of end times
+    ## (valid for first '_indexSize' entries)
+    ## start minutes of entries and maximum end minutes of entries up to given position
+    _indexStarts: List[ int ] = None
+    _indexMaxEnds: List[ int ] = None
+    _indexSize: int = 0
+    ## position of first entry breaking order of start times in index, None if sorted
+    _indexUnsorted: int = None
+
+    ## cache of durations of days: day -> ( work duration, other duration )
+    _dayDurations: Dict[ date, Tuple[ timedelta, timedelta ] ] = None
+
+    ## number of leading entries with valid '_position' field
+    _positionsSize: int = 0
+
+    ## analytics view, created on demand
+    _analytics: HistoryAnalytics = None
+
+    ## next free entry identifier (persisted, so identifiers are never reused)
+    _nextId: int = 1
+    ## entries of history by identifier
+    _idIndex: Dict[ int, WorkLogEntry ] = None
+
+    ## days modified since last compaction, None if all days
+    _uncompactedDays: Set[ date ] = None
+
+    ## changes since last 'clearChanges()': added or modified and removed entries by identifier
+    _changedEntries: Dict[ int, WorkLogEntry ] = None
+    _removedEntries: Dict[ int, WorkLogEntry ] = None
+    ## entries with identifiers not less than this one were created after 'clearChanges()'
+    _changesFromId: int = None
+
+    ## notified around structural changes of entries list
+    _listener: EntriesListener = NULL_LISTENER
+
     def __init__(self):
         self.entries: List[ WorkLogEntry ] = list()
 
     def _convertstate_(self, dict_, dictVersion_ ):
-        _LOGGER.info( "converting object from version %s to %s", dictVersion_, self._class_version )
-
         if dictVersion_ < 1:
             ## skip old version data
             self.entries = list()
@@ -127,6 +350,215 @@ class WorkLogData( persist.Versionable ):
         # pylint: disable=W0201
         self.__dict__ = dict_
 
+    def _inittransient_(self):
+        self._idIndex = {}
+        for entry in self.entries:
+            entry._owner = self
+            self._registerEntry( entry )
+        self.clearChanges()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def setListener(self, listener: EntriesListener):
+        self._listener = NULL_LISTENER if listener is None else listener
+
+    @contextmanager
+    def _resetting(self):
+        """Notify listener about reset of whole entries list done inside the context."""
+        listener = self._listener
+        listener.beginResetEntries()
+        ## nested changes are covered by reset
+        self._listener = NULL_LISTENER
+        try:
+            yield
+        finally:
+            self._listener = listener
+            listener.endResetEntries()
+
+    def _entryModified(self, entry: WorkLogEntry, oldSpan: Tuple[ datetime, datetime ] = None):
+        self._generation += 1
+        if oldSpan is not None:
+            ## only days between old and new boundary change their durations
+            oldStart, oldEnd = oldSpan
+            if oldStart != entry.startTime:
+                self._invalidateDays( oldStart, entry.startTime )
+            if oldEnd != entry.endTime:
+                self._invalidateDays( oldEnd, entry.endTime )
+            if oldSpan == ( entry.startTime, entry.endTime ):
+                self._invalidateDays( oldStart, oldEnd )
+        self._trackChanged( entry )
+        try:
+            self._invalidateIndex( self.getEntryIndex( entry ) )
+        except ValueError:
+            self._invalidateIndex()
+
+    def _attachEntry(self, entry: WorkLogEntry):
+        entry._owner = self
+        self._registerEntry( entry )
+        self._trackChanged( entry )
+        self._generation += 1
+        self._invalidateDays( entry.startTime, entry.endTime )
+
+    def _detachEntry(self, entry: WorkLogEntry):
+        if entry._owner is self:
+            entry._owner = None
+        ## identifier is kept, so entry restored by undo gets the same one
+        if self._idIndex is not None and self._idIndex.get( entry._id ) is entry:
+            del self._idIndex[ entry._id ]
+            self._trackRemoved( entry )
+        self._generation += 1
+        self._invalidateDays( entry.startTime, entry.endTime )
+
+    def _registerEntry(self, entry: WorkLogEntry):
+        if self._idIndex is None:
+            self._idIndex = {}
+        entryId = entry._id
+        if entryId is None or self._idIndex.get( entryId, entry ) is not entry:
+            ## new entry or identifier already taken (e.g. copy of other entry)
+            entryId = self._nextId
+            entry._id = entryId
+        self._idIndex[ entryId ] = entry
+        if entryId >= self._nextId:
+            self._nextId = entryId + 1
+
+    @property
+    def nextId(self) -> int:
+        """Identifier that will be assigned to next new entry."""
+        return self._nextId
+
+    def reserveIds(self, nextId: int):
+        """Prevent assigning identifiers lower than 'nextId' (e.g. used by entries not loaded yet)."""
+        if nextId is not None and nextId > self._nextId:
+            self._nextId = nextId
+
+    def getChanges(self) -> Tuple[ List[ WorkLogEntry ], List[ WorkLogEntry ] ]:
+        """Return pair of lists: entries added or modified and entries removed since 'clearChanges()'.
+
+        Changes are tracked by entry identifiers, so entry replaced by its copy
+        keeping the identifier (e.g. edited) is reported as modified.
+        """
+        if self._changedEntries is None:
+            return ( [], [] )
+        return ( list( self._changedEntries.values() ), list( self._removedEntries.values() ) )
+
+    def clearChanges(self, entriesList: List[ WorkLogEntry ] = None):
+        """Forget tracked changes (e.g. after data was stored) or only changes of given entries (e.g. loaded)."""
+        if entriesList is not None:
+            if self._changedEntries:
+                for entry in entriesList:
+                    if self._changedEntries.get( entry._id ) is entry:
+                        del self._changedEntries[ entry._id ]
+            return
+        self._changedEntries = {}
+        self._removedEntries = {}
+        self._changesFromId  = self._nextId
+
+    def _trackChanged(self, entry: WorkLogEntry):
+        if self._changedEntries is None:
+            self.clearChanges()
+        entryId = entry._id
+        self._removedEntries.pop( entryId, None )
+        self._changedEntries[ entryId ] = entry
+
+    def _trackRemoved(self, entry: WorkLogEntry):
+        if self._changedEntries is None:
+            self.clearChanges()
+        entryId = entry._id
+        if self._changedEntries.get( entryId ) is entry:
+            del self._changedEntries[ entryId ]
+        if self._changesFromId is not None and entryId >= self._changesFromId:
+            ## entry created and removed after clearing changes
+            return
+        self._removedEntries[ entryId ] = entry
+
+    def getEntryById(self, entryId: int) -> WorkLogEntry:
+        """Return entry with given identifier or None if there is no such entry in history."""
+        if self._idIndex is None:
+            return None
+        return self._idIndex.get( entryId )
+
+    def getRowById(self, entryId: int) -> int:
+        """Return position of entry with given identifier, raise ValueError if there is no such entry."""
+        entry = self.getEntryById( entryId )
+        if entry is None:
+            raise ValueError( "entry not found: %s" % entryId )
+        return self.getEntryIndex( entry )
+
+    def getDayDuration(self, dateValue: date) -> Tuple[ timedelta, timedelta ]:
+        """Return pair of work and other duration of given day.
+
+        Entries crossing midnight are split between days. Results are cached
+        until entries of the day change.
+        """
+        if self._dayDurations is None:
+            self._dayDurations = {}
+        durations = self._dayDurations.get( dateValue )
+        if durations is not None:
+            return durations
+        dayStart = datetime.combine( dateValue, time.min )
+        dayEnd   = dayStart + timedelta( days=1 )
+        workTime  = timedelta()
+        otherTime = timedelta()
+        for entry in self.getEntriesForDate( dateValue ):
+            duration = min( entry.endTime, dayEnd ) - max( entry.startTime, dayStart )
+            if duration <= timedelta():
+                continue
+            if entry.work:
+                workTime += duration
+            else:
+                otherTime += duration
+        durations = ( workTime, otherTime )
+        self._dayDurations[ dateValue ] = durations
+        return durations
+
+    def _invalidateDays(self, startTime: datetime, endTime: datetime):
+        """Remove cached durations of days in given range."""
+        self._markUncompacted( startTime, endTime )
+        if self._analytics is not None:
+            self._analytics.invalidateDays( startTime, endTime )
+        dayDurations = self._dayDurations
+        if not dayDurations:
+            return
+        if startTime is None or endTime is None:
+            dayDurations.clear()
+            return
+        firstDay = min( startTime, endTime ).date()
+        lastDay  = max( startTime, endTime ).date()
+        daysNum  = ( lastDay - firstDay ).days + 1
+        if daysNum > len( dayDurations ):
+            for day in [ day for day in dayDurations if firstDay <= day <= lastDay ]:
+                del dayDurations[ day ]
+            return
+        for i in range( daysNum ):
+            dayDurations.pop( firstDay + timedelta( days=i ), None )
+
+    def _markUncompacted(self, startTime: datetime, endTime: datetime):
+        uncompactedDays = self._uncompactedDays
+        if uncompactedDays is None:
+            return
+        if startTime is None or endTime is None:
+            self._uncompactedDays = None
+            return
+        firstDay = min( startTime, endTime ).date()
+        daysNum  = ( max( startTime, endTime ).date() - firstDay ).days + 1
+        if daysNum > 366:
+            self._uncompactedDays = None
+            return
+        for i in range( daysNum ):
+            uncompactedDays.add( firstDay + timedelta( days=i ) )
+
+    def getUncompactedDays(self) -> Set[ date ]:
+        """Return days modified since last call of 'markCompacted()', None if all days have to be compacted."""
+        return self._uncompactedDays
+
+    def markCompacted(self, skippedEntries: List[ WorkLogEntry ] = None):
+        """Mark days as compacted, except days of 'skippedEntries'."""
+        self._uncompactedDays = set()
+        for entry in ( skippedEntries or [] ):
+            self._markUncompacted( entry.startTime, entry.endTime )
+
     ## [] (array) operator
     def __getitem__(self, arg):
         return self.getEntry( arg )
@@ -142,43 +574,210 @@ class WorkLogData( persist.Versionable ):
             return self.entries[-1]
         return None
 
+    def getEntryIndex(self, entry: WorkLogEntry) -> int:
+        """Return position of entry in entries list. Raise ValueError if entry is not in history."""
+        if entry._owner is self:
+            if self._validPosition( entry ):
+                return entry._position
+            self._updatePositions()
+            if self._validPosition( entry ):
+                return entry._position
+        raise ValueError( "entry not found in history" )
+
+    def _validPosition(self, entry: WorkLogEntry) -> bool:
+        position = entry._position
+        entries  = self.entries
+        return position is not None and position < len( entries ) and entries[ position ] is entry
+
+    def _invalidatePositions(self, position=0):
+        """Mark positions of entries invalid starting from given position."""
+        if position < self._positionsSize:
+            self._positionsSize = position
+
+    def _updatePositions(self):
+        entries = self.entries
+        for i in range( self._positionsSize, len( entries ) ):
+            entries[i]._position = i
+        self._positionsSize = len( entries )
+
     def nextEntry(self, referenceEntry) -> WorkLogEntry:
-        entryIndex = self.entries.index( referenceEntry )
+        entryIndex = self.getEntryIndex( referenceEntry )
         if entryIndex == len( self.entries ) - 1:
             ## last element
             return None
         return self.entries[ entryIndex + 1 ]
 
     def prevEntry(self, referenceEntry) -> WorkLogEntry:
-        entryIndex = self.entries.index( referenceEntry )
+        entryIndex = self.getEntryIndex( referenceEntry )
         if entryIndex < 1:
             ## first element
             return None
         return self.entries[ entryIndex - 1 ]
 
     def getEntriesForDate(self, dateValue: date) -> List[ WorkLogEntry ]:
-        retList = []
-        for entry in self.entries:
-            startDate = entry.startTime.date()
-            endDate   = entry.endTime.date()
-            if startDate <= dateValue and endDate >= dateValue:
-                retList.append( entry )
-                continue
-        return retList
+        dayStart = datetime.combine( dateValue, time.min )
+        return self._findEntries( dayStart, dayStart + timedelta( days=1 ), False )
 
     def findEntriesInRange(self, fromDate: datetime, toDate: datetime) -> List[ WorkLogEntry ]:
+        return self._findEntries( fromDate, toDate, True )
+
+    def _findEntries(self, fromTime: datetime, toTime: datetime, includeTo: bool) -> List[ WorkLogEntry ]:
+        """Find entries ending not before 'fromTime' and starting before 'toTime' (or at if 'includeTo')."""
+        entries = self.entries
+        ## entries keep whole minutes, so bounds are rounded to compare minutes only
+        fromMinutes = to_minutes_ceil( fromTime )
+        if includeTo:
+            toMinutes = to_minutes( toTime ) + 1
+        else:
+            toMinutes = to_minutes_ceil( toTime )
+        if self._updateIndex() is False:
+            ## entries are not sorted by start time
+            return [ entry for entry in entries if entry._endMinutes is not None and entry._startMinutes is not None
+                     if entry._endMinutes >= fromMinutes and entry._startMinutes < toMinutes ]
+        endPos = bisect_left( self._indexStarts, toMinutes )
+        ## all entries before 'startPos' end before 'fromTime'
+        startPos = bisect_left( self._indexMaxEnds, fromMinutes, 0, endPos )
         retList = []
-        for entry in self.entries:
-            if entry.endTime < fromDate:
-                continue
-            if entry.startTime > toDate:
-                continue
-            retList.append( entry )
+        for i in range( startPos, endPos ):
+            entry = entries[i]
+            endMinutes = entry._endMinutes
+            if endMinutes is not None and endMinutes >= fromMinutes:
+                retList.append( entry )
         return retList
 
+    def _invalidateIndex(self, position=0):
+        """Mark index invalid starting from given position of entries list."""
+        if position < self._indexSize:
+            self._indexSize = position
+        if self._analytics is not None:
+            self._analytics.invalidate( position )
+
+    def getAnalytics(self) -> HistoryAnalytics:
+        """Return view calculating duration totals of history."""
+        if self._analytics is None:
+            self._analytics = HistoryAnalytics( self )
+        return self._analytics
+
+    def _updateIndex(self):
+        """Update invalid part of index. Returns False if entries are not sorted by start time."""
+        entries = self.entries
+        entriesNum = len( entries )
+        size = min( self._indexSize, entriesNum )
+        if self._indexStarts is None:
+            self._indexStarts  = []
+            self._indexMaxEnds = []
+            size = 0
+        if size == entriesNum and len( self._indexStarts ) == entriesNum:
+            return self._indexUnsorted is None
+        starts  = self._indexStarts
+        maxEnds = self._indexMaxEnds
+        del starts[ size: ]
+        del maxEnds[ size: ]
+        if self._indexUnsorted is not None and self._indexUnsorted >= size:
+            self._indexUnsorted = None
+        prevStart = starts[-1] if size > 0 else MIN_MINUTES
+        maxEnd    = maxEnds[-1] if size > 0 else MIN_MINUTES
+        for i in range( size, entriesNum ):
+            entry = entries[i]
+            startMinutes = entry._startMinutes
+            if startMinutes is None:
+                startMinutes = MIN_MINUTES
+            if startMinutes < prevStart and self._indexUnsorted is None:
+                self._indexUnsorted = i
+            prevStart = startMinutes
+            starts.append( startMinutes )
+            endMinutes = entry._endMinutes
+            if endMinutes is not None and endMinutes > maxEnd:
+                maxEnd = endMinutes
+            maxEnds.append( maxEnd )
+        self._indexSize = entriesNum
+        return self._indexUnsorted is None
+
     def addEntry(self, entry):
-        self.entries.append( entry )
-        self.sort()
+        """Insert entry keeping entries sorted by start time."""
+        entries = self.entries
+        if self._updateIndex() is False:
+            ## entries are not sorted -- sort all
+            with self._resetting():
+                entries.append( entry )
+                self._attachEntry( entry )
+                self.sort()
+            return
+        ## insert after entries with the same start time (the same as stable sort)
+        position = bisect_right( self._indexStarts, self._sortKey( entry ) )
+        self._listener.beginInsertEntries( position, position )
+        entries.insert( position, entry )
+        self._attachEntry( entry )
+        self._invalidateIndex( position )
+        self._invalidatePositions( position )
+        if self._positionsSize == position:
+            entry._position = position
+            self._positionsSize += 1
+        self._listener.endInsertEntries()
+
+    def addEntries(self, entriesList: List[ WorkLogEntry ]):
+        """Add entries in any order."""
+        self.mergeSortedEntries( sorted( entriesList, key=self._sortKey ) )
+
+    def mergeSortedEntries(self, entriesList: List[ WorkLogEntry ]):
+        """Merge entries sorted by start time in one pass over history."""
+        entries = self.entries
+        for entry in entriesList:
+            entry._owner = self
+            self._registerEntry( entry )
+            self._trackChanged( entry )
+            self._invalidateDays( entry.startTime, entry.endTime )
+        if entriesList:
+            self._generation += 1
+        if self._updateIndex() is False:
+            ## entries are not sorted -- sort all
+            with self._resetting():
+                entries.extend( entriesList )
+                self.sort()
+            return
+        if not entriesList:
+            return
+        position = bisect_right( self._indexStarts, self._sortKey( entriesList[0] ) )
+        if position == len( entries ):
+            self._listener.beginInsertEntries( position, position + len( entriesList ) - 1 )
+            entries.extend( entriesList )
+            self._invalidateIndex( position )
+            self._invalidatePositions( position )
+            self._listener.endInsertEntries()
+            return
+        merged = heapq.merge( entries[ position: ], entriesList, key=self._sortKey )
+        if self._listener is NULL_LISTENER:
+            entries[ position: ] = merged
+            self._invalidateIndex( position )
+            self._invalidatePositions( position )
+            return
+        ## insert consecutive runs of new entries in order, so rows are announced at final positions
+        addedSet = set( id( entry ) for entry in entriesList )
+        runs: List[ Tuple[ int, List[ WorkLogEntry ] ] ] = []
+        for row, entry in enumerate( merged, position ):
+            if id( entry ) not in addedSet:
+                continue
+            if runs and runs[-1][0] + len( runs[-1][1] ) == row:
+                runs[-1][1].append( entry )
+            else:
+                runs.append( ( row, [ entry ] ) )
+        for row, runList in runs:
+            self._listener.beginInsertEntries( row, row + len( runList ) - 1 )
+            entries[ row:row ] = runList
+            self._invalidateIndex( row )
+            self._invalidatePositions( row )
+            self._listener.endInsertEntries()
+
+    def setEntries(self, entriesList: List[ WorkLogEntry ]):
+        with self._resetting():
+            self._dayDurations = None
+            self._uncompactedDays = None
+            for entry in self.entries:
+                self._detachEntry( entry )
+            self.entries = list()
+            self._invalidateIndex()
+            self._invalidatePositions()
+            self.addEntries( entriesList )
 
     def addEntryTime(self, entryDate: date, startTime: time, endTime: time, desc: str = "", work: bool = True):
         dateTimeStart = datetime.combine( entryDate, startTime )
@@ -192,25 +791,69 @@ class WorkLogData( persist.Versionable ):
         return entry
 
     def addEntryTimeList(self, timeList: List[ Tuple[datetime, datetime] ]):
+        entriesList = []
         for span in timeList:
             entry = WorkLogEntry()
             entry.startTime = span[0]
             entry.endTime   = span[1]
-            self.addEntry( entry )
+            entriesList.append( entry )
+        self.addEntries( entriesList )
 
     def replaceEntry( self, oldEntry: WorkLogEntry, newEntry: WorkLogEntry ):
         _LOGGER.debug( "replacing entry %s with %s", oldEntry, newEntry )
-        for i, _ in enumerate( self.entries ):
-            currItem = self.entries[i]
-            if currItem == oldEntry:
-                self.entries[i] = newEntry
-                self.sort()
-                return True
-        _LOGGER.debug( "replacing failed" )
-        return False
-
-    def removeEntry(self, entry):
-        self.entries.remove( entry )
+        try:
+            entryIndex = self.getEntryIndex( oldEntry )
+        except ValueError:
+            _LOGGER.debug( "replacing failed" )
+            return False
+        self.removeEntry( oldEntry, entryIndex )
+        self.addEntry( newEntry )
+        return True
+
+    def removeEntry(self, entry, entryIndex: int = None):
+        if entryIndex is None:
+            entryIndex = self.getEntryIndex( entry )
+        self._listener.beginRemoveEntries( entryIndex, entryIndex )
+        del self.entries[ entryIndex ]
+        self._detachEntry( entry )
+        self._invalidateIndex( entryIndex )
+        self._invalidatePositions( entryIndex )
+        self._listener.endRemoveEntries()
+
+    def removeEntries(self, entriesList: List[ WorkLogEntry ]):
+        """Remove many entries in one pass over history."""
+        removedSet = set( id( entry ) for entry in entriesList )
+        if not removedSet:
+            return
+        entries = self.entries
+        if self._listener is NULL_LISTENER:
+            firstIndex = min( self.getEntryIndex( entry ) for entry in entriesList )
+            entries[ firstIndex: ] = [ entry for entry in entries[ firstIndex: ] if id( entry ) not in removedSet ]
+            self._invalidateIndex( firstIndex )
+            self._invalidatePositions( firstIndex )
+        else:
+            ## remove consecutive runs of rows from the last one, so announced rows stay valid
+            rowsList = sorted( set( self.getEntryIndex( entry ) for entry in entriesList ), reverse=True )
+            runEnd = rowsList[0]
+            for i, row in enumerate( rowsList ):
+                if i + 1 < len( rowsList ) and rowsList[ i + 1 ] == row - 1:
+                    continue
+                self._listener.beginRemoveEntries( row, runEnd )
+                del entries[ row:runEnd + 1 ]
+                self._invalidateIndex( row )
+                self._invalidatePositions( row )
+                self._listener.endRemoveEntries()
+                if i + 1 < len( rowsList ):
+                    runEnd = rowsList[ i + 1 ]
+        for entry in entriesList:
+            self._detachEntry( entry )
+
+    def unloadEntries(self, entriesList: List[ WorkLogEntry ]):
+        """Remove entries without tracking their removal (e.g. entries of stored partition not needed any more)."""
+        self.removeEntries( entriesList )
+        if self._removedEntries:
+            for entry in entriesList:
+                self._removedEntries.pop( entry._id, None )
 
     def joinEntryUp(self, entry):
         try:
@@ -250,7 +893,7 @@ class WorkLogData( persist.Versionable ):
         if sourceEntry.description:
             targetEntry.description = sourceEntry.description + "\n" + targetEntry.description
             targetEntry.description = targetEntry.description.strip()
-        self.entries.remove( sourceEntry )
+        self.removeEntry( sourceEntry )
 
     def mergeEntryDown(self, entry):
         nextEntry = self.nextEntry( entry )
@@ -263,17 +906,20 @@ class WorkLogData( persist.Versionable ):
         if sourceEntry.description:
             targetEntry.description = sourceEntry.description + "\n" + targetEntry.description
             targetEntry.description = targetEntry.description.strip()
-        self.entries.remove( sourceEntry )
+        self.removeEntry( sourceEntry )
 
     def sort(self):
-        self.entries.sort( key=self._sortKey, reverse=False )
+        with self._resetting():
+            self.entries.sort( key=self._sortKey, reverse=False )
+            self._invalidateIndex()
+            self._invalidatePositions()
 
     @staticmethod
     def _sortKey( entry: WorkLogEntry ):
-        retDate = entry.startTime
-        if retDate is None:
-            return datetime.min
-        return retDate
+        startMinutes = entry._startMinutes
+        if startMinutes is None:
+            return MIN_MINUTES
+        return startMinutes
 
     def printData( self ):
         retStr = ""
@@ -291,10 +937,52 @@ class DataContainer( persist.Versionable ):
     ## 1 - add worklog history
     _class_version = 1
 
+    _transient_fields = ( "_notesGeneration", )
+
+    ## notes modification counter
+    _notesGeneration: int = 0
+
     def __init__(self):
         self.history: WorkLogData = WorkLogData()
         self.notes                = { "notes": "" }        ## default notes
 
+    def setNotes(self, newNotes: Dict[str, str]):
+        if newNotes == self.notes:
+            return
+        self.notes = newNotes
+        self._notesGeneration += 1
+
+    def generation(self):
+        """Return value changing on every modification of data."""
+        return ( id( self.history ), self.history.generation, self._notesGeneration )
+
+
+## ==================================================================
+
+
+class EntriesChange():
+    """Change of history entries passed by notifications.
+
+    'rows' are positions of entries in history: after change for inserted
+    and modified entries, before change for removed entries. Range of
+    affected days is given by 'fromDate' and 'toDate' (None if unknown).
+    """
+
+    def __init__(self, entries: List[ WorkLogEntry ], rows: List[ int ], spans: List[ Tuple[ datetime, datetime ] ]):
+        self.entries = entries
+        self.rows    = rows
+        self.fromDate: date = None
+        self.toDate: date   = None
+        timesList = [ value for span in spans for value in span ]
+        if None not in timesList and timesList:
+            self.fromDate = min( timesList ).date()
+            self.toDate   = max( timesList ).date()
+
+    def containsDate(self, dateValue: date) -> bool:
+        if self.fromDate is None:
+            return True
+        return self.fromDate <= dateValue <= self.toDate
+
 
 ## ==================================================================
 
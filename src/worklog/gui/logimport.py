@@ -0,0 +1,226 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import logging
+import os
+import re
+import gzip
+import pickle
+import datetime
+from typing import Dict, List, Tuple
+
+from worklog import persist
+from worklog.gui.datatypes import WorkLogEntry, to_minutes, from_minutes
+from worklog.gui.overlaps import merge_descriptions
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+## number of leading bytes of file used to detect that file was replaced
+HEAD_SIZE = 128
+
+## suffix of rotated log file, e.g. ".1" or ".2.gz"
+ROTATED_SUFFIX_PATTERN = re.compile( r'^\.(\d+)(\.gz)?$' )
+
+
+def find_rotated_logs( logPath: str ) -> List[ str ]:
+    """Return paths of existing log file and its rotated versions ordered from the oldest.
+
+    Rotated files are expected in logrotate's numbered format: 'kern.log.1',
+    'kern.log.2.gz' and so on.
+    """
+    logDir, logName = os.path.split( logPath )
+    try:
+        dirContent = os.listdir( logDir or "." )
+    except OSError:
+        _LOGGER.warning( "unable to list log directory: %s", logDir )
+        return []
+    rotatedList = []
+    for fileName in dirContent:
+        if fileName.startswith( logName ) is False:
+            continue
+        matched = ROTATED_SUFFIX_PATTERN.match( fileName[ len( logName ): ] )
+        if matched is None:
+            continue
+        rotatedList.append( ( int( matched.group(1) ), fileName ) )
+    rotatedList.sort( reverse=True )
+    pathsList = [ os.path.join( logDir, fileName ) for _, fileName in rotatedList ]
+    if logName in dirContent:
+        pathsList.append( logPath )
+    return pathsList
+
+
+def is_compressed( filePath: str ) -> bool:
+    return filePath.endswith( ".gz" )
+
+
+def open_log_file( filePath: str ):
+    """Open log file for reading bytes, compressed files are decompressed while reading."""
+    if is_compressed( filePath ):
+        return gzip.open( filePath, 'rb' )
+    return open( filePath, 'rb' )
+
+
+class LogFileState( persist.Versionable ):
+    """Position of parsing of log file allowing to continue parsing of appended lines.
+
+    File is identified by inode and leading bytes, so state follows the file
+    when it is renamed by log rotation.
+    """
+
+    ## 0 - first version
+    _class_version = 0
+
+    def __init__(self, inode: int = None, head: bytes = b""):
+        self.inode = inode
+        self.head  = head
+        ## number of bytes parsed (end of last complete line)
+        self.offset = 0
+        ## recent kernel timestamp (time from boot)
+        self.kernTimestamp = 0.0
+        ## recent pair ( wall clock, kernel timestamp ) of interval not closed yet
+        self.lastLog: Tuple[ datetime.datetime, float ] = None
+        ## is system suspended at the end of parsed part
+        self.suspended = False
+
+    def matches(self, inode: int, head: bytes, size: int) -> bool:
+        if inode != self.inode or size < self.offset:
+            return False
+        return head.startswith( self.head ) or self.head.startswith( head )
+
+
+class LogImportState( persist.Versionable ):
+    """Parsing state of imported log files (e.g. /var/log/kern.log), stored in data directory."""
+
+    ## 0 - first version
+    _class_version = 0
+
+    STATE_FILE = "logimport.obj"
+
+    def __init__(self):
+        ## file path -> state
+        self.files: Dict[ str, LogFileState ] = {}
+
+    def getFileState(self, filePath: str) -> Tuple[ LogFileState, int ]:
+        """Return pair of state of given file and its current size.
+
+        New state is returned if file is not known (e.g. after rotation or truncation).
+        Returns ( None, 0 ) if file does not exist.
+        """
+        try:
+            fileStat = os.stat( filePath )
+            with open( filePath, 'rb' ) as fp:
+                head = fp.read( HEAD_SIZE )
+        except OSError:
+            _LOGGER.warning( "unable to access log file: %s", filePath )
+            return ( None, 0 )
+        fileState = None
+        for state in self.files.values():
+            if state.matches( fileStat.st_ino, head, fileStat.st_size ):
+                fileState = state
+                break
+        if fileState is None:
+            fileState = LogFileState( fileStat.st_ino, head )
+        elif len( fileState.head ) < len( head ):
+            fileState.head = head
+        self.files[ filePath ] = fileState
+        return ( fileState, fileStat.st_size )
+
+    def store(self, outputDir):
+        ## replace whole file, so interrupted write does not lose offsets of previous import
+        persist.replace_content( pickle.dumps( self ), os.path.join( outputDir, self.STATE_FILE ) )
+
+    @classmethod
+    def load(cls, inputDir) -> 'LogImportState':
+        stateFile = os.path.join( inputDir, cls.STATE_FILE )
+        if os.path.isfile( stateFile ) is False:
+            return cls()
+        try:
+            state = persist.load_object_simple( stateFile, None )
+        except (pickle.UnpicklingError, EOFError):
+            _LOGGER.exception( "unable to load log import state: %s", stateFile )
+            state = None
+        if not isinstance( state, LogImportState ):
+            return cls()
+        return state
+
+
+def merge_log_items( entriesList: List[ WorkLogEntry ],
+                     items: List[ Tuple[ datetime.datetime, datetime.datetime ] ] ) -> Tuple[ List[ WorkLogEntry ], List[ WorkLogEntry ] ]:
+    """Merge-join activity intervals into entries in one pass.
+
+    'entriesList' are entries sorted by start time that may overlap 'items'.
+    Interval overlapping work entries extends them, interval overlapping many
+    work entries (existing or created by previous intervals) merges them into
+    the earliest one, otherwise new entry is created. Break entries are left
+    unchanged, so activity during break creates new entry. Entries are
+    modified in place.
+    Returns pair of lists: created entries and entries merged into others.
+    """
+    newEntries: List[ WorkLogEntry ] = []
+    removedEntries: List[ WorkLogEntry ] = []
+    createdSet = set()
+    mergedSet  = set()
+    entriesNum = len( entriesList )
+    entryPos = 0
+    active: List[ WorkLogEntry ] = []           ## entries that may overlap next intervals
+    ## compare minutes kept by entries, so no datetime objects are created in the loop
+    spansList = sorted( ( to_minutes( startTime ), to_minutes( endTime ) ) for startTime, endTime in items )
+    for startMinutes, endMinutes in spansList:
+        ## intervals are sorted, so entries ended before current one will not overlap any further
+        active = [ entry for entry in active if entry.endMinutes >= startMinutes ]
+        while entryPos < entriesNum and entriesList[ entryPos ].startMinutes <= endMinutes:
+            entry = entriesList[ entryPos ]
+            entryPos += 1
+            if entry.work and entry.endMinutes >= startMinutes:
+                active.append( entry )
+        foundEntries = [ entry for entry in active if entry.startMinutes <= endMinutes ]
+        if not foundEntries:
+            entry = WorkLogEntry.fromMinutes( startMinutes, endMinutes )
+            newEntries.append( entry )
+            createdSet.add( id( entry ) )
+            active.append( entry )
+            continue
+        ## merge into earliest entry regardless of order of active entries
+        foundEntries.sort( key=WorkLogEntry.startMinutes.fget )
+        targetEntry = foundEntries[0]
+        for entry in foundEntries:
+            if entry.startMinutes < startMinutes:
+                startMinutes = entry.startMinutes
+            if entry.endMinutes > endMinutes:
+                endMinutes = entry.endMinutes
+        for entry in foundEntries[1:]:
+            targetEntry.description = merge_descriptions( targetEntry.description, entry.description )
+            active.remove( entry )
+            if id( entry ) in createdSet:
+                mergedSet.add( id( entry ) )
+            else:
+                removedEntries.append( entry )
+        if targetEntry.startMinutes != startMinutes:
+            targetEntry.startTime = from_minutes( startMinutes )
+        if targetEntry.endMinutes != endMinutes:
+            targetEntry.endTime = from_minutes( endMinutes )
+    if mergedSet:
+        newEntries = [ entry for entry in newEntries if id( entry ) not in mergedSet ]
+    return ( newEntries, removedEntries )
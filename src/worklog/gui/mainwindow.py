@@ -29,13 +29,17 @@ from PyQt5.QtWidgets import QDialog
 from PyQt5.QtWidgets import qApp
 
 from worklog.gui import trayicon
+from worklog.gui.analytics import balance_summary
 from worklog.gui.appwindow import AppWindow
 from worklog.gui.dataobject import DataObject
-from worklog.gui.datatypes import WorkLogData, WorkLogEntry
+from worklog.gui.datatypes import WorkLogData, WorkLogEntry, EntriesChange
+from worklog.gui.overlaps import SCREEN_SAVER_DESCRIPTION, SESSION_LOCK_DESCRIPTION
 from worklog.gui.useractivity import UserActivity
+from worklog.gui.savescheduler import SaveScheduler
 from worklog.gui.widget.settingsdialog import SettingsDialog, AppSettings
 from worklog.gui.widget.navcalendar import NavCalendarHighlightModel
 from worklog.gui.widget import logwidget
+from worklog.gui.widget import reportwidget
 
 from . import uiloader
 from . import guistate
@@ -65,6 +69,12 @@ class MainWindow( QtBaseClass ):           # type: ignore
         self.tickTimer.timeout.connect( self.updateRecentEntry )
         self.tickTimer.start( 45 * 1000 )                           ## every 45 secs
 
+        ## single pending save for notes changes and entries edits
+        self.saveScheduler = SaveScheduler( self )
+        self.saveScheduler.saveTriggered.connect( self.saveData )
+        ## changes made while counter is positive do not request save (e.g. made by save itself)
+        self._saveTriggerBlocked = 0
+
         ## =============================================================
 
         undoStack = self.data.undoStack
@@ -79,9 +89,14 @@ class MainWindow( QtBaseClass ):           # type: ignore
         self.ui.menuEdit.insertAction( self.ui.actionRedo, redoAction )
         self.ui.menuEdit.removeAction( self.ui.actionRedo )
 
+        undoStack.indexChanged.connect( self.triggerSaveTimer )
+
         self.ui.actionSave_data.triggered.connect( self.saveData )
+        self.ui.actionReport.triggered.connect( self.openReportWindow )
         self.ui.actionLogs.triggered.connect( self.openLogsWindow )
         self.ui.actionOptions.triggered.connect( self.openSettingsDialog )
+        self.ui.actionFix_overlaps.triggered.connect( self.fixOverlaps )
+        self.ui.actionCompact_entries.triggered.connect( self.compactEntries )
 
         ## =============================================================
 
@@ -98,6 +113,16 @@ class MainWindow( QtBaseClass ):           # type: ignore
         ## ================== connecting signals ==================
 
         self.data.entryChanged.connect( self.updateView )
+        self.data.entryChanged.connect( self.triggerSaveTimer )
+        self.data.entriesReloaded.connect( self.updateView )
+        self.data.entriesInserted.connect( self.updateEntriesView )
+        self.data.entriesRemoved.connect( self._entriesRemoved )
+        self.data.entriesModified.connect( self.updateEntriesView )
+        self.data.entriesInserted.connect( self.triggerSaveTimer )
+        self.data.entriesRemoved.connect( self.triggerSaveTimer )
+        self.data.entriesModified.connect( self.triggerSaveTimer )
+        self.data.dataStored.connect( self._dataStored )
+        self.data.storeFailed.connect( self._storeFailed )
 
         self.activity.sessionChanged.connect( self._sessionChanged )
         self.activity.ssaverChanged.connect( self._screenSaverChanged )
@@ -138,39 +163,68 @@ class MainWindow( QtBaseClass ):           # type: ignore
         self.updateRecentEntry()
         self.refreshView()
 
-    def loadData(self):
+    def loadData(self, normalize=False):
         """Load user related data (e.g. favs, notes)."""
         dataPath = self.getDataPath()
+        self.data.setStorageMode( self.appSettings.storageMode )
         self.data.load( dataPath )
         self.readFromKernlog()
+        if normalize:
+            self.data.normalizeHistory()
         self.refreshView()
 
     def readFromKernlog(self):
         workMode = self.appSettings.workMode
         self.data.readFromKernlog( workMode )
 
+    def fixOverlaps(self):
+        if self.data.normalizeEntries() is False:
+            self.setStatusMessage( "No overlapping entries found", timeout=10000 )
+
+    def compactEntries(self):
+        removedNum = self.data.compactEntries()
+        self.setStatusMessage( "Compacted entries, removed: %s" % removedNum, timeout=10000 )
+
     def triggerSaveTimer(self):
-        timeout = 30000
-        _LOGGER.info("triggering save timer with timeout %s", timeout)
-        QtCore.QTimer.singleShot( timeout, self.saveData )
+        if self._saveTriggerBlocked > 0:
+            return
+        self.saveScheduler.request()
 
     def saveData(self):
-        self.updateRecentEntry()
-        if self._saveData():
-            self.setStatusMessage( "Data saved" )
-        else:
-            self.setStatusMessage( "Nothing to save" )
+        ## changes made while preparing data are stored by this save
+        self._saveTriggerBlocked += 1
+        try:
+            self.updateRecentEntry()
+            self._saveData()
+        finally:
+            self._saveTriggerBlocked -= 1
+        ## pending save is handled now
+        self.saveScheduler.cancel()
 
     # pylint: disable=E0202
-    def _saveData(self):
+    def _saveData(self, wait=False):
         ## having separate slot allows to monkey patch / mock "_saveData()" method
         _LOGGER.info( "storing data" )
         dataPath = self.getDataPath()
         self.data.notes = self.ui.notesWidget.getNotes()
-        return self.data.store( dataPath )
+        self.data.compactActivity()
+        if wait:
+            self.data.store( dataPath )
+        else:
+            self.data.storeAsync( dataPath )
+
+    def _dataStored(self, stored: bool):
+        if stored:
+            self.setStatusMessage( "Data saved" )
+        else:
+            self.setStatusMessage( "Nothing to save" )
+
+    def _storeFailed(self, message: str):
+        self.setStatusMessage( "Saving data failed: " + message )
 
     def disableSaving(self):
-        def save_data_mock():
+        # pylint: disable=W0613
+        def save_data_mock( wait=False ):
             _LOGGER.info("saving data is disabled")
         _LOGGER.info("disabling saving data")
         self._saveData = save_data_mock           # type: ignore
@@ -205,37 +259,33 @@ class MainWindow( QtBaseClass ):           # type: ignore
         if timeDiff > timedelta( hours=2 ):
             _LOGGER.warning( "unable to update -- recent entry end time to old" )
             return
+        oldSpan = ( recentEntry.startTime, recentEntry.endTime )
         recentEntry.endTime = currTime
-        self.refreshEntryView( recentEntry )
+        if recentEntry.endTime != oldSpan[1]:
+            ## periodic extension of recent entry is stored with next save, it does not request one
+            self._saveTriggerBlocked += 1
+            try:
+                self.data.notifyEntriesModified( [ recentEntry ], [ oldSpan ] )
+            finally:
+                self._saveTriggerBlocked -= 1
         working = self.isWorking()
         if working == recentEntry.work:
             _LOGGER.warning( "unable to update -- work status not changed: %s %s", working, recentEntry.printData() )
             return
         newEntry = self.data.addNewEntry( working )
         _LOGGER.warning( "adding new entry: %s", newEntry.printData() )
-        self.refreshEntryView( newEntry )
-
-    def refreshEntryView(self, entity):
-        self.ui.worklogTable.refreshEntry( entity )
-        self.ui.dayEntriesWidget.update()
-        if self.isShowDetails( entity ):
-            self.showDetails( entity )
-        self.ui.dayEntriesWidget.updateDayWorkTime()
-        self.updateTrayToolTip()
 
     def _screenSaverChanged(self, state):
         ### state:
         ###    True  -- screen saver started
         ###    False -- screen saver stopped
-        self.awayFromKeyboardChanged( state, "screen saver changed" )
-        self.refreshView()
+        self.awayFromKeyboardChanged( state, SCREEN_SAVER_DESCRIPTION )
 
     def _sessionChanged(self, state):
         ### state:
         ###    True  -- session locked
         ###    False -- session unlocked
-        self.awayFromKeyboardChanged( state, "session lock changed" )
-        self.refreshView()
+        self.awayFromKeyboardChanged( state, SESSION_LOCK_DESCRIPTION )
 
     def awayFromKeyboardChanged(self, state, description="") -> WorkLogEntry:
         ### state:
@@ -250,7 +300,9 @@ class MainWindow( QtBaseClass ):           # type: ignore
                 return None
             newEntry = self.data.addNewEntry( False )
             newEntry.description = description
+            oldSpan = ( recentEntry.startTime, recentEntry.endTime )
             history.joinDown( recentEntry, newEntry )
+            self.data.notifyEntriesModified( [ recentEntry, newEntry ], [ oldSpan ] )
             _LOGGER.debug( "added new entry: %s", newEntry.printData() )
             return newEntry
         else:
@@ -261,10 +313,20 @@ class MainWindow( QtBaseClass ):           # type: ignore
             if recentEntry.getDuration() < timedelta( minutes=3 ):
                 recentEntry.description = ""
                 _LOGGER.debug( "merging entry up: %s", recentEntry.printData() )
-                history.mergeEntryUp( recentEntry )
+                prevEntry = history.prevEntry( recentEntry )
+                if prevEntry is None:
+                    self.data.notifyEntriesModified( [ recentEntry ], [] )
+                    return None
+                oldSpan = ( prevEntry.startTime, prevEntry.endTime )
+                row = history.getEntryIndex( recentEntry )
+                history.mergeUp( recentEntry, prevEntry )
+                self.data.notifyEntriesRemoved( [ recentEntry ], [ row ] )
+                self.data.notifyEntriesModified( [ prevEntry ], [ oldSpan ] )
                 return None
             newEntry = self.data.addNewEntry( True )
+            oldSpan = ( recentEntry.startTime, recentEntry.endTime )
             history.joinDown( recentEntry, newEntry )
+            self.data.notifyEntriesModified( [ recentEntry ], [ oldSpan ] )
             _LOGGER.debug( "added new entry: %s", newEntry.printData() )
             return newEntry
 
@@ -302,13 +364,32 @@ class MainWindow( QtBaseClass ):           # type: ignore
         self.ui.dayEntriesWidget.updateDayWorkTime()
         self.updateTrayToolTip()
 
+    def updateEntriesView(self, change: EntriesChange):
+        """Update views showing entries of given change."""
+        self.ui.navcalendar.updateDateRange( change.fromDate, change.toDate )
+        for entry in change.entries:
+            if self.isShowDetails( entry ):
+                self.showDetails( entry )
+        self.ui.dayEntriesWidget.updateChangedWorkTime( change )
+        recentEntry = self.data.history.recentEntry()
+        if change.containsDate( date.today() ) or recentEntry in change.entries:
+            self.updateTrayToolTip()
+
+    def _entriesRemoved(self, change: EntriesChange):
+        for entry in change.entries:
+            if self.isShowDetails( entry ):
+                self.hideDetails()
+        self.updateEntriesView( change )
+
     def calendarPageChanged(self, year: int, month: int):
+        self.data.loadMonth( date( year=year, month=month, day=1 ) )
         self.ui.worklogTable.setMonth( year, month )
 
     def calendarSelectionChanged(self):
         self.ui.worklogTable.clearSelection()
         selectedDate = self.ui.navcalendar.selectedDate()
         dateValue = selectedDate.toPyDate()
+        self.data.loadMonth( dateValue )
         self.ui.dayEntriesWidget.setCurrentDate( dateValue )
 
     def showDetails(self, entity):
@@ -382,6 +463,11 @@ class MainWindow( QtBaseClass ):           # type: ignore
         currDate = datetime.today().date()
         workTime = self.data.calculateWorkDuration( currDate )
         toolTip += "\n" + "Work duration: " + str( workTime )
+
+        ## totals are read from prefix sums, so history is not scanned on every tick
+        rollup = self.data.history.getAnalytics().getRollup()
+        dailyTarget = timedelta( hours=self.appSettings.dailyTargetHours )
+        toolTip += "\n\n" + "\n".join( balance_summary( rollup, currDate, dailyTarget ) )
         self.trayIcon.setToolTip( toolTip )
 
     def setIconTheme(self, theme: trayicon.TrayIconTheme):
@@ -447,10 +533,17 @@ class MainWindow( QtBaseClass ):           # type: ignore
     def saveAll(self):
         _LOGGER.info("saving application state")
         self.saveSettings()
-        self.saveData()
+        ## event loop can be already finished -- store synchronously
+        self.saveScheduler.cancel()
+        self.updateRecentEntry()
+        self._saveData( wait=True )
 
     ## ====================================================================
 
+    def openReportWindow(self):
+        dailyTarget = timedelta( hours=self.appSettings.dailyTargetHours )
+        reportwidget.create_window( self.data, dailyTarget, self )
+
     def openLogsWindow(self):
         logwidget.create_window( self )
 
@@ -467,6 +560,10 @@ class MainWindow( QtBaseClass ):           # type: ignore
 
     def applySettings(self, force=False):
         self.setIconTheme( self.appSettings.trayIcon )
+        dailyTarget = timedelta( hours=self.appSettings.dailyTargetHours )
+        for widget in self.findChildren( reportwidget.ReportWidget ):
+            widget.setDailyTarget( dailyTarget )
+        self.data.setStorageMode( self.appSettings.storageMode )
         workMode = self.appSettings.workMode
         if self.trayIcon.isWorkLogging() is not workMode or force is True:
             self.trayIcon.setWorkLogging( workMode )
@@ -512,7 +609,6 @@ class DataHighlightModel( NavCalendarHighlightModel ):
         return False
 
     def isOccupied(self, dateValue: QtCore.QDate):
-        history: WorkLogData = self.dataObject.history
         entryDate = dateValue.toPyDate()
-        entriesList = history.getEntriesForDate( entryDate )
+        entriesList = self.dataObject.getEntriesForDate( entryDate )
         return len(entriesList) > 0
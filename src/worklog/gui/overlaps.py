@@ -0,0 +1,228 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import logging
+import heapq
+from typing import List, Set, Tuple
+
+from worklog.gui.datatypes import WorkLogData, WorkLogEntry, from_minutes
+
+
+_LOGGER = logging.getLogger(__name__)
+
+## descriptions of entries created by activity tracking
+SCREEN_SAVER_DESCRIPTION = "screen saver changed"
+SESSION_LOCK_DESCRIPTION = "session lock changed"
+AUTO_DESCRIPTIONS = frozenset( [ "", SCREEN_SAVER_DESCRIPTION, SESSION_LOCK_DESCRIPTION ] )
+
+
+def valid_span( entry: WorkLogEntry ):
+    return entry.startMinutes is not None and entry.endMinutes is not None
+
+
+def is_activity_fragment( entry: WorkLogEntry ):
+    """Check if entry is created by activity tracking (has no description given by user)."""
+    return all( line.strip() in AUTO_DESCRIPTIONS for line in entry.description.split( "\n" ) )
+
+
+def find_overlaps( entriesList: List[ WorkLogEntry ] ) -> List[ Tuple[ WorkLogEntry, WorkLogEntry ] ]:
+    """Find pairs of overlapping entries (earlier entry first).
+
+    Entries are swept in order of start time keeping heap of end times of
+    entries still open, so cost is O(n log n) plus number of found pairs.
+    Zero-length entries do not overlap anything.
+    """
+    ordered = sorted( ( entry for entry in entriesList if valid_span( entry ) and entry.endMinutes > entry.startMinutes ),
+                      key=WorkLogEntry.startMinutes.fget )
+    active  = []                ## heap of ( end time, order, entry )
+    overlaps = []
+    for order, entry in enumerate( ordered ):
+        startTime = entry.startMinutes
+        while active and active[0][0] <= startTime:
+            heapq.heappop( active )
+        for item in active:
+            overlaps.append( ( item[2], entry ) )
+        heapq.heappush( active, ( entry.endMinutes, order, entry ) )
+    return overlaps
+
+
+class EntriesNormalization():
+    """Changes making entries disjoint.
+
+    'removed' contains entries to remove, 'modified' contains pairs of entry
+    and its new values ( start minutes, end minutes, description ).
+    """
+
+    def __init__(self):
+        self.removed: List[ WorkLogEntry ] = []
+        self.modified: List[ Tuple[ WorkLogEntry, Tuple[ int, int, str ] ] ] = []
+
+    def isEmpty(self):
+        return not self.removed and not self.modified
+
+    def apply(self, history: WorkLogData):
+        """Apply changes to history."""
+        history.removeEntries( self.removed )
+        for entry, values in self.modified:
+            set_entry_values( entry, values )
+
+
+def entry_values( entry: WorkLogEntry ) -> Tuple[ int, int, str ]:
+    return ( entry.startMinutes, entry.endMinutes, entry.description )
+
+
+def set_entry_values( entry: WorkLogEntry, values: Tuple[ int, int, str ] ):
+    entry.endTime     = from_minutes( values[1] )
+    entry.startTime   = from_minutes( values[0] )
+    entry.description = values[2]
+
+
+def merge_descriptions( first: str, second: str ):
+    if not second or second == first:
+        return first
+    if not first:
+        return second
+    return first + "\n" + second
+
+
+def plan_normalization( entriesList: List[ WorkLogEntry ], mergeSameWork=True ) -> EntriesNormalization:
+    """Calculate changes removing overlaps between entries in one sweep.
+
+    Empty entries (ending not after start) are dropped. Overlapping entry
+    of the same kind ('work' flag) is merged into preceding entry if
+    'mergeSameWork' is set. Otherwise preceding entry takes precedence:
+    start of overlapping entry is moved to end of preceding entry and
+    entry covered completely is dropped.
+    """
+    normalization = EntriesNormalization()
+    ordered = sorted( ( entry for entry in entriesList if valid_span( entry ) ),
+                      key=WorkLogEntry.startMinutes.fget )
+
+    prevEntry: WorkLogEntry = None
+    prevValues = None
+
+    def finish_entry():
+        if prevEntry is not None and tuple( prevValues ) != entry_values( prevEntry ):
+            normalization.modified.append( ( prevEntry, tuple( prevValues ) ) )
+
+    for entry in ordered:
+        startTime, endTime = entry.startMinutes, entry.endMinutes
+        if endTime <= startTime:
+            normalization.removed.append( entry )
+            continue
+        if prevEntry is not None and startTime < prevValues[1]:
+            if mergeSameWork and entry.work == prevEntry.work:
+                prevValues[1] = max( prevValues[1], endTime )
+                prevValues[2] = merge_descriptions( prevValues[2], entry.description )
+                normalization.removed.append( entry )
+                continue
+            if endTime <= prevValues[1]:
+                normalization.removed.append( entry )
+                continue
+            startTime = prevValues[1]
+        finish_entry()
+        prevEntry  = entry
+        prevValues = [ startTime, endTime, entry.description ]
+    finish_entry()
+    return normalization
+
+
+def plan_compaction( entriesList: List[ WorkLogEntry ], keepEntry: WorkLogEntry = None,
+                     frozenIds: Set[ int ] = None, fragmentsOnly=False ) -> EntriesNormalization:
+    """Calculate changes merging back-to-back entries of the same kind and dropping zero-length entries.
+
+    Overlapping entries are left unchanged. 'keepEntry' (e.g. recent entry
+    still being extended) is neither dropped nor merged into other entry.
+    Entries with identifiers in 'frozenIds' are not changed at all, as well as
+    entries with user descriptions if 'fragmentsOnly' is set.
+    Description of dropped zero-length entry is moved to preceding entry
+    (or following one), entry is kept if there is no such entry.
+    """
+    normalization = EntriesNormalization()
+    ordered = sorted( ( entry for entry in entriesList if valid_span( entry ) ),
+                      key=WorkLogEntry.startMinutes.fget )
+    if frozenIds is None:
+        frozenIds = set()
+
+    prevEntry: WorkLogEntry = None
+    prevValues = None
+    ## zero-length entries with descriptions waiting for following entry
+    pendingList: List[ WorkLogEntry ] = []
+
+    def finish_entry():
+        if prevEntry is not None and tuple( prevValues ) != entry_values( prevEntry ):
+            normalization.modified.append( ( prevEntry, tuple( prevValues ) ) )
+
+    for entry in ordered:
+        if entry.entryId in frozenIds or ( fragmentsOnly and not is_activity_fragment( entry ) ):
+            finish_entry()
+            prevEntry  = None
+            prevValues = None
+            continue
+        if entry is not keepEntry:
+            if entry.endMinutes == entry.startMinutes:
+                if not entry.description:
+                    normalization.removed.append( entry )
+                elif prevEntry is not None:
+                    prevValues[2] = merge_descriptions( prevValues[2], entry.description )
+                    normalization.removed.append( entry )
+                else:
+                    pendingList.append( entry )
+                continue
+            if prevEntry is not None and entry.work == prevEntry.work and entry.startMinutes == prevValues[1]:
+                prevValues[1] = entry.endMinutes
+                prevValues[2] = merge_descriptions( prevValues[2], entry.description )
+                normalization.removed.append( entry )
+                continue
+        finish_entry()
+        prevEntry  = entry
+        prevValues = [ entry.startMinutes, entry.endMinutes, "" ]
+        for pendingEntry in pendingList:
+            prevValues[2] = merge_descriptions( prevValues[2], pendingEntry.description )
+            normalization.removed.append( pendingEntry )
+        pendingList = []
+        prevValues[2] = merge_descriptions( prevValues[2], entry.description )
+    finish_entry()
+    return normalization
+
+
+def compaction_candidates( history: WorkLogData ) -> List[ WorkLogEntry ]:
+    """Return entries of days modified since last compaction, none if modified days are unknown (e.g. after load)."""
+    days = history.getUncompactedDays()
+    if days is None:
+        return []
+    candidates = {}
+    for day in sorted( days ):
+        for entry in history.getEntriesForDate( day ):
+            candidates[ id( entry ) ] = entry
+    return list( candidates.values() )
+
+
+def normalize_history( history: WorkLogData, mergeSameWork=True ) -> EntriesNormalization:
+    """Remove overlaps in place without undo and notifications (e.g. for large imported histories)."""
+    normalization = plan_normalization( history.entries, mergeSameWork )
+    if normalization.isEmpty() is False:
+        _LOGGER.info( "normalizing history: removing %s entries, modifying %s entries",
+                      len( normalization.removed ), len( normalization.modified ) )
+        normalization.apply( history )
+    return normalization
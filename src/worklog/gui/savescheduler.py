@@ -0,0 +1,95 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import logging
+import time
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SaveScheduler( QObject ):
+    """Coalesce save requests using single timer.
+
+    Save is triggered when no request came for 'delay' milliseconds, but not
+    later than 'maxLatency' after first pending request. Saves are separated by
+    at least 'minInterval', so number of saves per minute is bounded regardless
+    of requests rate.
+    """
+
+    saveTriggered = pyqtSignal()
+
+    def __init__(self, parentObject=None, delay=5000, maxLatency=30000, minInterval=10000):
+        super().__init__( parentObject )
+        self.delay       = delay
+        self.maxLatency  = maxLatency
+        self.minInterval = minInterval
+
+        ## time of first not handled request (in milliseconds)
+        self._firstRequest = None
+        ## time of recent save (in milliseconds)
+        self._recentSave   = None
+
+        self._timer = QTimer( self )
+        self._timer.setSingleShot( True )
+        self._timer.timeout.connect( self._triggerSave )
+
+    def isPending(self):
+        return self._firstRequest is not None
+
+    def request(self):
+        currTime = self._currentTime()
+        if self._firstRequest is None:
+            self._firstRequest = currTime
+        timeout = self.calculateTimeout( currTime )
+        _LOGGER.debug( "scheduling save in %s ms", timeout )
+        self._timer.start( timeout )
+
+    def calculateTimeout(self, currTime):
+        """Return milliseconds from 'currTime' to pending save."""
+        saveTime = min( currTime + self.delay, self._firstRequest + self.maxLatency )
+        if self._recentSave is not None:
+            saveTime = max( saveTime, self._recentSave + self.minInterval )
+        return max( 0, int( saveTime - currTime ) )
+
+    def flush(self):
+        """Trigger pending save immediately."""
+        if self._firstRequest is None:
+            return
+        self._timer.stop()
+        self._triggerSave()
+
+    def cancel(self):
+        self._timer.stop()
+        self._firstRequest = None
+
+    def _triggerSave(self):
+        self._firstRequest = None
+        self._recentSave   = self._currentTime()
+        self.saveTriggered.emit()
+
+    @staticmethod
+    def _currentTime():
+        return time.monotonic() * 1000
@@ -0,0 +1,320 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import logging
+import os
+import sys
+import mmap
+import struct
+import json
+import copy
+from array import array
+from typing import Dict, List, Tuple
+
+from worklog import persist
+from worklog.gui.datatypes import DataContainer, WorkLogData, WorkLogEntry
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+## marks missing time value
+NONE_TIME = -2 ** 31
+
+## (start minutes, end minutes, work, description, entry identifier)
+EntryRow = Tuple
+
+
+def entry_row( entry: WorkLogEntry ) -> EntryRow:
+    return ( entry.startMinutes, entry.endMinutes, entry.work, entry.description, entry.entryId )
+
+
+def row_sort_key( row: EntryRow ):
+    ## the same order as entries in history
+    return ( NONE_TIME if row[0] is None else row[0], row[4] or 0 )
+
+
+class ColumnarFormat():
+    """Binary columnar layout of data container.
+
+    All numbers are little endian. File consists of:
+      - header: magic, format version, entries number, strings number, notes size,
+        next entry identifier
+      - start times: int32 array, minutes since epoch
+      - end times: int32 array, minutes since epoch
+      - descriptions: uint32 array, indexes to string table
+      - identifiers: uint32 array, zero if entry has no identifier
+      - work flags: bit array, padded to 4 bytes
+      - string table offsets: uint32 array of size strings number + 1
+      - string table: utf-8 encoded strings
+      - notes: utf-8 encoded JSON
+    """
+
+    MAGIC   = b"WORKLOGC"
+    VERSION = 1
+    HEADER  = struct.Struct( "<8sIIIII" )
+
+    @classmethod
+    def dumps( cls, dataContainer: DataContainer ) -> bytes:
+        history = dataContainer.history
+        return cls.dumpsEntries( history.entries, dataContainer.notes, history.nextId )
+
+    @classmethod
+    def dumpsEntries( cls, entriesList: List[ WorkLogEntry ], notes, nextId=0 ) -> bytes:
+        return cls.dumpsRows( [ entry_row( entry ) for entry in entriesList ], notes, nextId )
+
+    @classmethod
+    def dumpsRows( cls, rowsList: List[ EntryRow ], notes, nextId=0 ) -> bytes:
+        """Serialize entries given as rows (see 'entry_row()')."""
+        startArray = array( 'i', ( NONE_TIME if row[0] is None else row[0] for row in rowsList ) )
+        endArray   = array( 'i', ( NONE_TIME if row[1] is None else row[1] for row in rowsList ) )
+        idArray    = array( 'I', ( row[4] or 0 for row in rowsList ) )
+
+        ## string table with unique descriptions
+        stringsDict: Dict[ str, int ] = {}
+        descArray = array( 'I' )
+        for row in rowsList:
+            stringIndex = stringsDict.setdefault( row[3], len( stringsDict ) )
+            descArray.append( stringIndex )
+        encodedList = [ item.encode() for item in stringsDict ]
+        offsetsArray = array( 'I', [0] )
+        for item in encodedList:
+            offsetsArray.append( offsetsArray[-1] + len( item ) )
+
+        workBits = bytearray( ( len( rowsList ) + 7 ) // 8 )
+        for i, row in enumerate( rowsList ):
+            if row[2]:
+                workBits[ i >> 3 ] |= 1 << ( i & 7 )
+        workBits.extend( bytes( -len( workBits ) % 4 ) )
+
+        notesBytes = json.dumps( notes ).encode()
+
+        for item in ( startArray, endArray, descArray, idArray, offsetsArray ):
+            if item.itemsize != 4:
+                raise RuntimeError( "unsupported platform integer size: %s" % item.itemsize )
+            if sys.byteorder == "big":
+                item.byteswap()
+
+        header = cls.HEADER.pack( cls.MAGIC, cls.VERSION, len( rowsList ), len( encodedList ), len( notesBytes ), nextId )
+        chunks = [ header, startArray.tobytes(), endArray.tobytes(), descArray.tobytes(), idArray.tobytes(),
+                   bytes( workBits ), offsetsArray.tobytes() ]
+        chunks.extend( encodedList )
+        chunks.append( notesBytes )
+        return b"".join( chunks )
+
+    @classmethod
+    def loads( cls, content ) -> DataContainer:
+        """Load container from bytes-like object (e.g. memory mapped file)."""
+        entriesList, notes, nextId = cls.loadsEntries( content )
+        dataContainer = DataContainer()
+        dataContainer.history.reserveIds( nextId )
+        dataContainer.history.setEntries( entriesList )
+        dataContainer.notes = notes
+        return dataContainer
+
+    @classmethod
+    def loadsEntries( cls, content ):
+        """Load list of entries, notes and next entry identifier from bytes-like object."""
+        ## views of content have to be released before mapped file is closed
+        viewsList: List[ memoryview ] = []
+        try:
+            view = memoryview( content )
+            viewsList.append( view )
+            magic, version, entriesNum, stringsNum, notesSize, nextId = cls.HEADER.unpack_from( view, 0 )
+            if magic != cls.MAGIC:
+                raise ValueError( "invalid file format" )
+            if version != cls.VERSION:
+                raise ValueError( "unsupported format version: %s" % version )
+            offset = cls.HEADER.size
+
+            startArray, offset = _int_column( view, offset, entriesNum, 'i', viewsList )
+            endArray, offset   = _int_column( view, offset, entriesNum, 'i', viewsList )
+            descArray, offset  = _int_column( view, offset, entriesNum, 'I', viewsList )
+            idArray, offset    = _int_column( view, offset, entriesNum, 'I', viewsList )
+            bitsSize = ( entriesNum + 7 ) // 8
+            workBits = view[ offset: offset + bitsSize ]
+            viewsList.append( workBits )
+            offset += bitsSize + ( -bitsSize % 4 )
+            offsetsArray, offset = _int_column( view, offset, stringsNum + 1, 'I', viewsList )
+
+            ## decode each distinct description once
+            stringsList = []
+            for i in range( stringsNum ):
+                item = bytes( view[ offset + offsetsArray[i]: offset + offsetsArray[i + 1] ] )
+                stringsList.append( sys.intern( item.decode() ) )
+            offset += offsetsArray[ stringsNum ]
+            notes = json.loads( bytes( view[ offset: offset + notesSize ] ).decode() )
+
+            ## entries keep times as minutes, so columns are used directly
+            fromMinutes = WorkLogEntry.fromMinutes
+            entriesList = [ fromMinutes( None if startArray[i] == NONE_TIME else startArray[i],
+                                         None if endArray[i] == NONE_TIME else endArray[i],
+                                         ( workBits[ i >> 3 ] >> ( i & 7 ) ) & 1 == 1,
+                                         stringsList[ descArray[i] ],
+                                         None if idArray[i] == 0 else idArray[i] )
+                            for i in range( entriesNum ) ]
+        finally:
+            for item in reversed( viewsList ):
+                item.release()
+        return ( entriesList, notes, nextId )
+
+
+def _int_column( view: memoryview, offset, size, typeCode, viewsList: List[ memoryview ] ):
+    endOffset = offset + size * 4
+    column = view[ offset: endOffset ]
+    viewsList.append( column )
+    if sys.byteorder == "big":
+        swapped = array( typeCode, column.tobytes() )
+        swapped.byteswap()
+        return ( swapped, endOffset )
+    column = column.cast( typeCode )
+    viewsList.append( column )
+    return ( column, endOffset )
+
+
+def load_file( dataFile ):
+    """Load entries from file through memory mapping.
+
+    Returns tuple of entries list, notes, next entry identifier and digest of file content.
+    """
+    with open( dataFile, 'rb' ) as fp:
+        if os.fstat( fp.fileno() ).st_size < 1:
+            return ( [], None, None, None )
+        with mmap.mmap( fp.fileno(), 0, access=mmap.ACCESS_READ ) as mappedFile:
+            entriesList, notes, nextId = ColumnarFormat.loadsEntries( mappedFile )
+            digest = persist.calc_digest( mappedFile )
+            return ( entriesList, notes, nextId, digest )
+
+
+## ==================================================================
+
+
+class ColumnarStorage():
+    """Store data in compact columnar binary file loaded through memory mapping.
+
+    Rows of persisted entries are kept by identifier and updated with changes
+    tracked by history, so preparing store does not copy whole history. File
+    is serialized by writer function, which has to finish before next store
+    is prepared.
+    """
+
+    DATA_FILE = "data.col"
+
+    def __init__(self):
+        ## digest of stored file content
+        self._digest: str = None
+        self._backupStore: persist.BackupStore = None
+        self._resetPersisted()
+
+    def _resetPersisted(self):
+        ## history reflected in rows
+        self._history: WorkLogData = None
+        ## entry identifier -> row
+        self._rows: Dict[ int, EntryRow ] = {}
+        self._notes: Dict[str, str] = None
+
+    def dataTime( self, inputDir ):
+        dataFile = os.path.join( inputDir, self.DATA_FILE )
+        try:
+            return os.path.getmtime( dataFile )
+        except FileNotFoundError:
+            return None
+
+    def load( self, inputDir ) -> DataContainer:
+        dataFile = os.path.join( inputDir, self.DATA_FILE )
+        _LOGGER.info( "loading data from: %s", dataFile )
+        self._resetPersisted()
+        try:
+            entriesList, notes, nextId, self._digest = load_file( dataFile )
+        except FileNotFoundError:
+            _LOGGER.warning( "failed to load: %s", dataFile )
+            return DataContainer()
+        dataContainer = DataContainer()
+        dataContainer.history.reserveIds( nextId )
+        dataContainer.history.setEntries( entriesList )
+        if notes is not None:
+            dataContainer.notes = notes
+        self._setPersisted( dataContainer )
+        return dataContainer
+
+    def store( self, dataContainer: DataContainer, outputDir ):
+        writer = self.prepareStore( dataContainer, outputDir )
+        if writer is None:
+            return False
+        return writer()
+
+    def prepareStore( self, dataContainer: DataContainer, outputDir ):
+        """Prepare storing data.
+
+        Returns function writing prepared data (can be called in other thread)
+        or None if there is nothing to store.
+        """
+        dataFile = os.path.join( outputDir, self.DATA_FILE )
+        history = dataContainer.history
+        if history is not self._history:
+            self._setPersisted( dataContainer )
+        elif self._applyChanges( dataContainer ) is False and self._digest is not None:
+            _LOGGER.info( "no new data to store in %s", dataFile )
+            return None
+        rowsDict = self._rows
+        notes    = self._notes
+        nextId   = history.nextId
+
+        def write_data():
+            rowsList = sorted( rowsDict.values(), key=row_sort_key )
+            content = ColumnarFormat.dumpsRows( rowsList, notes, nextId )
+            backupDir = dataFile + ".backup"
+            if self._backupStore is None or self._backupStore.backupDir != backupDir:
+                self._backupStore = persist.BackupStore( backupDir )
+            stored = persist.store_content_backup( content, dataFile, self._digest, self._backupStore )
+            self._digest = persist.calc_digest( content )
+            return stored
+
+        return write_data
+
+    def invalidate( self ):
+        """Forget persisted state (e.g. after failed write)."""
+        self._digest = None
+
+    def _setPersisted( self, dataContainer: DataContainer ):
+        history = dataContainer.history
+        history.clearChanges()
+        self._history = history
+        self._rows    = { entry.entryId: entry_row( entry ) for entry in history.entries }
+        self._notes   = copy.deepcopy( dataContainer.notes )
+
+    def _applyChanges( self, dataContainer: DataContainer ):
+        """Update rows with changes tracked by history. Returns False if there was no change."""
+        history = dataContainer.history
+        changedList, removedList = history.getChanges()
+        history.clearChanges()
+        rowsDict = self._rows
+        for entry in removedList:
+            rowsDict.pop( entry.entryId, None )
+        for entry in changedList:
+            rowsDict[ entry.entryId ] = entry_row( entry )
+        changed = bool( changedList or removedList )
+        if dataContainer.notes != self._notes:
+            self._notes = copy.deepcopy( dataContainer.notes )
+            changed = True
+        return changed
@@ -0,0 +1,256 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import logging
+import os
+import copy
+import pickle
+from typing import Dict, List, Tuple
+
+from worklog import persist
+from worklog.gui.datatypes import DataContainer, WorkLogData, WorkLogEntry
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+## (startTime, endTime, work, description, entryId)
+EntryState = Tuple
+
+
+class JournalStorage():
+    """Store data as full snapshot followed by append-only journal of changes.
+
+    Snapshot (pickled DataContainer) is rewritten only on compaction. Between
+    compactions every save appends only entries changed since previous save
+    (as tracked by history) to journal file. First
+    record of journal holds digest of snapshot the journal applies to, so journal
+    left over from interrupted compaction is ignored.
+    """
+
+    SNAPSHOT_FILE = "data.obj"
+    JOURNAL_FILE  = "data.journal"
+
+    def __init__(self, compactThreshold=2000):
+        ## maximum number of records in journal before compaction
+        self.compactThreshold = compactThreshold
+        ## digest of snapshot file content
+        self._snapshotDigest: str = None
+        ## is journal file matching snapshot
+        self._journalValid = False
+        self._journalSize = 0
+        self._backupStore: persist.BackupStore = None
+        ## persisted state of data: history with tracked changes, states of entries and copy of notes
+        self._history: WorkLogData = None
+        self._entryStates: Dict[ int, EntryState ] = {}
+        self._notes: Dict[str, str] = None
+
+    def dataTime( self, inputDir ):
+        timesList = []
+        for fileName in ( self.SNAPSHOT_FILE, self.JOURNAL_FILE ):
+            try:
+                timesList.append( os.path.getmtime( os.path.join( inputDir, fileName ) ) )
+            except FileNotFoundError:
+                pass
+        if not timesList:
+            return None
+        return max( timesList )
+
+    def load( self, inputDir ) -> DataContainer:
+        snapshotFile = os.path.join( inputDir, self.SNAPSHOT_FILE )
+        dataContainer, digest, conversions = persist.load_object_converted( snapshotFile )
+        if dataContainer is None:
+            dataContainer = DataContainer()
+        rewriteSnapshot = bool( conversions )
+
+        journalFile = os.path.join( inputDir, self.JOURNAL_FILE )
+        recordsList = persist.load_records( journalFile )
+        self._snapshotDigest = digest
+        self._journalValid = False
+        self._journalSize = 0
+        if recordsList and digest is not None:
+            header = recordsList[0]
+            if header == ("snapshot", digest):
+                recordsList = recordsList[1:]
+                _LOGGER.info( "replaying %s journal records", len(recordsList) )
+                replay_records( dataContainer, recordsList )
+                self._journalValid = True
+                self._journalSize = len( recordsList )
+            else:
+                _LOGGER.warning( "journal does not match snapshot -- skipping journal" )
+
+        self._setPersisted( dataContainer )
+
+        if rewriteSnapshot:
+            ## rewrite snapshot at once, so next loads do not need to convert objects
+            _LOGGER.info( "storing migrated data" )
+            with open( snapshotFile, 'rb' ) as fp:
+                self._getBackupStore( snapshotFile ).addBackup( fp.read(), digest )
+            self.compact( dataContainer, inputDir )
+        return dataContainer
+
+    def store( self, dataContainer: DataContainer, outputDir ):
+        writer = self.prepareStore( dataContainer, outputDir )
+        if writer is None:
+            return False
+        return writer()
+
+    def prepareStore( self, dataContainer: DataContainer, outputDir ):
+        """Prepare storing data.
+
+        Returns function writing prepared data (can be called in other thread)
+        or None if there is nothing to store.
+        """
+        journalFile = os.path.join( outputDir, self.JOURNAL_FILE )
+        if self._journalValid is False or dataContainer.history is not self._history or os.path.isfile( journalFile ) is False:
+            ## changes are tracked only for history already persisted
+            return self._prepareCompact( dataContainer, outputDir )
+
+        recordsList = self._changeRecords( dataContainer )
+        if not recordsList:
+            _LOGGER.info( "no new data to store in %s", journalFile )
+            return None
+
+        if self._journalSize + len( recordsList ) > self.compactThreshold:
+            return self._prepareCompact( dataContainer, outputDir )
+
+        self._journalSize += len( recordsList )
+
+        def write_records():
+            _LOGGER.info( "appending %s records to: %s", len( recordsList ), journalFile )
+            persist.append_records( recordsList, journalFile )
+            return True
+
+        return write_records
+
+    def compact( self, dataContainer: DataContainer, outputDir ):
+        """Write full snapshot and start new empty journal."""
+        return self._prepareCompact( dataContainer, outputDir )()
+
+    def invalidate( self ):
+        """Forget persisted state (e.g. after failed write), so next store writes full snapshot."""
+        self._journalValid = False
+
+    def _prepareCompact( self, dataContainer: DataContainer, outputDir ):
+        snapshotFile = os.path.join( outputDir, self.SNAPSHOT_FILE )
+        journalFile  = os.path.join( outputDir, self.JOURNAL_FILE )
+        if dataContainer.history is self._history:
+            ## persisted state is updated with changes, so history is not copied
+            self._changeRecords( dataContainer )
+        else:
+            self._setPersisted( dataContainer )
+        ## states are not modified until writer finishes (next store is prepared after that)
+        entryStates = self._entryStates
+        notes  = self._notes
+        nextId = dataContainer.history.nextId
+        journalChanged = self._journalSize > 0
+        self._journalValid = True
+        self._journalSize = 0
+
+        def write_snapshot():
+            snapshot = create_container( entryStates.values(), notes, nextId )
+            content = pickle.dumps( snapshot )
+            digest  = persist.calc_digest( content )
+            ## compare against digest kept in memory instead of reading existing snapshot
+            backupStore = self._getBackupStore( snapshotFile )
+            changed = persist.store_content_backup( content, snapshotFile, self._snapshotDigest, backupStore )
+            ## snapshot is already replaced, so stale journal will not match it in case of failure
+            persist.store_records( [ ("snapshot", digest) ], journalFile )
+            self._snapshotDigest = digest
+            return changed or journalChanged
+
+        return write_snapshot
+
+    def _getBackupStore( self, snapshotFile ) -> persist.BackupStore:
+        backupDir = snapshotFile + ".backup"
+        if self._backupStore is None or self._backupStore.backupDir != backupDir:
+            self._backupStore = persist.BackupStore( backupDir, legacyArchive=snapshotFile + ".zip" )
+        return self._backupStore
+
+    def _changeRecords( self, dataContainer: DataContainer ):
+        """Return records of changes since previous call and apply them to persisted state."""
+        history = dataContainer.history
+        changedList, removedList = history.getChanges()
+        history.clearChanges()
+        entryStates = self._entryStates
+        ## "add" record replaces entry with the same identifier
+        recordsList: List[ tuple ] = []
+        for entry in removedList:
+            entryStates.pop( entry.entryId, None )
+            recordsList.append( ("remove", entry_state( entry )) )
+        for entry in changedList:
+            state = entry_state( entry )
+            entryStates[ entry.entryId ] = state
+            recordsList.append( ("add", state) )
+        if dataContainer.notes != self._notes:
+            ## persisted notes are replaced, not modified, so they can be shared with writer
+            self._notes = copy.deepcopy( dataContainer.notes )
+            recordsList.append( ("notes", self._notes) )
+        return recordsList
+
+    def _setPersisted( self, dataContainer: DataContainer ):
+        history = dataContainer.history
+        self._history = history
+        history.clearChanges()
+        self._entryStates = { entry.entryId: entry_state( entry ) for entry in history.entries }
+        self._notes = copy.deepcopy( dataContainer.notes )
+
+
+## ==================================================================
+
+
+def entry_state( entry: WorkLogEntry ) -> EntryState:
+    return ( entry.startTime, entry.endTime, entry.work, entry.description, entry.entryId )
+
+
+def create_entry( state: EntryState ) -> WorkLogEntry:
+    return WorkLogEntry.fromValues( state[0], state[1], state[2], state[3], state[4] )
+
+
+def create_container( statesList, notes, nextId ) -> DataContainer:
+    """Create data container from states of entries (e.g. to write snapshot in other thread)."""
+    dataContainer = DataContainer()
+    dataContainer.history.reserveIds( nextId )
+    dataContainer.history.setEntries( [ create_entry( state ) for state in statesList ] )
+    dataContainer.notes = copy.deepcopy( notes )
+    return dataContainer
+
+
+def replay_records( dataContainer: DataContainer, recordsList ):
+    """Apply journal records to data."""
+    history = dataContainer.history
+    entriesMap: Dict[ int, WorkLogEntry ] = { entry.entryId: entry for entry in history.entries }
+    for record in recordsList:
+        recordType = record[0]
+        if recordType == "add":
+            entry = create_entry( record[1] )
+            entriesMap[ entry.entryId ] = entry
+        elif recordType == "remove":
+            entryId = record[1][4]
+            if entriesMap.pop( entryId, None ) is None:
+                _LOGGER.warning( "unable to find entry to remove: %s", record[1] )
+        elif recordType == "notes":
+            dataContainer.setNotes( record[1] )
+        else:
+            _LOGGER.warning( "unknown journal record: %s", recordType )
+    history.setEntries( list( entriesMap.values() ) )
@@ -0,0 +1,372 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import logging
+import os
+import json
+from datetime import date
+from typing import Dict, List, Set
+
+from worklog import persist
+from worklog.gui.datatypes import DataContainer, WorkLogData, WorkLogEntry
+from worklog.gui.storage.columnarstorage import ColumnarFormat, EntryRow, load_file, entry_row, row_sort_key
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+## key of entries without start time, precedes all other keys
+MIN_KEY = "0000-00"
+
+
+class PartitionedStorage():
+    """Store history in monthly partition files loaded on demand.
+
+    Partition holds entries starting in given month stored in columnar format.
+    Requested month is loaded together with preceding partition (entries
+    crossing month boundary) and the most recent partition (recent entry).
+    Other stored partitions are unloaded, unless they have not stored changes
+    or hold entries referenced elsewhere (e.g. by undo stack), so number of
+    loaded entries does not grow with navigation over history.
+
+    Rows of loaded partitions are kept by identifier and updated with changes
+    tracked by history, so store serializes only partitions touched since
+    previous store. Serialization is done by writer function, which has to
+    finish before next store is prepared.
+    """
+
+    HISTORY_DIR   = "history"
+    NOTES_FILE    = "notes.json"
+    ## state of whole history (e.g. next entry identifier)
+    STATE_FILE    = "state.json"
+    PARTITION_EXT = ".col"
+
+    def __init__(self):
+        self._dataDir = None
+        ## history holding loaded partitions
+        self._history: WorkLogData = None
+        ## keys of partitions existing in data directory
+        self._partitionKeys: Set[ str ] = set()
+        ## partition key -> digest of stored content
+        self._digests: Dict[ str, str ] = {}
+        self._notesDigest: str = None
+        self._stateDigest: str = None
+        ## backups of all partitions
+        self._backupStore: persist.BackupStore = None
+        self._resetPartitions()
+
+    def _resetPartitions(self):
+        ## partition key -> rows of loaded entries by identifier
+        self._partitions: Dict[ str, Dict[ int, EntryRow ] ] = {}
+        ## entry identifier -> key of partition containing the entry
+        self._entryKeys: Dict[ int, str ] = {}
+        ## partitions changed since previous store
+        self._dirtyKeys: Set[ str ] = set()
+        ## keys of partitions loaded to history
+        self._loadedKeys: Set[ str ] = set()
+
+    def dataTime( self, inputDir ):
+        historyDir = os.path.join( inputDir, self.HISTORY_DIR )
+        try:
+            timesList = [ item.stat().st_mtime for item in os.scandir( historyDir ) if item.is_file() ]
+        except FileNotFoundError:
+            return None
+        if not timesList:
+            return None
+        return max( timesList )
+
+    def isLoaded(self):
+        """Are all partitions loaded?"""
+        return self._partitionKeys <= self._loadedKeys
+
+    def load( self, inputDir ) -> DataContainer:
+        historyDir = os.path.join( inputDir, self.HISTORY_DIR )
+        self._dataDir = inputDir
+        self._partitionKeys = set( self._scanPartitions( historyDir ) )
+        self._digests = {}
+        self._resetPartitions()
+
+        dataContainer = DataContainer()
+        notesFile = os.path.join( historyDir, self.NOTES_FILE )
+        try:
+            with open( notesFile, 'rb' ) as fp:
+                content = fp.read()
+            dataContainer.notes = json.loads( content.decode() )
+            self._notesDigest = persist.calc_digest( content )
+        except FileNotFoundError:
+            self._notesDigest = None
+
+        ## identifiers of entries in not loaded partitions cannot be assigned to new entries
+        stateFile = os.path.join( historyDir, self.STATE_FILE )
+        try:
+            with open( stateFile, 'rb' ) as fp:
+                content = fp.read()
+            dataContainer.history.reserveIds( json.loads( content.decode() ).get( "nextId" ) )
+            self._stateDigest = persist.calc_digest( content )
+        except FileNotFoundError:
+            self._stateDigest = None
+
+        self._history = dataContainer.history
+        self.loadPartitions( dataContainer, date.today() )
+        return dataContainer
+
+    def loadPartitions( self, dataContainer: DataContainer, dateValue: date, keepIds: Set[ int ] = None ):
+        """Load partitions needed to access entries of given month and unload not needed ones.
+
+        Partitions holding entries with identifiers in 'keepIds' are not
+        unloaded. Returns number of loaded and unloaded entries.
+        """
+        if dataContainer.history is not self._history:
+            ## data does not come from the storage
+            return 0
+        requestedKey = partition_key( dateValue )
+        neededKeys = { requestedKey }
+        olderKeys = [ key for key in self._partitionKeys if key < requestedKey ]
+        if olderKeys:
+            ## first entry of requested month needs its predecessor
+            neededKeys.add( max( olderKeys ) )
+        if self._partitionKeys:
+            neededKeys.add( max( self._partitionKeys ) )
+        loadedNum = self._loadKeys( dataContainer, neededKeys )
+        return loadedNum + self._unloadKeys( dataContainer, neededKeys, keepIds )
+
+    def loadRequired( self, dataContainer: DataContainer ):
+        """Load partitions of months of all entries (e.g. entry was moved to not loaded month).
+
+        Returns number of loaded entries.
+        """
+        history = dataContainer.history
+        if history is not self._history:
+            return 0
+        ## only changed entries can be placed in not loaded partitions
+        keys = set( partition_key( entry.startTime ) for entry in history.getChanges()[0] )
+        return self._loadKeys( dataContainer, keys )
+
+    def loadAll( self, dataContainer: DataContainer ):
+        """Load all partitions."""
+        if dataContainer.history is not self._history:
+            return 0
+        return self._loadKeys( dataContainer, self._partitionKeys )
+
+    def _loadKeys( self, dataContainer: DataContainer, keys: Set[ str ] ):
+        loadKeys = sorted( key for key in keys if key in self._partitionKeys and key not in self._loadedKeys )
+        if not loadKeys:
+            return 0
+        historyDir = os.path.join( self._dataDir, self.HISTORY_DIR )
+        entriesList: List[ WorkLogEntry ] = []
+        partitionsList = []
+        for key in loadKeys:
+            partitionFile = os.path.join( historyDir, key + self.PARTITION_EXT )
+            _LOGGER.info( "loading partition: %s", partitionFile )
+            partitionEntries, _, _, digest = load_file( partitionFile )
+            entriesList.extend( partitionEntries )
+            partitionsList.append( ( key, partitionEntries ) )
+            self._digests[ key ] = digest
+        self._loadedKeys.update( loadKeys )
+        if entriesList:
+            history = dataContainer.history
+            history.addEntries( entriesList )
+            ## loaded entries are already stored
+            history.clearChanges( entriesList )
+            for key, partitionEntries in partitionsList:
+                rowsDict = self._partitions.setdefault( key, {} )
+                for entry in partitionEntries:
+                    rowsDict[ entry.entryId ] = entry_row( entry )
+                    self._entryKeys[ entry.entryId ] = key
+        return len( entriesList )
+
+    def _unloadKeys( self, dataContainer: DataContainer, neededKeys: Set[ str ], keepIds: Set[ int ] = None ):
+        """Unload stored and unchanged partitions except 'neededKeys'. Returns number of unloaded entries."""
+        history = dataContainer.history
+        changedList, removedList = history.getChanges()
+        keepKeys = neededKeys | self._dirtyKeys
+        keepKeys.update( partition_key( entry.startTime ) for entry in changedList )
+        keepKeys.update( self._entryKeys.get( entry.entryId ) for entry in changedList + removedList )
+        if keepIds:
+            keepKeys.update( self._entryKeys.get( entryId ) for entryId in keepIds )
+        unloadKeys = [ key for key in self._loadedKeys if key not in keepKeys and key in self._partitionKeys ]
+        entriesList: List[ WorkLogEntry ] = []
+        for key in unloadKeys:
+            _LOGGER.info( "unloading partition: %s", key )
+            for entryId in self._partitions.pop( key, {} ):
+                del self._entryKeys[ entryId ]
+                entry = history.getEntryById( entryId )
+                if entry is not None:
+                    entriesList.append( entry )
+            self._loadedKeys.discard( key )
+        if entriesList:
+            history.unloadEntries( entriesList )
+        return len( entriesList )
+
+    def store( self, dataContainer: DataContainer, outputDir ):
+        writer = self.prepareStore( dataContainer, outputDir )
+        if writer is None:
+            return False
+        return writer()
+
+    def prepareStore( self, dataContainer: DataContainer, outputDir ):
+        """Prepare storing changed partitions.
+
+        Returns function writing them (can be called in other thread) or None
+        if there is nothing to store.
+        """
+        historyDir = os.path.join( outputDir, self.HISTORY_DIR )
+        history = dataContainer.history
+        if history is not self._history or outputDir != self._dataDir:
+            ## data does not come from the storage -- store all partitions and remove stale ones
+            self._dataDir = outputDir
+            self._history = history
+            self._partitionKeys = set( self._scanPartitions( historyDir ) )
+            self._digests = {}
+            self._notesDigest = None
+            self._stateDigest = None
+            self._resetPartitions()
+            ## content of existing partitions is replaced by history
+            self._loadedKeys = set( self._partitionKeys )
+            history.clearChanges()
+            for entry in history.entries:
+                self._putEntry( entry )
+            self._dirtyKeys.update( self._partitionKeys )
+        else:
+            self.loadRequired( dataContainer )
+            self._applyChanges( history )
+
+        ## list of tuples: partition key, file path, rows (None if file has to be removed)
+        partitionsList = []
+        for key in sorted( self._dirtyKeys ):
+            partitionFile = os.path.join( historyDir, key + self.PARTITION_EXT )
+            rowsDict = self._partitions.get( key )
+            if not rowsDict:
+                partitionsList.append( ( key, partitionFile, None ) )
+                self._partitions.pop( key, None )
+                self._partitionKeys.discard( key )
+                self._loadedKeys.discard( key )
+                continue
+            partitionsList.append( ( key, partitionFile, list( rowsDict.values() ) ) )
+            self._partitionKeys.add( key )
+            self._loadedKeys.add( key )
+        self._dirtyKeys = set()
+
+        ## list of tuples: file path, content, digest of existing file
+        filesList = []
+        notesContent = json.dumps( dataContainer.notes ).encode()
+        notesDigest  = persist.calc_digest( notesContent )
+        if notesDigest != self._notesDigest:
+            notesFile = os.path.join( historyDir, self.NOTES_FILE )
+            filesList.append( ( notesFile, notesContent, self._notesDigest ) )
+            self._notesDigest = notesDigest
+
+        stateContent = json.dumps( { "nextId": history.nextId } ).encode()
+        stateDigest  = persist.calc_digest( stateContent )
+        if stateDigest != self._stateDigest:
+            stateFile = os.path.join( historyDir, self.STATE_FILE )
+            filesList.append( ( stateFile, stateContent, self._stateDigest ) )
+            self._stateDigest = stateDigest
+
+        if not partitionsList and not filesList:
+            _LOGGER.info( "no new data to store in %s", historyDir )
+            return None
+        backupStore = self._getBackupStore( historyDir )
+
+        def write_partitions():
+            changed = False
+            for key, outputFile, rowsList in partitionsList:
+                if rowsList is None:
+                    _LOGGER.info( "removing empty partition: %s", outputFile )
+                    if os.path.isfile( outputFile ):
+                        os.remove( outputFile )
+                    self._digests.pop( key, None )
+                    changed = True
+                    continue
+                rowsList.sort( key=row_sort_key )
+                content = ColumnarFormat.dumpsRows( rowsList, None )
+                digest  = persist.calc_digest( content )
+                prevDigest = self._digests.get( key )
+                if digest == prevDigest:
+                    continue
+                if persist.store_content_backup( content, outputFile, prevDigest, backupStore, os.path.basename( outputFile ) ):
+                    changed = True
+                self._digests[ key ] = digest
+            for outputFile, content, prevDigest in filesList:
+                if persist.store_content_backup( content, outputFile, prevDigest, backupStore, os.path.basename( outputFile ) ):
+                    changed = True
+            return changed
+
+        return write_partitions
+
+    def invalidate( self ):
+        """Forget persisted state (e.g. after failed write), so next store writes all loaded partitions."""
+        self._digests = {}
+        self._notesDigest = None
+        self._stateDigest = None
+        self._dirtyKeys.update( self._partitions.keys() )
+
+    def _getBackupStore( self, historyDir ) -> persist.BackupStore:
+        backupDir = historyDir + ".backup"
+        if self._backupStore is None or self._backupStore.backupDir != backupDir:
+            self._backupStore = persist.BackupStore( backupDir )
+        return self._backupStore
+
+    def _applyChanges( self, history: WorkLogData ):
+        """Update rows of partitions with changes tracked by history."""
+        changedList, removedList = history.getChanges()
+        history.clearChanges()
+        for entry in removedList:
+            key = self._entryKeys.pop( entry.entryId, None )
+            if key is None:
+                continue
+            self._partitions[ key ].pop( entry.entryId, None )
+            self._dirtyKeys.add( key )
+        for entry in changedList:
+            self._putEntry( entry )
+
+    def _putEntry( self, entry: WorkLogEntry ):
+        entryId = entry.entryId
+        key = partition_key( entry.startTime )
+        prevKey = self._entryKeys.get( entryId )
+        if prevKey is not None and prevKey != key:
+            ## entry moved to other month
+            self._partitions[ prevKey ].pop( entryId, None )
+            self._dirtyKeys.add( prevKey )
+        self._partitions.setdefault( key, {} )[ entryId ] = entry_row( entry )
+        self._entryKeys[ entryId ] = key
+        self._dirtyKeys.add( key )
+
+    def _scanPartitions( self, historyDir ):
+        try:
+            itemsList = list( os.scandir( historyDir ) )
+        except FileNotFoundError:
+            return []
+        extLength = len( self.PARTITION_EXT )
+        return [ item.name[ :-extLength ] for item in itemsList
+                 if item.name.endswith( self.PARTITION_EXT ) and item.is_file() ]
+
+
+## ==================================================================
+
+
+def partition_key( value: date ) -> str:
+    """Return key of partition containing entries starting at given date (or datetime)."""
+    if value is None:
+        return MIN_KEY
+    return "%04d-%02d" % ( value.year, value.month )
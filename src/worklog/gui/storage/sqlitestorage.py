@@ -0,0 +1,265 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Set
+
+from worklog import persist
+from worklog.gui.datatypes import DataContainer, WorkLogData, WorkLogEntry
+from worklog.gui.storage.journalstorage import JournalStorage
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id          INTEGER PRIMARY KEY,
+    start_time  INTEGER,
+    end_time    INTEGER,
+    work        INTEGER NOT NULL,
+    description TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS notes (
+    name    TEXT PRIMARY KEY,
+    content TEXT NOT NULL
+);
+"""
+
+
+class SqliteStorage():
+    """Store data in SQLite database, one row per entry.
+
+    Times are kept as minutes since epoch. Database is used for persistence
+    only, queries are served by history. Changes of data tracked by history
+    are applied to database as single row statements on store, commit of the
+    transaction can be done in other thread.
+    """
+
+    DATA_FILE = "data.sqlite"
+
+    def __init__(self):
+        self._connection: sqlite3.Connection = None
+        ## guards connection shared with thread committing data
+        self._lock = threading.RLock()
+        self._dbFile = None
+        self._backupStore: persist.BackupStore = None
+        self._resetSynced()
+
+    def _resetSynced(self):
+        ## history reflected in database
+        self._history: WorkLogData = None
+        self._historyGeneration = None
+        self._notes: Dict[str, str] = None
+        ## identifiers of entries in database (used as row ids)
+        self._rowIds: Set[ int ] = set()
+
+    def dataTime( self, inputDir ):
+        dataFile = os.path.join( inputDir, self.DATA_FILE )
+        try:
+            return os.path.getmtime( dataFile )
+        except FileNotFoundError:
+            return None
+
+    def isConnected(self):
+        return self._connection is not None
+
+    def close(self):
+        with self._lock:
+            if self._connection is None:
+                return
+            self._connection.close()
+            self._connection = None
+            self._dbFile = None
+            self._resetSynced()
+
+    def load( self, inputDir ) -> DataContainer:
+        dbFile = os.path.join( inputDir, self.DATA_FILE )
+        if os.path.isfile( dbFile ) is False:
+            _LOGGER.warning( "failed to load: %s", dbFile )
+            self.close()
+            return DataContainer()
+
+        _LOGGER.info( "loading data from: %s", dbFile )
+        ## database is modified in place, so keep copy of state from session start
+        with open( dbFile, 'rb' ) as fp:
+            self._getBackupStore( dbFile ).addBackup( fp.read() )
+
+        with self._lock:
+            self._open( dbFile )
+            cursor = self._connection.execute( "SELECT id, start_time, end_time, work, description FROM entries"
+                                               " ORDER BY start_time, id" )
+            rowsList = cursor.fetchall()
+            cursor = self._connection.execute( "SELECT name, content FROM notes" )
+            notesDict = dict( cursor.fetchall() )
+        fromMinutes = WorkLogEntry.fromMinutes
+        entriesList = [ fromMinutes( row[1], row[2], row[3] != 0, row[4], row[0] ) for row in rowsList ]
+
+        dataContainer = DataContainer()
+        if notesDict:
+            dataContainer.notes = notesDict
+        dataContainer.history.setEntries( entriesList )
+
+        ## set synced state
+        dataContainer.history.clearChanges()
+        self._rowIds = set( entry.entryId for entry in entriesList )
+        self._history = dataContainer.history
+        self._historyGeneration = dataContainer.history.generation
+        self._notes = dict( dataContainer.notes )
+        return dataContainer
+
+    def store( self, dataContainer: DataContainer, outputDir ):
+        writer = self.prepareStore( dataContainer, outputDir )
+        if writer is None:
+            return False
+        return writer()
+
+    def prepareStore( self, dataContainer: DataContainer, outputDir ):
+        """Apply changes to database.
+
+        Returns function committing the changes (can be called in other thread)
+        or None if there is nothing to store.
+        """
+        dbFile = os.path.join( outputDir, self.DATA_FILE )
+        with self._lock:
+            if self._connection is None or self._dbFile != dbFile:
+                self._open( dbFile )
+            self.sync( dataContainer )
+            if self._connection.in_transaction is False:
+                _LOGGER.info( "no new data to store in %s", dbFile )
+                return None
+
+        def commit_data():
+            with self._lock:
+                _LOGGER.info( "saving data to: %s", dbFile )
+                self._connection.commit()
+            return True
+
+        return commit_data
+
+    def invalidate( self ):
+        """Forget synced state (e.g. after failed commit), so next store rewrites all entries."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.rollback()
+            self._history = None
+            self._notes = None
+
+    def sync( self, dataContainer: DataContainer ):
+        """Apply changes of data to database without committing them."""
+        with self._lock:
+            history = dataContainer.history
+            if history is not self._history:
+                self._rewriteEntries( history )
+            elif history.generation != self._historyGeneration:
+                self._updateEntries( history )
+            if dataContainer.notes != self._notes:
+                self._connection.execute( "DELETE FROM notes" )
+                self._connection.executemany( "INSERT INTO notes ( name, content ) VALUES ( ?, ? )",
+                                              dataContainer.notes.items() )
+                self._notes = dict( dataContainer.notes )
+
+    ## =========================================================
+
+    def _open( self, dbFile ):
+        self.close()
+        self._resetSynced()
+        _LOGGER.info( "opening database: %s", dbFile )
+        ## changes are committed in other thread
+        self._connection = sqlite3.connect( dbFile, check_same_thread=False )
+        self._connection.executescript( SCHEMA )
+        self._dbFile = dbFile
+
+    def _getBackupStore( self, dbFile ) -> persist.BackupStore:
+        backupDir = dbFile + ".backup"
+        if self._backupStore is None or self._backupStore.backupDir != backupDir:
+            self._backupStore = persist.BackupStore( backupDir )
+        return self._backupStore
+
+    def _rewriteEntries( self, history: WorkLogData ):
+        self._resetSynced()
+        self._connection.execute( "DELETE FROM entries" )
+        rowsList = []
+        for entry in history.entries:
+            rowsList.append( self._insertRow( entry ) )
+        self._connection.executemany( "INSERT INTO entries ( id, start_time, end_time, work, description )"
+                                      " VALUES ( ?, ?, ?, ?, ? )", rowsList )
+        history.clearChanges()
+        self._history = history
+        self._historyGeneration = history.generation
+
+    def _updateEntries( self, history: WorkLogData ):
+        changedList, removedList = history.getChanges()
+        history.clearChanges()
+        insertList = []
+        updateList = []
+        rowIds = self._rowIds
+        for entry in changedList:
+            key = entry.entryId
+            if key not in rowIds:
+                insertList.append( self._insertRow( entry ) )
+                continue
+            updateList.append( entry_row( entry ) + ( key, ) )
+        removedList = [ ( entry.entryId, ) for entry in removedList if entry.entryId in rowIds ]
+        for row in removedList:
+            rowIds.discard( row[0] )
+
+        if insertList:
+            self._connection.executemany( "INSERT INTO entries ( id, start_time, end_time, work, description )"
+                                          " VALUES ( ?, ?, ?, ?, ? )", insertList )
+        if updateList:
+            self._connection.executemany( "UPDATE entries SET start_time = ?, end_time = ?, work = ?, description = ?"
+                                          " WHERE id = ?", updateList )
+        if removedList:
+            self._connection.executemany( "DELETE FROM entries WHERE id = ?", removedList )
+        self._historyGeneration = history.generation
+
+    def _insertRow( self, entry: WorkLogEntry ):
+        self._rowIds.add( entry.entryId )
+        return ( entry.entryId, ) + entry_row( entry )
+
+
+## ==================================================================
+
+
+def entry_row( entry: WorkLogEntry ):
+    return ( entry.startMinutes, entry.endMinutes, int( entry.work ), entry.description )
+
+
+def import_pickle( inputDir, outputDir=None ):
+    """Import pickled data (data.obj with its journal) from given directory into database.
+
+    Existing database in output directory is overwritten.
+    """
+    if outputDir is None:
+        outputDir = inputDir
+    dataContainer = JournalStorage().load( inputDir )
+    _LOGGER.info( "importing %s entries from: %s", dataContainer.history.size(), inputDir )
+    storage = SqliteStorage()
+    try:
+        return storage.store( dataContainer, outputDir )
+    finally:
+        storage.close()
@@ -0,0 +1,87 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import logging
+from enum import Enum, unique
+
+from worklog.gui.storage.journalstorage import JournalStorage
+from worklog.gui.storage.columnarstorage import ColumnarStorage
+from worklog.gui.storage.sqlitestorage import SqliteStorage
+from worklog.gui.storage.partitionedstorage import PartitionedStorage
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@unique
+class StorageMode(Enum):
+    JOURNAL     = "journal"
+    COLUMNAR    = "columnar"
+    SQLITE      = "sqlite"
+    PARTITIONED = "partitioned"
+
+    def createStorage(self):
+        storageClass = STORAGE_CLASSES[ self ]
+        return storageClass()
+
+    @classmethod
+    def findByName(cls, name):
+        for item in cls:
+            if item.name == name:
+                return item
+        return None
+
+    @classmethod
+    def indexOf(cls, key):
+        index = 0
+        for item in cls:
+            if item == key:
+                return index
+            if item.name == key:
+                return index
+            index = index + 1
+        return -1
+
+
+STORAGE_CLASSES = { StorageMode.JOURNAL: JournalStorage,
+                    StorageMode.COLUMNAR: ColumnarStorage,
+                    StorageMode.SQLITE: SqliteStorage,
+                    StorageMode.PARTITIONED: PartitionedStorage }
+
+
+def find_recent_mode( dataDir, preferredMode: StorageMode = None ) -> StorageMode:
+    """Find storage mode of most recently stored data (e.g. after change of storage mode).
+
+    Returns None if there is no data.
+    """
+    recentMode = None
+    recentTime = None
+    for mode in StorageMode:
+        storage = mode.createStorage()
+        dataTime = storage.dataTime( dataDir )
+        if dataTime is None:
+            continue
+        if recentTime is None or dataTime > recentTime or (dataTime == recentTime and mode == preferredMode):
+            recentMode = mode
+            recentTime = dataTime
+    return recentMode
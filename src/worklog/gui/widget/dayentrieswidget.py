@@ -26,7 +26,7 @@ from datetime import date
 
 from PyQt5.QtCore import pyqtSignal
 
-from worklog.gui.datatypes import WorkLogEntry
+from worklog.gui.datatypes import WorkLogEntry, EntriesChange
 
 from .. import uiloader
 
@@ -63,6 +63,12 @@ class DayEntriesWidget( QtBaseClass ):           # type: ignore
     def updateView(self):
         self.ui.dayListWidget.updateView()
 
+    def updateChangedWorkTime(self, change: EntriesChange):
+        currDate = self.ui.dayListWidget.currentDate
+        if currDate is not None and change.containsDate( currDate ) is False:
+            return
+        self.updateDayWorkTime()
+
     def updateDayWorkTime(self):
         dayWidget = self.ui.dayListWidget
         currDate = dayWidget.currentDate
@@ -33,6 +33,7 @@ from PyQt5.QtGui import QPainter, QPainterPath, QPen, QColor
 
 from worklog.gui.datatypes import WorkLogEntry
 from worklog.gui.datatypes import WorkLogData
+from worklog.gui.datatypes import EntriesChange
 from worklog.gui.dataobject import create_entry_contextmenu
 
 
@@ -361,6 +362,10 @@ class DayListWidget( QWidget ):
     def connectData(self, dataObject):
         self.data = dataObject
         self.data.entryChanged.connect( self.updateView )
+        self.data.entriesReloaded.connect( self.updateView )
+        self.data.entriesInserted.connect( self.updateChangedView )
+        self.data.entriesRemoved.connect( self.updateChangedView )
+        self.data.entriesModified.connect( self.updateChangedView )
         self.editEntry.connect( dataObject.editEntry )
 
 #     def showCompletedTasks(self, show=True):
@@ -376,11 +381,17 @@ class DayListWidget( QWidget ):
             return
         if self.data is None:
             return
-        history: WorkLogData = self.data.history
-        entriesList = history.getEntriesForDate( self.currentDate )
+        entriesList = self.data.getEntriesForDate( self.currentDate )
         self.setEntries( entriesList, self.currentDate )
         self.update()
 
+    def updateChangedView(self, change: EntriesChange):
+        if self.currentDate is None:
+            return
+        if change.containsDate( self.currentDate ) is False:
+            return
+        self.updateView()
+
     def setCurrentDate(self, currDate: date):
         self.currentDate = currDate
         self.updateView()
@@ -388,8 +399,7 @@ class DayListWidget( QWidget ):
     def getEntries(self):
         if self.currentDate is None:
             return []
-        history: WorkLogData = self.data.history
-        return history.getEntriesForDate( self.currentDate )
+        return self.data.getEntriesForDate( self.currentDate )
 
     def setEntries(self, entriesList, day: date ):
         self.content.setEntries( entriesList, day )
@@ -105,6 +105,20 @@ class NavCalendar( QCalendarWidget ):
             contextDate = self.dateAt( dayIndex )
             self.addEntry.emit( contextDate )
 
+    def updateDateRange( self, fromDate: datetime.date, toDate: datetime.date ):
+        """Repaint visible cells of given range of days, all cells if range is not given."""
+        if fromDate is None or toDate is None:
+            self.updateCells()
+            return
+        ## calendar page shows 6 weeks
+        firstVisible = self.dateAt( 0 ).toPyDate()
+        lastVisible  = self.dateAt( 6 * 7 - 1 ).toPyDate()
+        currDate = max( fromDate, firstVisible )
+        lastDate = min( toDate, lastVisible )
+        while currDate <= lastDate:
+            self.updateCell( QDate( currDate ) )
+            currDate += datetime.timedelta( days=1 )
+
     def dateAt( self, dayIndex ):
         prevMonthDays = self.daysFromPreviousMonth()
         dayOffset = dayIndex - prevMonthDays
@@ -0,0 +1,109 @@
+# MIT License
+#
+# Copyright (c) 2020 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import logging
+from datetime import datetime, timedelta
+
+from PyQt5.QtWidgets import QTableWidgetItem, QHeaderView
+
+from worklog.gui.analytics import period_report, format_balance
+from worklog.gui.appwindow import AppWindow
+from worklog.gui.dataobject import DataObject
+
+from .. import uiloader
+
+
+UiTargetClass, QtBaseClass = uiloader.load_ui_from_class_name( __file__ )
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ReportWidget( QtBaseClass ):           # type: ignore
+    """Work time and overtime balance of recent weeks, months and years.
+
+    Values are read from prefix sums of history, so refresh does not scan entries.
+    Only loaded part of history is counted (see partitioned storage).
+    """
+
+    PERIODS = ( ( "Week", "week" ), ( "Month", "month" ), ( "Year", "year" ) )
+
+    def __init__(self, parentWidget=None):
+        super().__init__(parentWidget)
+        self.ui = UiTargetClass()
+        self.ui.setupUi(self)
+
+        self.data: DataObject = None
+        self.dailyTarget = timedelta( hours=8 )
+        self.periodsNum = 12
+
+        for label, period in self.PERIODS:
+            self.ui.periodCB.addItem( label, period )
+
+        table = self.ui.reportTable
+        table.setColumnCount( 4 )
+        table.setHorizontalHeaderLabels( [ "From", "To", "Work", "Balance" ] )
+        table.horizontalHeader().setSectionResizeMode( QHeaderView.Stretch )
+
+        self.ui.periodCB.currentIndexChanged.connect( self.updateView )
+
+    def connectData(self, dataObject: DataObject, dailyTarget: timedelta):
+        self.data = dataObject
+        self.dailyTarget = dailyTarget
+        self.data.entryChanged.connect( self.updateView )
+        self.data.entriesReloaded.connect( self.updateView )
+        self.data.entriesInserted.connect( self.updateView )
+        self.data.entriesRemoved.connect( self.updateView )
+        self.data.entriesModified.connect( self.updateView )
+        self.updateView()
+
+    def setDailyTarget(self, dailyTarget: timedelta):
+        self.dailyTarget = dailyTarget
+        self.updateView()
+
+    def updateView(self, _=None):
+        table = self.ui.reportTable
+        if self.data is None:
+            table.setRowCount( 0 )
+            return
+        period = self.ui.periodCB.currentData()
+        rollup = self.data.history.getAnalytics().getRollup()
+        currDate = datetime.today().date()
+        rows = period_report( rollup, currDate, self.dailyTarget, period, self.periodsNum )
+        table.setRowCount( len( rows ) )
+        for row, ( fromDate, toDate, workTime, balance ) in enumerate( rows ):
+            hours, minutes = divmod( workTime // timedelta( minutes=1 ), 60 )
+            values = ( str( fromDate ), str( toDate ), "%d:%02d" % ( hours, minutes ), format_balance( balance ) )
+            for column, value in enumerate( values ):
+                table.setItem( row, column, QTableWidgetItem( value ) )
+
+
+def create_window( dataObject: DataObject, dailyTarget: timedelta, parent=None ):
+    reportWindow = AppWindow( parent )
+    reportWindow.setWindowTitleSuffix( "- Report" )
+    widget = ReportWidget( reportWindow )
+    widget.connectData( dataObject, dailyTarget )
+    reportWindow.addWidget( widget )
+    reportWindow.resize( 480, 400 )
+    reportWindow.show()
+    return reportWindow
@@ -26,6 +26,8 @@ import copy
 
 from PyQt5.QtCore import pyqtSignal
 
+from worklog.gui.storage.storagemode import StorageMode
+
 from .. import uiloader
 from .. import trayicon
 
@@ -36,6 +38,8 @@ class AppSettings():
         self.trayIcon = trayicon.TrayIconTheme.WHITE
         self.startMinimized = False
         self.workMode = True
+        self.storageMode = StorageMode.JOURNAL
+        self.dailyTargetHours = 8.0
 
     def loadSettings(self, settings):
         settings.beginGroup( "app_settings" )
@@ -53,6 +57,15 @@ class AppSettings():
         if self.workMode is None:
             self.workMode = True
 
+        storageName = settings.value("storageMode", None, type=str)
+        self.storageMode = StorageMode.findByName( storageName )
+        if self.storageMode is None:
+            self.storageMode = StorageMode.JOURNAL
+
+        self.dailyTargetHours = settings.value("dailyTargetHours", None, type=float)
+        if self.dailyTargetHours is None:
+            self.dailyTargetHours = 8.0
+
         settings.endGroup()
 
     def saveSettings(self, settings):
@@ -61,6 +74,8 @@ class AppSettings():
         settings.setValue( "trayIcon", self.trayIcon.name )
         settings.setValue( "startMinimized", self.startMinimized )
         settings.setValue( "workMode", self.workMode )
+        settings.setValue( "storageMode", self.storageMode.name )
+        settings.setValue( "dailyTargetHours", self.dailyTargetHours )
 
         settings.endGroup()
 
@@ -100,6 +115,17 @@ class SettingsDialog(QtBaseClass):           # type: ignore
         self.ui.workingOnStartupCB.setChecked( self.appSettings.workMode )
         self.ui.workingOnStartupCB.stateChanged.connect( self._workModeChanged )
 
+        ## storage combo box
+        for item in StorageMode:
+            self.ui.storageModeCB.addItem( item.name, item )
+
+        index = StorageMode.indexOf( self.appSettings.storageMode )
+        self.ui.storageModeCB.setCurrentIndex( index )
+        self.ui.storageModeCB.currentIndexChanged.connect( self._storageModeChanged )
+
+        self.ui.dailyTargetSB.setValue( self.appSettings.dailyTargetHours )
+        self.ui.dailyTargetSB.valueChanged.connect( self._dailyTargetChanged )
+
     ## =====================================================
 
     def _trayThemeChanged(self):
@@ -115,6 +141,13 @@ class SettingsDialog(QtBaseClass):           # type: ignore
         value = self.ui.workingOnStartupCB.isChecked()
         self.appSettings.workMode = value
 
+    def _storageModeChanged(self):
+        selectedMode = self.ui.storageModeCB.currentData()
+        self.appSettings.storageMode = selectedMode
+
+    def _dailyTargetChanged(self):
+        self.appSettings.dailyTargetHours = self.ui.dailyTargetSB.value()
+
     ## =====================================================
 
     def _setCurrentTrayTheme( self, trayTheme: str ):
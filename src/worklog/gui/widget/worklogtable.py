@@ -23,6 +23,7 @@
 
 import logging
 from datetime import datetime, date, time, timedelta
+from typing import List
 
 from PyQt5 import QtCore, QtGui
 from PyQt5.QtCore import Qt
@@ -32,7 +33,7 @@ from PyQt5.QtCore import QAbstractTableModel
 from PyQt5.QtWidgets import QTableView
 from PyQt5.QtGui import QColor
 
-from worklog.gui.datatypes import WorkLogData, WorkLogEntry
+from worklog.gui.datatypes import WorkLogData, WorkLogEntry, EntriesChange, EntriesListener
 from worklog.gui.dataobject import DataObject, create_entry_contextmenu
 
 from .. import guistate
@@ -40,11 +41,12 @@ from .. import guistate
 _LOGGER = logging.getLogger(__name__)
 
 
-class WorkLogTableModel( QAbstractTableModel ):
+class WorkLogTableModel( QAbstractTableModel, EntriesListener ):
 
     def __init__(self, data: WorkLogData):
         super().__init__()
-        self._rawData: WorkLogData = data
+        self._rawData: WorkLogData = None
+        self._setData( data )
 
     # pylint: disable=R0201
     def getItem(self, itemIndex: QModelIndex):
@@ -54,9 +56,45 @@ class WorkLogTableModel( QAbstractTableModel ):
 
     def setContent(self, data: WorkLogData):
         self.beginResetModel()
+        self._setData( data )
+        self.endResetModel()
+
+    def _setData(self, data: WorkLogData):
+        if self._rawData is not None:
+            self._rawData.setListener( None )
         self._rawData = data
+        if data is not None:
+            ## rows are inserted and removed together with change of data
+            data.setListener( self )
+
+    ## ===============================================
+
+    def beginInsertEntries(self, first: int, last: int):
+        self.beginInsertRows( QModelIndex(), first, last )
+
+    def endInsertEntries(self):
+        self.endInsertRows()
+
+    def beginRemoveEntries(self, first: int, last: int):
+        self.beginRemoveRows( QModelIndex(), first, last )
+
+    def endRemoveEntries(self):
+        self.endRemoveRows()
+
+    def beginResetEntries(self):
+        self.beginResetModel()
+
+    def endResetEntries(self):
         self.endResetModel()
 
+    ## ===============================================
+
+    def announceChangedRows(self, rowsList: List[ int ]):
+        if not rowsList:
+            return
+        lastColumn = self.columnCount() - 1
+        self.dataChanged.emit( self.index( min( rowsList ), 0 ), self.index( max( rowsList ), lastColumn ) )
+
     # pylint: disable=W0613
     def rowCount(self, parent=None):
         if self._rawData is None:
@@ -140,16 +178,17 @@ class WorkLogTableModel( QAbstractTableModel ):
             dataTask = parentIndex.internalPointer()
             if dataTask == item:
                 return parentIndex
-        elems = self.rowCount( parentIndex )
-        for i in range(elems):
-            index = self.index( i, column, parentIndex )
-            if index.isValid() is False:
-                continue
-            # dataTask = parentIndex.data( Qt.ItemDataRole.UserRole )
-            dataTask = index.internalPointer()
-            if dataTask == item:
-                return index
-        return None
+        if self._rawData is None:
+            return None
+        ## position is maintained by history -- no need to scan rows
+        try:
+            row = self._rawData.getEntryIndex( item )
+        except ValueError:
+            return None
+        index = self.index( row, column, parentIndex )
+        if index.isValid() is False:
+            return None
+        return index
 
     def attribute(self, entry: WorkLogEntry, index):
         if index == 0:
@@ -328,6 +367,8 @@ class WorkLogTable( QTableView ):
     def connectData(self, dataObject: DataObject ):
         self.dataObject = dataObject
         self.dataObject.entryChanged.connect( self.refreshData )
+        self.dataObject.entriesReloaded.connect( self.refreshData )
+        self.dataObject.entriesModified.connect( self._entriesModified )
         self.refreshData()
 
     def refreshData(self):
@@ -336,6 +377,9 @@ class WorkLogTable( QTableView ):
         self.clearSelection()
 #         _LOGGER.debug( "entries: %s\n%s", type(history), history.printData() )
 
+    def _entriesModified(self, change: EntriesChange):
+        self.dataModel.announceChangedRows( change.rows )
+
     def refreshEntry(self, entry: WorkLogEntry = None):
         if entry is None:
             ## unable to refresh entry row -- refresh whole model
@@ -59,7 +59,7 @@ def run_app( args ):
     try:
         window = MainWindow()
         window.loadSettings()
-        window.loadData()
+        window.loadData( args.normalize )
 
         if args.minimized is True or window.appSettings.startMinimized is True:
             ## starting minimized
@@ -82,6 +82,8 @@ def create_parser( parser: argparse.ArgumentParser = None ):
     if parser is None:
         parser = argparse.ArgumentParser(description='Work Log')
     parser.add_argument('--minimized', action='store_const', const=True, default=False, help='Start minimized' )
+    parser.add_argument('--normalize', action='store_const', const=True, default=False,
+                        help='Remove overlapping entries after loading data (not undoable)' )
     return parser
 
 
@@ -25,8 +25,13 @@ import logging
 
 import os
 import zipfile
+import gzip
 import filecmp
 import pickle
+import hashlib
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple
 
 import abc
 
@@ -60,8 +65,26 @@ def load_object( inputFile, codeVersion, defaultValue=None ):
 
 
 def store_object( inputObject, outputFile ):
+    content = pickle.dumps( inputObject )
+    return store_content( content, outputFile )
+
+
+def store_content( content: bytes, outputFile, prevDigest=None ):
+    """Store content to file if it differs from existing file.
+
+    If 'prevDigest' (digest of content of existing file) is given, then new content
+    is compared against the digest instead of reading existing file.
+    """
+    if prevDigest is not None and os.path.isfile( outputFile ):
+        if calc_digest( content ) == prevDigest:
+            _LOGGER.info("no new data to store in %s", outputFile)
+            return False
+        _LOGGER.info( "saving data to: %s", outputFile )
+        replace_content( content, outputFile )
+        return True
+
     tmpFile = outputFile + "_tmp"
-    store_object_simple( inputObject, tmpFile )
+    store_content_simple( content, tmpFile )
 
     if os.path.isfile( outputFile ) is False:
         ## output file does not exist -- rename file
@@ -82,11 +105,21 @@ def store_object( inputObject, outputFile ):
 
 
 def store_backup( inputObject, outputFile ):
-    if store_object( inputObject, outputFile ) is False:
+    content = pickle.dumps( inputObject )
+    return store_content_backup( content, outputFile )
+
+
+def store_content_backup( content: bytes, outputFile, prevDigest=None, backupStore: 'BackupStore' = None, backupName="" ):
+    """Store content and add it to backups.
+
+    'backupName' distinguishes files sharing single backup store.
+    """
+    if store_content( content, outputFile, prevDigest ) is False:
         return False
     ## backup data
-    storedZipFile = outputFile + ".zip"
-    backup_files( [outputFile], storedZipFile )
+    if backupStore is None:
+        backupStore = BackupStore( outputFile + ".backup", legacyArchive=outputFile + ".zip" )
+    backupStore.addBackup( content, name=backupName )
     return True
 
 
@@ -104,6 +137,51 @@ def load_object_simple( inputFile, defaultValue=None ):
         return defaultValue
 
 
+def load_object_converted( inputFile, defaultValue=None ):
+    """Load pickled object, calculate digest of file content and count converted objects.
+
+    Returns tuple (object, digest, conversions), where conversions is Counter of
+    Versionable objects converted from old versions, keyed by tuples
+    (class name, pickled version, current version). If file does not exist then
+    returns (defaultValue, None, empty Counter).
+    """
+    try:
+        _LOGGER.info( "loading data from: %s", inputFile )
+        with open( inputFile, 'rb') as fp:
+            content = fp.read()
+    except FileNotFoundError:
+        _LOGGER.warning( "failed to load: %s", inputFile )
+        return (defaultValue, None, Counter())
+    try:
+        loadedObject, conversions = loads_converted( content )
+    except ModuleNotFoundError:
+        ## class moved to other module
+        _LOGGER.exception( "failed to load: %s", inputFile )
+        return (defaultValue, None, Counter())
+    if conversions:
+        _LOGGER.info( "converted %s objects of old versions in %s: %s", sum( conversions.values() ), inputFile,
+                      ", ".join( "%s %s->%s: %s" % ( key + ( count, ) ) for key, count in sorted( conversions.items(), key=str ) ) )
+    return (loadedObject, calc_digest( content ), conversions)
+
+
+## counts Versionable objects converted while unpickling, set only during loading
+_CONVERSIONS: Counter = None
+
+
+def loads_converted( content: bytes ):
+    """Unpickle content and count Versionable objects converted from old versions.
+
+    Returns pair (object, conversions Counter).
+    """
+    global _CONVERSIONS         # pylint: disable=W0603
+    _CONVERSIONS = Counter()
+    try:
+        loadedObject = pickle.loads( content )
+        return (loadedObject, _CONVERSIONS)
+    finally:
+        _CONVERSIONS = None
+
+
 def store_object_simple( inputObject, outputFile ):
     outdirDir = os.path.dirname( outputFile )
     if not os.path.exists(outdirDir):
@@ -113,46 +191,79 @@ def store_object_simple( inputObject, outputFile ):
         pickle.dump( inputObject, fp )
 
 
-def backup_files( inputFiles, outputArchive ):
-    ## create zip
-    tmpZipFile = outputArchive + "_tmp"
-    zipf = zipfile.ZipFile( tmpZipFile, 'w', zipfile.ZIP_DEFLATED )
-    for file in inputFiles:
-        zipEntry = os.path.basename( file )
-        zipf.write( file, zipEntry )
-    zipf.close()
+def store_content_simple( content: bytes, outputFile ):
+    outdirDir = os.path.dirname( outputFile )
+    if not os.path.exists(outdirDir):
+        os.makedirs(outdirDir, exist_ok=True)
 
-    ## compare content
-    storedZipFile = outputArchive
-    if os.path.isfile( storedZipFile ) is False:
-        ## output file does not exist -- rename file
-        _LOGGER.info( "storing data to: %s", storedZipFile )
-        os.rename( tmpZipFile, storedZipFile )
-        return
+    with open(outputFile, 'wb') as fp:
+        fp.write( content )
 
-    if filecmp.cmp( tmpZipFile, storedZipFile ) is True:
-        ## the same files -- remove tmp file
-        _LOGGER.info("no new data to backup")
-        os.remove( tmpZipFile )
-        return
 
-    ## rename files
-    counter = 1
-    nextFile = "%s.%s" % (storedZipFile, counter)
-    while os.path.isfile( nextFile ):
-        counter += 1
-        nextFile = "%s.%s" % (storedZipFile, counter)
-    _LOGGER.info( "found backup slot: %s", nextFile )
+def replace_content( content: bytes, outputFile ):
+    ## write to temporary file and rename, so target file is never partially written
+    tmpFile = outputFile + "_tmp"
+    store_content_simple( content, tmpFile )
+    os.replace( tmpFile, outputFile )
+
+
+def calc_digest( content: bytes ) -> str:
+    return hashlib.sha1( content ).hexdigest()
+
+
+## ==========================================================
+
 
-    currFile = storedZipFile
-    while counter > 1:
-        currFile = "%s.%s" % (storedZipFile, counter - 1)
-        os.rename( currFile, nextFile )
-        nextFile = currFile
-        counter -= 1
+def load_records( inputFile ):
+    """Load list of records appended to file by 'append_records()'.
 
-    os.rename( storedZipFile, nextFile )
-    os.rename( tmpZipFile, storedZipFile )
+    Incomplete record at the end of file (e.g. interrupted write) is dropped
+    and the file is truncated to last complete record.
+    """
+    recordsList = []
+    try:
+        with open( inputFile, 'r+b') as fp:
+            validPos = 0
+            while True:
+                try:
+                    record = pickle.load( fp )
+                except EOFError:
+                    break
+                except (pickle.UnpicklingError, ValueError, AttributeError, IndexError):
+                    _LOGGER.warning( "found corrupted record in %s at %s -- truncating", inputFile, validPos )
+                    fp.truncate( validPos )
+                    break
+                recordsList.append( record )
+                validPos = fp.tell()
+            fileSize = fp.seek( 0, os.SEEK_END )
+            if fileSize > validPos:
+                _LOGGER.warning( "found incomplete record in %s at %s -- truncating", inputFile, validPos )
+                fp.truncate( validPos )
+    except FileNotFoundError:
+        return None
+    return recordsList
+
+
+def append_records( recordsList, outputFile ):
+    with open( outputFile, 'ab' ) as fp:
+        for record in recordsList:
+            pickle.dump( record, fp )
+        fp.flush()
+        os.fsync( fp.fileno() )
+
+
+def store_records( recordsList, outputFile ):
+    ## write to temporary file and replace, so existing records are never partially overwritten
+    tmpFile = outputFile + "_tmp"
+    outdirDir = os.path.dirname( outputFile )
+    if not os.path.exists(outdirDir):
+        os.makedirs(outdirDir, exist_ok=True)
+    with open( tmpFile, 'wb' ) as fp:
+        for record in recordsList:
+            pickle.dump( record, fp )
+        fp.flush()
+        os.fsync( fp.fileno() )
+    os.replace( tmpFile, outputFile )
 
 
 def compare_files_bytes( file1Path, file2Path ):
@@ -190,29 +301,270 @@ def read_file_bytes( filePath ):
 ## ==========================================================
 
 
+def hour_bucket( timestamp: datetime ):
+    return ( timestamp.year, timestamp.month, timestamp.day, timestamp.hour )
+
+
+def day_bucket( timestamp: datetime ):
+    return ( timestamp.year, timestamp.month, timestamp.day )
+
+
+def month_bucket( timestamp: datetime ):
+    return ( timestamp.year, timestamp.month )
+
+
+## list of pairs: (bucket key function, keep time)
+## newest backup of each bucket is kept, keep time 'None' means forever
+DEFAULT_RETENTION = [ ( hour_bucket, timedelta( days=1 ) ),
+                      ( day_bucket, timedelta( days=31 ) ),
+                      ( month_bucket, None ) ]
+
+
+class BackupItem( NamedTuple ):
+    timestamp: datetime
+    digest: str
+
+
+class BackupTier():
+
+    def __init__(self, bucketKey, keepTime: timedelta = None):
+        self.bucketKey = bucketKey
+        self.keepTime  = keepTime
+        self.items     = deque()        ## items ordered from oldest to newest
+
+
+class BackupStore():
+    """Content addressed store of backups with retention policy.
+
+    Every distinct content is stored once as compressed file named by its digest,
+    so restoring single backup decompresses single file. Backups are kept in
+    tiers of retention policy. New backup replaces newest backup of the first
+    tier if both fall into the same bucket. Backups older than tier's keep time
+    move to the next tier (or are removed from the last one). Each backup is
+    processed at most once per tier, so pruning costs amortized O(1) per backup.
+
+    Many files can share one store: backups are then added under name of the
+    file (without white spaces) and each name has its own tiers, while equal
+    contents are still stored once.
+    """
+
+    INDEX_FILE = "index.txt"
+
+    def __init__(self, backupDir, retention=None, legacyArchive=None):
+        self.backupDir = backupDir
+        if retention is None:
+            retention = DEFAULT_RETENTION
+        self.retention = retention
+        ## backup name -> tiers of the name
+        self._namedTiers: Dict[ str, List[ BackupTier ] ] = {}
+        self.tiers = self._getTiers( "" )
+        ## path to archive of old "rename" backups format, imported on first use
+        self.legacyArchive = legacyArchive
+        self._refCount: Counter = Counter()
+        self._loaded = False
+
+    def addBackup( self, content: bytes, digest=None, timestamp: datetime = None, name="" ):
+        self._loadIndex()
+        self._addBackup( content, digest, timestamp, name )
+        self._storeIndex()
+
+    def listBackups( self, name="" ) -> List[ BackupItem ]:
+        """Return list of backup items (timestamp, digest) of given name ordered from oldest."""
+        self._loadIndex()
+        retList = []
+        for tier in reversed( self._getTiers( name ) ):
+            retList.extend( tier.items )
+        return retList
+
+    def loadContent( self, digest ) -> bytes:
+        objectPath = self._objectPath( digest )
+        with gzip.open( objectPath, 'rb' ) as fp:
+            return fp.read()
+
+    def restoreBackup( self, digest, outputFile ):
+        content = self.loadContent( digest )
+        _LOGGER.info( "restoring backup %s to: %s", digest, outputFile )
+        replace_content( content, outputFile )
+
+    def _getTiers( self, name ) -> List[ BackupTier ]:
+        tiers = self._namedTiers.get( name )
+        if tiers is None:
+            tiers = [ BackupTier( bucketKey, keepTime ) for bucketKey, keepTime in self.retention ]
+            self._namedTiers[ name ] = tiers
+        return tiers
+
+    def _addBackup( self, content: bytes, digest=None, timestamp: datetime = None, name="" ):
+        if timestamp is None:
+            timestamp = datetime.now()
+        if digest is None:
+            digest = calc_digest( content )
+        objectPath = self._objectPath( digest )
+        if self._refCount[ digest ] < 1 or os.path.isfile( objectPath ) is False:
+            _LOGGER.info( "storing backup: %s", objectPath )
+            tmpFile = objectPath + "_tmp"
+            with gzip.GzipFile( tmpFile, 'wb', mtime=0 ) as fp:
+                fp.write( content )
+            os.replace( tmpFile, objectPath )
+        else:
+            _LOGGER.info( "backup content already stored: %s", objectPath )
+        self._refCount[ digest ] += 1
+        self._insertItem( self._getTiers( name ), 0, BackupItem( timestamp, digest ), timestamp )
+
+    def _insertItem( self, tiers: List[ BackupTier ], tierIndex, item: BackupItem, currTime: datetime ):
+        tier = tiers[ tierIndex ]
+        if tier.items:
+            newestItem = tier.items[-1]
+            if tier.bucketKey( newestItem.timestamp ) == tier.bucketKey( item.timestamp ):
+                ## newer backup replaces older in the same bucket
+                tier.items.pop()
+                self._releaseItem( newestItem )
+        tier.items.append( item )
+
+        if tier.keepTime is None:
+            return
+        while tier.items and currTime - tier.items[0].timestamp > tier.keepTime:
+            expiredItem = tier.items.popleft()
+            if tierIndex + 1 < len( tiers ):
+                self._insertItem( tiers, tierIndex + 1, expiredItem, currTime )
+            else:
+                self._releaseItem( expiredItem )
+
+    def _releaseItem( self, item: BackupItem ):
+        digest = item.digest
+        self._refCount[ digest ] -= 1
+        if self._refCount[ digest ] > 0:
+            return
+        del self._refCount[ digest ]
+        objectPath = self._objectPath( digest )
+        _LOGGER.info( "removing backup: %s", objectPath )
+        try:
+            os.remove( objectPath )
+        except FileNotFoundError:
+            pass
+
+    def _objectPath( self, digest ):
+        return os.path.join( self.backupDir, digest + ".gz" )
+
+    def _loadIndex( self ):
+        if self._loaded:
+            return
+        self._loaded = True
+        os.makedirs( self.backupDir, exist_ok=True )
+        indexPath = os.path.join( self.backupDir, self.INDEX_FILE )
+        if os.path.isfile( indexPath ) is False:
+            self._importLegacy()
+            return
+        self._readIndex( indexPath )
+        ## archives not imported previously (e.g. because of read error) are retried
+        self._importLegacy()
+
+    def _readIndex( self, indexPath ):
+        with open( indexPath, 'r' ) as fp:
+            for line in fp:
+                ## fields: tier index, timestamp, digest and optional backup name
+                fields = line.split()
+                if len( fields ) not in ( 3, 4 ):
+                    continue
+                tiers = self._getTiers( fields[3] if len( fields ) > 3 else "" )
+                tierIndex = min( int( fields[0] ), len( tiers ) - 1 )
+                item = BackupItem( datetime.fromisoformat( fields[1] ), fields[2] )
+                tiers[ tierIndex ].items.append( item )
+                self._refCount[ item.digest ] += 1
+
+    def _storeIndex( self ):
+        lines = []
+        for name, tiers in self._namedTiers.items():
+            suffix = " " + name if name else ""
+            for tierIndex, tier in enumerate( tiers ):
+                for item in tier.items:
+                    lines.append( "%s %s %s%s\n" % ( tierIndex, item.timestamp.isoformat(), item.digest, suffix ) )
+        indexPath = os.path.join( self.backupDir, self.INDEX_FILE )
+        replace_content( "".join( lines ).encode(), indexPath )
+
+    def _importLegacy( self ):
+        if self.legacyArchive is None:
+            return
+        ## archives from oldest to newest
+        archivesList = []
+        counter = 1
+        while os.path.isfile( "%s.%s" % ( self.legacyArchive, counter ) ):
+            archivesList.insert( 0, "%s.%s" % ( self.legacyArchive, counter ) )
+            counter += 1
+        if os.path.isfile( self.legacyArchive ):
+            archivesList.append( self.legacyArchive )
+        if not archivesList:
+            return
+        _LOGGER.info( "importing %s legacy backups", len( archivesList ) )
+        importedList = []
+        skippedList  = []
+        for archivePath in archivesList:
+            try:
+                with zipfile.ZipFile( archivePath, 'r' ) as zipf:
+                    namesList = zipf.namelist()
+                    content = zipf.read( namesList[0] ) if namesList else None
+                if content is not None:
+                    timestamp = datetime.fromtimestamp( os.path.getmtime( archivePath ) )
+                    self._addBackup( content, timestamp=timestamp )
+                importedList.append( archivePath )
+            except (OSError, zipfile.BadZipFile):
+                _LOGGER.exception( "unable to import backup: %s", archivePath )
+                skippedList.append( archivePath )
+        ## index is stored even if some archives failed, they stay in place and are retried on next load
+        self._storeIndex()
+        for archivePath in importedList:
+            os.remove( archivePath )
+        if skippedList:
+            _LOGGER.warning( "skipped legacy backups: %s", ", ".join( skippedList ) )
+
+
+## ==========================================================
+
+
 class Versionable( metaclass=abc.ABCMeta ):
 
+    ## allows derived classes to define slots
+    __slots__ = ()
+
+    ## names of attributes excluded from pickled state (e.g. caches, back references)
+    _transient_fields: tuple = ()
+
     def __getstate__(self):
         if not hasattr(self, "_class_version"):
             raise Exception("Your class must define _class_version class variable")
         # pylint: disable=E1101
-        return dict(_class_version=self._class_version, **self.__dict__)
+        state = dict(_class_version=self._class_version, **self._storestate_())
+        for field in self._transient_fields:
+            state.pop( field, None )
+        return state
 
     def __setstate__(self, dict_):
         version_present_in_pickle = dict_.pop("_class_version", None)
         # pylint: disable=E1101
         if version_present_in_pickle == self._class_version:
-            # pylint: disable=W0201
-            self.__dict__ = dict_
+            self._restorestate_( dict_ )
         else:
             self._convertstate_( dict_, version_present_in_pickle )
+            if _CONVERSIONS is not None:
+                _CONVERSIONS[ (self.__class__.__name__, version_present_in_pickle, self._class_version) ] += 1
+        self._inittransient_()
 
-    def _convertstate_(self, dict_, dictVersion_ ):
-        # pylint: disable=E1101
-        _LOGGER.info( "converting object from version %s to %s", dictVersion_, self._class_version )
+    def _inittransient_(self):
+        ## called after state is restored, allows to initialize transient fields
+        pass
+
+    def _storestate_(self) -> dict:
+        ## returns attributes to pickle, override in classes without '__dict__'
+        return self.__dict__
+
+    def _restorestate_(self, dict_):
+        ## sets attributes from state of current version
         # pylint: disable=W0201
         self.__dict__ = dict_
 
+    def _convertstate_(self, dict_, dictVersion_ ):
+        ## conversions are counted and logged once by 'load_object_converted()'
+        self._restorestate_( dict_ )
+
 #     @abc.abstractmethod
 #     def _convertstate_(self, dict_, dictVersion_ ):
 #         raise NotImplementedError('You need to define this method in derived class!')